@@ -13,4 +13,7 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "notif.settings")
 
-application = get_asgi_application()
+from dj_blacksmith.lifecycle import LifespanMiddleware
+
+# close the blacksmith clients on shutdown
+application = LifespanMiddleware(get_asgi_application())
@@ -1,4 +1,6 @@
 # type: ignore
+import json
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -30,3 +32,11 @@ BLACKSMITH_CLIENT = {
         ],
     },
 }
+
+# The load test harness, in examples/loadtest, override the client settings
+# in order to run without consul and to compare configurations.
+if "NOTIF_BLACKSMITH_CLIENT" in os.environ:
+    BLACKSMITH_CLIENT["default"] = json.loads(os.environ["NOTIF_BLACKSMITH_CLIENT"])
+
+if "NOTIF_BLACKSMITH_TRANSPORT" in os.environ:
+    BLACKSMITH_TRANSPORT = os.environ["NOTIF_BLACKSMITH_TRANSPORT"]
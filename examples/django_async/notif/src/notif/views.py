@@ -43,6 +43,15 @@ async def post_notification(request: HttpRequest) -> HttpResponse:
     return JsonResponse({"detail": f"{user.email} accepted"}, status=202)
 
 
+async def get_user_email(request: HttpRequest, username: str) -> HttpResponse:
+    """Retrieve the email of a user, without sending anything."""
+    dj_cli = AsyncDjBlacksmithClient(request)
+    cli = await dj_cli("default")
+    api_user = await cli("api_user")
+    user: User = (await api_user.users.get({"username": username})).unwrap()
+    return JsonResponse({"email": user.email})
+
+
 async def get_metrics(request: HttpRequest) -> HttpResponse:
     registry = prometheus_client.REGISTRY
     metrics_page = prometheus_client.generate_latest(registry)
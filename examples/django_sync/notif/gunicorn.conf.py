@@ -0,0 +1,8 @@
+from prometheus_client.multiprocess import mark_process_dead
+
+# close the blacksmith clients of the workers on exit
+from dj_blacksmith.lifecycle import worker_exit  # noqa: F401
+
+
+def child_exit(server, worker):
+    mark_process_dead(worker.pid)
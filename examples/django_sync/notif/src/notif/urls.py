@@ -16,9 +16,10 @@ Including another URLconf
 
 from django.urls import URLResolver, path
 
-from notif.views import get_metrics, post_notification
+from notif.views import get_metrics, get_user_email, post_notification
 
 urlpatterns: list[URLResolver] = [
     path("v1/notification", post_notification),
+    path("v1/users/<username>/email", get_user_email),
     path("metrics", get_metrics),
 ]
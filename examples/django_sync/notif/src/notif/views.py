@@ -44,6 +44,15 @@ def post_notification(request: HttpRequest) -> HttpResponse:
     return JsonResponse({"detail": f"{user.email} accepted"}, status=202)
 
 
+def get_user_email(request: HttpRequest, username: str) -> HttpResponse:
+    """Retrieve the email of a user, without sending anything."""
+    dj_cli = SyncDjBlacksmithClient(request)
+    cli = dj_cli("default")
+    api_user = cli("api_user")
+    user: User = api_user.users.get({"username": username}).unwrap()
+    return JsonResponse({"email": user.email})
+
+
 def get_metrics(request: HttpRequest) -> HttpResponse:
     registry = prometheus_client.CollectorRegistry()
     MultiProcessCollector(registry)
@@ -0,0 +1,83 @@
+"""
+A small http load generator.
+
+Every process run an event loop with concurrent workers, that call the url
+in loop, until the duration is over.
+"""
+
+import asyncio
+import multiprocessing
+import time
+from typing import Any
+
+import httpx
+
+
+async def _run_workers(url: str, duration: float, concurrency: int) -> dict[str, Any]:
+    latencies: list[float] = []
+    errors = 0
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    resp = await client.get(url)
+                    success = resp.status_code == 200
+                except httpx.HTTPError:
+                    success = False
+                if success:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return {"latencies": latencies, "errors": errors, "elapsed": elapsed}
+
+
+def _run_process(args: tuple[str, float, int]) -> dict[str, Any]:
+    return asyncio.run(_run_workers(*args))
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Percentile of sorted values, using the nearest rank."""
+    if not values:
+        return float("nan")
+    rank = max(round(pct / 100 * len(values)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def run_load(
+    url: str, duration: float, concurrency: int, processes: int = 1
+) -> dict[str, Any]:
+    """
+    Call the url during duration seconds and return the statistics.
+
+    :param concurrency: total number of concurrent requests.
+    :param processes: number of processes used to generate the load,
+        a single process is limited to a few thousand requests per second.
+    """
+    per_process = max(concurrency // processes, 1)
+    jobs = [(url, duration, per_process)] * processes
+    if processes == 1:
+        results = [_run_process(jobs[0])]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(_run_process, jobs)
+
+    latencies = sorted(lat for res in results for lat in res["latencies"])
+    elapsed = max(res["elapsed"] for res in results)
+    return {
+        "requests": len(latencies),
+        "errors": sum(res["errors"] for res in results),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
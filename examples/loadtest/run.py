@@ -0,0 +1,241 @@
+"""
+Load test the notif service of the examples, for many configurations.
+
+The user service is started once, then for every configuration, the notif
+service is started with its own client settings, loaded, and stopped.
+
+Usage::
+
+    python examples/loadtest/run.py --duration 20 --concurrency 64
+
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+from loadgen import run_load
+
+HERE = Path(__file__).parent
+EXAMPLES = HERE.parent
+HOST = "127.0.0.1"
+
+
+def wait_until_ready(
+    proc: subprocess.Popen[bytes],
+    url: str,
+    timeout: float = 30,
+    uds: Optional[str] = None,
+) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{proc.args[3]} exited with code {proc.returncode}")
+        try:
+            with httpx.Client(transport=httpx.HTTPTransport(uds=uds)) as client:
+                client.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} is not ready after {timeout} seconds")
+
+
+def spawn(cmd: list[str], cwd: Path, env: dict[str, str]) -> subprocess.Popen[bytes]:
+    return subprocess.Popen(cmd, cwd=cwd, env={**os.environ, **env})
+
+
+def stop(proc: subprocess.Popen[bytes]) -> None:
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def spawn_user(port: int, uds: Optional[str] = None) -> subprocess.Popen[bytes]:
+    bind = ["--uds", uds] if uds else ["--host", HOST, "--port", str(port)]
+    return spawn(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "user:app",
+            *bind,
+            "--workers",
+            "2",
+            "--log-level",
+            "warning",
+        ],
+        cwd=EXAMPLES / "django_async" / "user" / "src",
+        env={},
+    )
+
+
+def spawn_notif(
+    config: dict[str, Any], port: int, user_port: int, tmpdir: str
+) -> subprocess.Popen[bytes]:
+    client = {
+        "sd": "static",
+        "static_sd_config": {"user/v1": f"http://{HOST}:{user_port}/v1"},
+        **config["client"],
+    }
+    if config.get("uds"):
+        # the user service is reached through its unix domain socket,
+        # as a sidecar proxy would be
+        client["transport"] = {**client.get("transport", {}), "uds": user_uds(tmpdir)}
+    env = {
+        "NOTIF_BLACKSMITH_CLIENT": json.dumps(client),
+        "PYTHONPATH": str(EXAMPLES / f"django_{config['mode']}" / "notif" / "src"),
+    }
+    if "transport" in config:
+        env["NOTIF_BLACKSMITH_TRANSPORT"] = config["transport"]
+    workers = str(config.get("workers", 2))
+    if config["mode"] == "async":
+        cmd = [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "notif.asgi:application",
+            "--host",
+            HOST,
+            "--port",
+            str(port),
+            "--workers",
+            workers,
+            "--log-level",
+            "warning",
+        ]
+    else:
+        # gunicorn workers share their prometheus metrics using files
+        multiproc_dir = tempfile.mkdtemp(dir=tmpdir)
+        env["PROMETHEUS_MULTIPROC_DIR"] = multiproc_dir
+        cmd = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "notif.wsgi",
+            "-w",
+            workers,
+            "-b",
+            f"{HOST}:{port}",
+            "--log-level",
+            "warning",
+        ]
+    return spawn(cmd, cwd=EXAMPLES, env=env)
+
+
+def user_uds(tmpdir: str) -> str:
+    return str(Path(tmpdir) / "user.sock")
+
+
+def children(pid: int) -> list[int]:
+    """Worker processes of the server, read from /proc."""
+    pids: list[int] = []
+    try:
+        tasks = Path(f"/proc/{pid}/task").iterdir()
+        for task in tasks:
+            for child in (task / "children").read_text().split():
+                pids.append(int(child))
+                pids.extend(children(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def memory(pid: int) -> dict[str, int]:
+    """Resident memory of a process, and its peak, in kB."""
+    mem = {}
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                mem[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return mem
+
+
+def run_config(
+    config: dict[str, Any], args: argparse.Namespace, tmpdir: str
+) -> dict[str, Any]:
+    url = f"http://{HOST}:{args.port}/v1/users/naruto/email"
+    proc = spawn_notif(config, args.port, args.user_port, tmpdir)
+    try:
+        wait_until_ready(proc, url)
+        run_load(url, args.warmup, args.concurrency, args.processes)
+        stats = run_load(url, args.duration, args.concurrency, args.processes)
+        workers = {str(pid): mem for pid in children(proc.pid) if (mem := memory(pid))}
+    finally:
+        stop(proc)
+    return {"name": config["name"], **stats, "workers": workers}
+
+
+def print_table(results: list[dict[str, Any]]) -> None:
+    header = (
+        f"{'name':<40} {'rps':>9} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>7} {'rss kB/worker':>14} {'peak kB/worker':>15}"
+    )
+    print(header)
+    print("-" * len(header))
+    for res in results:
+        workers = res["workers"].values()
+        rss = max((w.get("VmRSS", 0) for w in workers), default=0)
+        peak = max((w.get("VmHWM", 0) for w in workers), default=0)
+        print(
+            f"{res['name']:<40} {res['rps']:>9.1f} {res['p50_ms']:>8.2f} "
+            f"{res['p99_ms']:>8.2f} {res['errors']:>7} {rss:>14} {peak:>15}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--configs", default=str(HERE / "configs.json"))
+    parser.add_argument("--only", action="append", help="configuration name")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--user-port", type=int, default=8101)
+    parser.add_argument("--output", help="write the results in a json file")
+    args = parser.parse_args()
+
+    configs = json.loads(Path(args.configs).read_text())
+    if args.only:
+        configs = [conf for conf in configs if conf["name"] in args.only]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        users = [spawn_user(args.user_port)]
+        try:
+            wait_until_ready(
+                users[0], f"http://{HOST}:{args.user_port}/v1/users/naruto"
+            )
+            if any(config.get("uds") for config in configs):
+                users.append(spawn_user(args.user_port, user_uds(tmpdir)))
+                wait_until_ready(
+                    users[1], "http://user/v1/users/naruto", uds=user_uds(tmpdir)
+                )
+            for config in configs:
+                print(f"Running {config['name']}...", file=sys.stderr)
+                results.append(run_config(config, args, tmpdir))
+        finally:
+            for user in users:
+                stop(user)
+
+    print_table(results)
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,10 @@ for path in DIRECTORIES:
                 path.replace("_async", "_sync"),
                 additional_replacements={
                     "_async": "_sync",
+                    "aclose": "close",
+                    "aread": "read",
+                    "aiter_bytes": "iter_bytes",
+                    "AsyncHTTPTransport": "HTTPTransport",
                 },
             ),
         ],
@@ -28,6 +32,7 @@ unasync.unasync_files(
             "tests/unittests/_sync",
             additional_replacements={
                 "_async": "_sync",
+                "aclose": "close",
                 "tests.unittests.fixtures.AsyncDummyTransport": "tests.unittests.fixtures.SyncDummyTransport",
                 "dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder": "dj_blacksmith.SyncCircuitBreakerMiddlewareBuilder",
                 "dj_blacksmith.AsyncPrometheusMiddlewareBuilder": "dj_blacksmith.SyncPrometheusMiddlewareBuilder",
@@ -36,3 +41,26 @@ unasync.unasync_files(
         ),
     ],
 )
+
+
+unasync.unasync_files(
+    [str(p) for p in Path("tests/benchmarks/_async").iterdir() if p.is_file()],
+    rules=[
+        unasync.Rule(
+            "tests/benchmarks/_async",
+            "tests/benchmarks/_sync",
+            additional_replacements={
+                "_async": "_sync",
+                "async_run": "sync_run",
+                "async_gather": "sync_gather",
+                "tests.unittests.fixtures.AsyncDummyTransport": "tests.unittests.fixtures.SyncDummyTransport",
+                "dj_blacksmith.AsyncSlowCallLogMiddlewareBuilder": "dj_blacksmith.SyncSlowCallLogMiddlewareBuilder",
+                "dj_blacksmith.AsyncPrometheusMiddlewareBuilder": "dj_blacksmith.SyncPrometheusMiddlewareBuilder",
+                "dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder": "dj_blacksmith.SyncCircuitBreakerMiddlewareBuilder",
+                "dj_blacksmith.AsyncForwardHeaderFactoryBuilder": "dj_blacksmith.SyncForwardHeaderFactoryBuilder",
+                "dj_blacksmith.AsyncNPlusOneDetectorFactoryBuilder": "dj_blacksmith.SyncNPlusOneDetectorFactoryBuilder",
+                "dj_blacksmith.client._async.middleware.AsyncHTTPAddHeadersMiddlewareBuilder": "dj_blacksmith.client._sync.middleware.SyncHTTPAddHeadersMiddlewareBuilder",
+            },
+        ),
+    ],
+)
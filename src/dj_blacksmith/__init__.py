@@ -6,23 +6,33 @@ __version__ = metadata.version("dj_blacksmith")
 from .client._async.client import AsyncDjBlacksmithClient
 from .client._async.middleware import (
     AsyncCircuitBreakerMiddlewareBuilder,
+    AsyncConditionalHTTPCacheMiddlewareBuilder,
     AsyncHTTPCacheMiddlewareBuilder,
     AsyncPrometheusMiddlewareBuilder,
+    AsyncSlowCallLogMiddlewareBuilder,
 )
 from .client._async.middleware_factory import (
     AsyncAbstractMiddlewareFactoryBuilder,
     AsyncForwardHeaderFactoryBuilder,
+    AsyncNPlusOneDetectorFactoryBuilder,
 )
+from .client._async.pagination import AsyncCollectionStream
 from .client._sync.client import SyncDjBlacksmithClient
 from .client._sync.middleware import (
     SyncCircuitBreakerMiddlewareBuilder,
+    SyncConditionalHTTPCacheMiddlewareBuilder,
     SyncHTTPCacheMiddlewareBuilder,
     SyncPrometheusMiddlewareBuilder,
+    SyncSlowCallLogMiddlewareBuilder,
 )
 from .client._sync.middleware_factory import (
     SyncAbstractMiddlewareFactoryBuilder,
     SyncForwardHeaderFactoryBuilder,
+    SyncNPlusOneDetectorFactoryBuilder,
 )
+from .client._sync.pagination import SyncCollectionStream
+from .client.call_log import CallLog, NPlusOneError
+from .lifecycle import LifespanMiddleware
 
 __all__ = [
     # Clients
@@ -35,9 +45,23 @@ __all__ = [
     "SyncPrometheusMiddlewareBuilder",
     "AsyncHTTPCacheMiddlewareBuilder",
     "SyncHTTPCacheMiddlewareBuilder",
+    "AsyncConditionalHTTPCacheMiddlewareBuilder",
+    "SyncConditionalHTTPCacheMiddlewareBuilder",
+    "AsyncSlowCallLogMiddlewareBuilder",
+    "SyncSlowCallLogMiddlewareBuilder",
     # Middlewares Factory
     "AsyncAbstractMiddlewareFactoryBuilder",
     "AsyncForwardHeaderFactoryBuilder",
     "SyncAbstractMiddlewareFactoryBuilder",
     "SyncForwardHeaderFactoryBuilder",
+    "AsyncNPlusOneDetectorFactoryBuilder",
+    "SyncNPlusOneDetectorFactoryBuilder",
+    # Pagination
+    "AsyncCollectionStream",
+    "SyncCollectionStream",
+    # N+1 Detection
+    "CallLog",
+    "NPlusOneError",
+    # Lifecycle
+    "LifespanMiddleware",
 ]
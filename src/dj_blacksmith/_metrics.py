@@ -0,0 +1,62 @@
+"""Prometheus metrics collected by dj_blacksmith, on top of the blacksmith ones."""
+
+from typing import Any
+
+_metrics: dict[tuple[Any, str], Any] = {}
+_metrics_settings: dict[tuple[Any, str], dict[str, Any]] = {}
+
+
+def get_counter(name: str, documentation: str, labelnames: list[str]) -> Any:
+    """
+    Get a prometheus counter registered in the current default registry.
+
+    The counter is created once per registry, so many clients can share it.
+    """
+    from prometheus_client import REGISTRY, Counter
+
+    key = (REGISTRY, name)
+    if key not in _metrics:
+        _metrics[key] = Counter(
+            name, documentation, labelnames=labelnames, registry=REGISTRY
+        )
+    return _metrics[key]
+
+
+def get_gauge(name: str, documentation: str, labelnames: list[str]) -> Any:
+    """
+    Get a prometheus gauge registered in the current default registry.
+
+    The gauge is created once per registry, so many transports can share it.
+    """
+    from prometheus_client import REGISTRY, Gauge
+
+    key = (REGISTRY, name)
+    if key not in _metrics:
+        _metrics[key] = Gauge(
+            name, documentation, labelnames=labelnames, registry=REGISTRY
+        )
+    return _metrics[key]
+
+
+def get_blacksmith_metrics(**kwargs: Any) -> Any:
+    """
+    Get the blacksmith metrics registered in their registry.
+
+    The metrics are created once per registry, so many clients, or a client
+    rebuilt while reloading its settings, can share them. They can't be
+    registered twice in a registry, so every clients must use the same settings.
+    """
+    from blacksmith import PrometheusMetrics
+    from prometheus_client import REGISTRY
+
+    key = (kwargs.get("registry") or REGISTRY, "blacksmith")
+    settings = {name: val for name, val in kwargs.items() if name != "registry"}
+    if key not in _metrics:
+        _metrics[key] = PrometheusMetrics(**kwargs)
+        _metrics_settings[key] = settings
+    elif _metrics_settings[key] != settings:
+        raise RuntimeError(
+            f"The blacksmith metrics are registered with {_metrics_settings[key]!r}, "
+            f"they can't be registered with {settings!r}"
+        )
+    return _metrics[key]
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Optional
 
 from django.conf import settings
 
@@ -17,3 +17,23 @@ def get_clients() -> dict[str, Any]:
 
 def get_transport() -> str:
     return get_setting("TRANSPORT")
+
+
+def get_warm_up() -> bool:
+    return get_setting("WARM_UP", False)
+
+
+def get_lazy_import() -> bool:
+    return get_setting("LAZY_IMPORT", False)
+
+
+def get_manifest() -> Optional[str]:
+    return get_setting("MANIFEST")
+
+
+def get_reload() -> Optional[dict[str, Any]]:
+    return get_setting("RELOAD")
+
+
+def get_json_codec() -> Optional[str]:
+    return get_setting("JSON_CODEC")
@@ -1,7 +1,17 @@
-from blacksmith import scan
 from django.apps import AppConfig
+from django.core import checks
+from django.test.signals import setting_changed
 
-from ._settings import get_imports
+from ._settings import (
+    get_imports,
+    get_json_codec,
+    get_lazy_import,
+    get_manifest,
+    get_warm_up,
+)
+from .client import resources
+from .client.config import check_client_configs, compile_clients, reset_client_configs
+from .client.json_codec import reset_codec, use_codec
 
 
 class BlackmithConfig(AppConfig):
@@ -9,4 +19,22 @@ class BlackmithConfig(AppConfig):
     verbose_name = "Blacksmith client"
 
     def ready(self):
-        scan(*get_imports())
+        if get_lazy_import():
+            manifest = get_manifest()
+            resources.loader = resources.ResourceLoader(
+                get_imports(), resources.read_manifest(manifest) if manifest else None
+            )
+        else:
+            resources.scan(*get_imports())
+        use_codec(get_json_codec())
+        setting_changed.connect(reset_client_configs)
+        setting_changed.connect(reset_codec)
+        checks.register(check_client_configs, "dj_blacksmith")
+        # the errors are reported by the system check
+        compile_clients()
+        if get_warm_up():
+            from .client._async.client import warm_up as async_warm_up
+            from .client._sync.client import warm_up as sync_warm_up
+
+            async_warm_up()
+            sync_warm_up()
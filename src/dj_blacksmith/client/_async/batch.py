@@ -0,0 +1,231 @@
+"""
+Batch the ``get`` calls of the resources in bulk calls, as a DataLoader.
+
+The ``get`` calls of a batched resource made while the event loop runs the
+ready tasks, such as the tasks of a ``gather``, are sent as one bulk call,
+and every caller receives the response of its item. Without an event loop,
+the sync clients batch the keys of a ``get_many`` call.
+"""
+
+from collections.abc import Hashable, Mapping, Sequence
+from functools import partial
+from typing import Any, Optional, Union
+
+from blacksmith import (
+    AsyncClient,
+    AsyncRouteProxy,
+    HTTPError,
+    HTTPResponse,
+    ResponseBox,
+)
+from blacksmith.typing import ClientName, ResourceName
+from result import Err, Ok, Result
+
+from dj_blacksmith.client._async.pagination import AsyncCollectionStream
+from dj_blacksmith.client._concurrency import AsyncBatch
+from dj_blacksmith.client.batching import BatchConfig, build_not_found
+
+
+class AsyncBatchedRouteProxy(AsyncRouteProxy[Any, Any, Any]):
+    """
+    A resource of a client, its ``get`` calls are batched.
+
+    A ``get`` call with other parameters than the batched one, or with a
+    timeout, is not batched.
+    """
+
+    def __init__(
+        self,
+        route: AsyncRouteProxy[Any, Any, Any],
+        bulk_route: AsyncRouteProxy[Any, Any, Any],
+        config: BatchConfig,
+        loader: "AsyncBatchLoader",
+    ):
+        super().__init__(
+            route.client_name,
+            route.name,
+            route.endpoint,
+            route.routes,
+            route.transport,
+            route.timeout,
+            route.collection_parser,
+            route.error_parser,
+            route.middlewares,
+        )
+        self.bulk_route = bulk_route
+        self.config = config
+        self.loader = loader
+
+    async def get(
+        self, params: Any, timeout: Optional[Any] = None
+    ) -> ResponseBox[Any, Any]:
+        key = self.config.get_key(params)
+        if key is None or timeout is not None:
+            return await super().get(params, timeout)
+        return await self.loader.load(self, key)
+
+    async def get_many(self, keys: Sequence[Hashable]) -> list[ResponseBox[Any, Any]]:
+        """Get the items of the given keys, using bulk calls."""
+        return await self.loader.load_many(self, keys)
+
+    def build_response(self, result: Result[Any, Any]) -> ResponseBox[Any, Any]:
+        """The response of the ``get`` call of an item."""
+        resource = self.routes.resource
+        assert resource is not None and resource.contract is not None
+        return ResponseBox(
+            result,
+            resource.contract["GET"][1],
+            "GET",
+            resource.path,
+            self.name,
+            self.client_name,
+            self.error_parser,
+        )
+
+    async def fetch_one(self, key: Hashable) -> ResponseBox[Any, Any]:
+        return await super().get({self.config.param: key})
+
+    async def fetch_many(
+        self, keys: Sequence[Hashable]
+    ) -> dict[Hashable, ResponseBox[Any, Any]]:
+        """
+        Get the items of the keys with one bulk call.
+
+        The pages of the bulk call are followed, as a collection stream,
+        so the pagination parameters have to be declared in its request
+        model. An item missing in the response of the bulk call is a 404 error.
+        """
+        stream = AsyncCollectionStream(
+            self.bulk_route, self.config.get_bulk_params(keys), prefetch=False
+        )
+        params: Optional[Mapping[str, Any]] = stream.params
+        items: dict[str, HTTPResponse] = {}
+        while params is not None:
+            resp = await self.bulk_route.collection_get(dict(params))
+            if resp.is_err():
+                error = self.build_response(Err(resp.unwrap_err()))
+                return dict.fromkeys(keys, error)
+            collection = resp.unwrap()
+            headers = collection.response.resp.headers
+            for item in collection.json_resp:
+                items[self.config.get_item_key(item)] = HTTPResponse(200, headers, item)
+            params = stream.next_params(collection.meta, params)
+        boxes: dict[Hashable, ResponseBox[Any, Any]] = {}
+        for key in keys:
+            item = items.get(str(key))
+            result: Result[HTTPResponse, HTTPError]
+            if item is None:
+                result = Err(
+                    build_not_found(
+                        self.client_name,
+                        self.routes.resource.path,  # type: ignore
+                        self.endpoint,
+                        key,
+                        self.config.param,
+                    )
+                )
+            else:
+                result = Ok(item)
+            boxes[key] = self.build_response(result)
+        return boxes
+
+
+class AsyncBatchLoader:
+    """
+    Load the items of the batched resources, with bulk calls.
+
+    The loaded items are kept by the loader, a client proxy, usually built
+    for a request, keeps them for the request. The errors are not kept.
+    """
+
+    def __init__(self, configs: Mapping[tuple[ClientName, ResourceName], BatchConfig]):
+        self.configs = configs
+        self.batches: dict[
+            tuple[ClientName, ResourceName], AsyncBatch[Any, ResponseBox[Any, Any]]
+        ] = {}
+        self.loaded: dict[
+            tuple[ClientName, ResourceName, Hashable], ResponseBox[Any, Any]
+        ] = {}
+
+    def has_client(self, client_name: ClientName) -> bool:
+        return any(name == client_name for name, _ in self.configs)
+
+    def add(
+        self, route: AsyncBatchedRouteProxy, key: Hashable
+    ) -> AsyncBatch[Any, ResponseBox[Any, Any]]:
+        """Add the key to the pending batch of the resource."""
+        name = (route.client_name, route.name)
+        batch = self.batches.get(name)
+        if batch is None or not batch.add(key):
+            batch = AsyncBatch(partial(self.fetch, route))
+            self.batches[name] = batch
+            batch.add(key)
+        return batch
+
+    async def load(
+        self, route: AsyncBatchedRouteProxy, key: Hashable
+    ) -> ResponseBox[Any, Any]:
+        loaded = self.loaded.get((route.client_name, route.name, key))
+        if loaded is not None:
+            return loaded
+        return await self.add(route, key).result(key)
+
+    async def load_many(
+        self, route: AsyncBatchedRouteProxy, keys: Sequence[Hashable]
+    ) -> list[ResponseBox[Any, Any]]:
+        batches: dict[Hashable, AsyncBatch[Any, ResponseBox[Any, Any]]] = {}
+        for key in keys:
+            if (route.client_name, route.name, key) not in self.loaded:
+                batches[key] = self.add(route, key)
+        return [
+            await batches[key].result(key)
+            if key in batches
+            else self.loaded[route.client_name, route.name, key]
+            for key in keys
+        ]
+
+    async def fetch(
+        self, route: AsyncBatchedRouteProxy, keys: list[Hashable]
+    ) -> Mapping[Hashable, ResponseBox[Any, Any]]:
+        """Get the items of a batch, a single key is a ``get`` call."""
+        boxes: dict[Hashable, ResponseBox[Any, Any]] = {}
+        if len(keys) == 1:
+            boxes[keys[0]] = await route.fetch_one(keys[0])
+        else:
+            for chunk in route.config.chunks(keys):
+                boxes.update(await route.fetch_many(chunk))
+        for key, box in boxes.items():
+            # an error, such as a 503, may be transient, it is not kept
+            if box.is_ok():
+                self.loaded[route.client_name, route.name, key] = box
+        return boxes
+
+
+class AsyncBatchedClient(AsyncClient[Any]):
+    """A client, the ``get`` calls of its batched resources are batched."""
+
+    def __init__(self, client: AsyncClient[Any], loader: AsyncBatchLoader):
+        super().__init__(
+            client.name,
+            client.endpoint,
+            client.resources,
+            client.transport,
+            client.timeout,
+            client.collection_parser,
+            client.middlewares,
+            client.error_parser,
+        )
+        self.loader = loader
+
+    def __getattr__(
+        self, name: ResourceName
+    ) -> Union[AsyncRouteProxy[Any, Any, Any], AsyncBatchedRouteProxy]:
+        route = super().__getattr__(name)
+        config = self.loader.configs.get((self.name, name))
+        resource = route.routes.resource
+        if config is None or resource is None or "GET" not in (resource.contract or {}):
+            return route
+        bulk_route = route
+        if config.bulk_resource:
+            bulk_route = super().__getattr__(config.bulk_resource)
+        return AsyncBatchedRouteProxy(route, bulk_route, config, self.loader)
@@ -1,4 +1,7 @@
-from collections.abc import Iterable, Mapping
+import logging
+import os
+import time
+from collections.abc import AsyncIterator, Iterable, Mapping
 from typing import Any, ClassVar, Optional
 
 from blacksmith import (
@@ -10,32 +13,94 @@ from blacksmith import (
     AsyncConsulDiscovery,
     AsyncHTTPMiddleware,
     AsyncNomadDiscovery,
-    AsyncRouterDiscovery,
     AsyncStaticDiscovery,
-    HTTPTimeout,
     PrometheusMetrics,
 )
 from blacksmith.typing import ClientName
 from django.http.request import HttpRequest
 from django.utils.module_loading import import_string
 
-from dj_blacksmith._settings import get_clients, get_transport
-from dj_blacksmith.client._async.middleware import AsyncHTTPMiddlewareBuilder
+from dj_blacksmith._metrics import get_blacksmith_metrics
+from dj_blacksmith._settings import get_transport
+from dj_blacksmith.client._async.batch import AsyncBatchedClient, AsyncBatchLoader
+from dj_blacksmith.client._async.middleware import (
+    AsyncHTTPMiddlewareBuilder,
+    AsyncInFlightMiddleware,
+    AsyncLoadBalancerMiddleware,
+)
 from dj_blacksmith.client._async.middleware_factory import (
     AsyncAbstractMiddlewareFactoryBuilder,
 )
+from dj_blacksmith.client._async.pagination import AsyncCollectionStream
+from dj_blacksmith.client._async.reload import AsyncReloadListener
+from dj_blacksmith.client._async.sd import (
+    AsyncBalancedDiscovery,
+    AsyncCachingDiscovery,
+    AsyncCompiledRouterDiscovery,
+    AsyncConsulWatchDiscovery,
+    AsyncZoneNomadDiscovery,
+)
+from dj_blacksmith.client._async.transport import transports
+from dj_blacksmith.client._concurrency import AsyncInFlight
+from dj_blacksmith.client.balancer import build_load_balancer
+from dj_blacksmith.client.batching import BatchConfig, build_batch_configs
+from dj_blacksmith.client.call_log import CallLog, get_call_log
+from dj_blacksmith.client.config import (
+    compile_clients,
+    get_client_config,
+    get_client_configs,
+)
+from dj_blacksmith.client.profiling import (
+    KIND_INITIALIZE,
+    KIND_MIDDLEWARES,
+    KIND_SD,
+    KIND_TRANSPORT,
+    MeasureHook,
+    no_measure,
+)
+from dj_blacksmith.client.resources import load_client
+from dj_blacksmith.client.timing import last_resolution
+from dj_blacksmith.client.validation import ResponseValidation
+
+log = logging.getLogger(__name__)
+
+in_flight = AsyncInFlight()
+"""The api calls in flight, of every clients."""
 
 
 def build_sd(
     settings: Mapping[str, Mapping[str, Any]],
+) -> AsyncAbstractServiceDiscovery:
+    sd = build_base_sd(settings)
+    if "load_balancer" in settings and not isinstance(sd, AsyncConsulWatchDiscovery):
+        raise RuntimeError("Load balancing requires the consul_watch service discovery")
+    if "sd_cache" in settings:
+        if isinstance(sd, AsyncBalancedDiscovery):
+            # the instances are chosen for every call
+            raise RuntimeError(
+                "The sd_cache can't cache a load balanced service discovery"
+            )
+        sd = AsyncCachingDiscovery(sd, **settings["sd_cache"])
+    return sd
+
+
+def build_base_sd(
+    settings: Mapping[str, Mapping[str, Any]],
 ) -> AsyncAbstractServiceDiscovery:
     sd_setting = settings.get("sd", "")
     if sd_setting == "consul":
         return AsyncConsulDiscovery(**settings["consul_sd_config"])
+    elif sd_setting == "consul_watch":
+        return AsyncConsulWatchDiscovery(
+            **settings["consul_sd_config"],
+            load_balancer=build_load_balancer(settings),
+        )
     elif sd_setting == "nomad":
+        if "zone_affinity" in settings["nomad_sd_config"]:
+            return AsyncZoneNomadDiscovery(**settings["nomad_sd_config"])
         return AsyncNomadDiscovery(**settings["nomad_sd_config"])
     elif sd_setting == "router":
-        return AsyncRouterDiscovery(**settings["router_sd_config"])
+        return AsyncCompiledRouterDiscovery(**settings["router_sd_config"])
     elif sd_setting == "static":
         endpoints: dict[tuple[str, Optional[str]], str] = {}
         for key, val in settings["static_sd_config"].items():
@@ -49,7 +114,9 @@ def build_sd(
         raise RuntimeError(f"Unkown service discovery {sd_setting}")
 
 
-def build_collection_parser(settings: dict[str, Any]) -> type[AbstractCollectionParser]:
+def build_collection_parser(
+    settings: Mapping[str, Any],
+) -> type[AbstractCollectionParser]:
     cls = import_string(
         settings.get("collection_parser", "blacksmith.CollectionParser")
     )
@@ -64,9 +131,29 @@ def build_transport() -> Optional[type[AsyncAbstractTransport]]:
     return cls
 
 
-def build_metrics(settings: dict[str, Any]) -> PrometheusMetrics:
+def build_client_transport(
+    settings: Mapping[str, Any], reload: bool = False, name: str = "default"
+) -> Optional[AsyncAbstractTransport]:
+    transport = build_transport()
+    if transport:
+        return transport()
+    if "transport" in settings or "json_codec" in settings:
+        transport_settings = dict(settings.get("transport", {}))
+        if "json_codec" in settings:
+            transport_settings["json_codec"] = settings["json_codec"]
+        return transports.get(
+            settings.get("verify_certificate", True),
+            settings.get("proxies"),
+            transport_settings,
+            reload,
+            name,
+        )
+    return None
+
+
+def build_metrics(settings: Mapping[str, Any]) -> PrometheusMetrics:
     metrics = settings.get("metrics", {})
-    return PrometheusMetrics(**metrics)
+    return get_blacksmith_metrics(**metrics)
 
 
 def build_middlewares(
@@ -79,29 +166,74 @@ def build_middlewares(
         yield cls(settings, metrics).build()
 
 
-async def client_factory(name: str = "default") -> AsyncClientFactory[Any]:
-    settings = get_clients().get(name)
-    if settings is None:
-        raise RuntimeError(f"Client {name} does not exists")
-    sd = build_sd(settings)
-    timeout = settings.get("timeout", {})
-    collection_parser = build_collection_parser(settings)
-    transport = build_transport()
+async def client_factory(
+    name: str = "default", reload: bool = False, measure: MeasureHook = no_measure
+) -> AsyncClientFactory[Any]:
+    """
+    Build the client factory of a client.
+
+    :param reload: the client is reloaded, its transport pool can be replaced.
+    :param measure: measure the steps of the build, while profiling.
+    """
+    config = get_client_config(name)
+    settings = config.settings
+    with measure(KIND_SD, name):
+        sd = build_sd(settings)
+    with measure(KIND_TRANSPORT, name):
+        transport = (
+            config.transport()
+            if config.transport
+            else build_client_transport(settings, reload, name)
+        )
     cli: AsyncClientFactory[Any] = AsyncClientFactory(
         sd,
-        proxies=settings.get("proxies"),
-        verify_certificate=settings.get("verify_certificate", True),
-        timeout=HTTPTimeout(**timeout),
-        collection_parser=collection_parser,
-        transport=transport() if transport else None,
+        proxies=config.proxies,
+        verify_certificate=config.verify_certificate,
+        timeout=config.timeout,
+        collection_parser=config.collection_parser,
+        transport=transport,
     )
-    metrics = build_metrics(settings)
-    for middleware in build_middlewares(settings, metrics):
-        cli.add_middleware(middleware)
-    await cli.initialize()
+    with measure(KIND_MIDDLEWARES, name):
+        if isinstance(sd, AsyncBalancedDiscovery) and (
+            "load_balancer" in settings or sd.zone_affinity is not None
+        ):
+            # the innermost middleware, to measure the latency of the instances
+            cli.add_middleware(AsyncLoadBalancerMiddleware(sd.load_balancer))
+        metrics = build_metrics(settings)
+        for builder in config.middlewares:
+            cli.add_middleware(builder(settings, metrics).build())
+        # the outermost middleware, to drain the api calls while shutting down,
+        # or while reloading the client
+        cli.add_middleware(AsyncInFlightMiddleware(AsyncInFlight(in_flight)))
+    with measure(KIND_INITIALIZE, name):
+        await cli.initialize()
     return cli
 
 
+def get_in_flight(cli: AsyncClientFactory[Any]) -> AsyncInFlight:
+    """The api calls in flight of a client factory."""
+    for middleware in cli.middlewares:
+        if isinstance(middleware, AsyncInFlightMiddleware):
+            return middleware.in_flight
+    return AsyncInFlight()
+
+
+async def close_client_factory(cli: AsyncClientFactory[Any]) -> None:
+    """
+    Close the transport, the service discovery and the middlewares.
+
+    The transports of the registry are shared by the clients, they are
+    closed by the registry.
+    """
+    resources = (cli.sd, *cli.middlewares)
+    if cli.transport not in transports:
+        resources = (cli.transport, *resources)
+    for resource in resources:
+        close = getattr(resource, "aclose", None)
+        if close is not None:
+            await close()
+
+
 def build_middlewares_factories(
     settings: Mapping[str, Any],
 ) -> Iterable[AsyncAbstractMiddlewareFactoryBuilder]:
@@ -112,8 +244,36 @@ def build_middlewares_factories(
 
 
 def middleware_factories(name: str = "default"):
-    settings = get_clients()[name]
-    return list(build_middlewares_factories(settings))
+    config = get_client_config(name)
+    return [builder(config.settings) for builder in config.middleware_factories]
+
+
+def response_validation(name: str = "default") -> Optional[ResponseValidation]:
+    config = get_client_config(name)
+    if "response_validation" not in config.settings:
+        return None
+    return ResponseValidation(**config.settings["response_validation"])
+
+
+def batch_configs(
+    name: str = "default",
+) -> Mapping[tuple[ClientName, str], BatchConfig]:
+    config = get_client_config(name)
+    return build_batch_configs(config.settings.get("batch", {}))
+
+
+def warm_up() -> None:
+    """
+    Prepare the parts of the clients that don't do any I/O.
+
+    The settings are compiled, and the router endpoints formatted, before a
+    prefork server forks its workers, that share them.
+    """
+    for error in compile_clients().values():
+        raise error
+    for config in get_client_configs().values():
+        if config.settings["sd"] == "router":
+            AsyncCompiledRouterDiscovery(**config.settings["router_sd_config"])
 
 
 class AsyncClientProxy:
@@ -121,32 +281,190 @@ class AsyncClientProxy:
         self,
         client_factory: AsyncClientFactory[Any],
         middlewares: list[AsyncHTTPMiddleware],
+        response_validation: Optional[ResponseValidation] = None,
+        batch_configs: Optional[Mapping[tuple[ClientName, str], BatchConfig]] = None,
     ):
         self.client_factory = client_factory
         self.middlewares = middlewares
+        self.response_validation = response_validation
+        # the items loaded by the bulk calls are kept by the proxy
+        self.batch_loader = AsyncBatchLoader(batch_configs) if batch_configs else None
 
     async def __call__(self, client_name: ClientName) -> AsyncClient[Any]:
+        load_client(client_name)
+        start = time.perf_counter()
         cli = await self.client_factory(client_name)
+        last_resolution.set((client_name, time.perf_counter() - start))
         for middleware in self.middlewares:
             cli.add_middleware(middleware)
+        if self.response_validation is not None:
+            cli.resources = self.response_validation.get_resources(
+                client_name, cli.resources
+            )
+        if self.batch_loader is not None and self.batch_loader.has_client(client_name):
+            cli = AsyncBatchedClient(cli, self.batch_loader)
         return cli
 
+    async def stream_collection(
+        self,
+        client_name: ClientName,
+        resource: str,
+        params: Optional[Mapping[str, Any]] = None,
+        prefetch: bool = True,
+    ) -> AsyncIterator[Any]:
+        """
+        Iterate over the items of a collection, following the pagination links.
+
+        The pages are fetched lazily, the next one while the items of the
+        current one are consumed.
+        """
+        api = await self(client_name)
+        stream = AsyncCollectionStream(getattr(api, resource), params, prefetch)
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            await stream.aclose()
+
 
 class AsyncDjBlacksmithClient:
     client_factories: ClassVar[dict[str, AsyncClientFactory[Any]]] = {}
     middleware_factories: ClassVar[
         dict[str, list[AsyncAbstractMiddlewareFactoryBuilder]]
     ] = {}
+    response_validations: ClassVar[dict[str, Optional[ResponseValidation]]] = {}
+    batch_configs: ClassVar[
+        dict[str, Mapping[tuple[ClientName, str], BatchConfig]]
+    ] = {}
+    # the settings the client factories have been built with
+    client_settings: ClassVar[dict[str, Mapping[str, Any]]] = {}
 
     def __init__(self, request: HttpRequest):
         self.request = request
 
+    @property
+    def call_log(self) -> CallLog:
+        """Api calls recorded for the request, by the N+1 detector."""
+        return get_call_log(self.request)
+
+    @classmethod
+    async def aclose(cls, timeout: float = 30.0) -> None:
+        """
+        Close the clients, while shutting down.
+
+        The api calls in flight are drained, up to ``timeout`` seconds, then
+        the connections, the service discoveries and the redis clients are
+        closed.
+        """
+        if not await in_flight.wait(timeout):
+            log.warning(
+                "Closing the clients with %d api calls in flight", in_flight.count
+            )
+        await reload_listener.aclose()
+        factories = list(cls.client_factories.values())
+        cls.client_factories.clear()
+        for factory in factories:
+            await close_client_factory(factory)
+        await transports.aclose()
+
+    @classmethod
+    async def reload(cls, names: Iterable[str], timeout: float = 30.0) -> None:
+        """
+        Rebuild the client factories, after their settings have been reloaded.
+
+        The factories already built with the current settings are kept, the
+        settings are reloaded once for the async and the sync clients.
+        The new factories replace the old ones, that are closed when their api
+        calls in flight are drained, up to ``timeout`` seconds.
+        """
+        built: dict[str, tuple[AsyncClientFactory[Any], Any, Any, Any, Any]] = {}
+        try:
+            for name in names:
+                if name not in cls.client_factories:
+                    # built on its first use, with the new settings
+                    continue
+                settings = get_client_config(name).settings
+                if settings == cls.client_settings.get(name):
+                    continue
+                built[name] = (
+                    await client_factory(name, reload=True),
+                    middleware_factories(name),
+                    response_validation(name),
+                    batch_configs(name),
+                    settings,
+                )
+        except Exception:
+            # the clients keep their factories
+            await cls.release([factory for factory, *_ in built.values()])
+            raise
+        if not built:
+            return
+
+        log.info("Reloading the blacksmith clients %s", ", ".join(built))
+        old_factories: list[AsyncClientFactory[Any]] = []
+        for name, build in built.items():
+            new_factory, middlewares, validation, batch, settings = build
+            cls.middleware_factories[name] = middlewares
+            cls.response_validations[name] = validation
+            cls.batch_configs[name] = batch
+            cls.client_settings[name] = settings
+            old_factories.append(cls.client_factories[name])
+            cls.client_factories[name] = new_factory
+        for factory in old_factories:
+            factory_in_flight = get_in_flight(factory)
+            if not await factory_in_flight.wait(timeout):
+                log.warning(
+                    "Closing a reloaded client with %d api calls in flight",
+                    factory_in_flight.count,
+                )
+        await cls.release(old_factories)
+
+    @classmethod
+    async def release(cls, factories: Iterable[AsyncClientFactory[Any]]) -> None:
+        """
+        Close client factories no longer used.
+
+        Their transports are closed, unless the other clients use them.
+        """
+        in_use = [factory.transport for factory in cls.client_factories.values()]
+        for factory in factories:
+            if not any(transport is factory.transport for transport in in_use):
+                transports.discard(factory.transport)
+            await close_client_factory(factory)
+
     async def __call__(self, factory_name: str = "default") -> AsyncClientProxy:
+        reload_listener.start()
         if factory_name not in self.client_factories:
+            settings = get_client_config(factory_name).settings
             self.client_factories[factory_name] = await client_factory(factory_name)
             self.middleware_factories[factory_name] = middleware_factories(factory_name)
+            self.response_validations[factory_name] = response_validation(factory_name)
+            self.batch_configs[factory_name] = batch_configs(factory_name)
+            self.client_settings[factory_name] = settings
 
         return AsyncClientProxy(
             self.client_factories[factory_name],
             [m(self.request) for m in self.middleware_factories[factory_name]],
+            self.response_validations[factory_name],
+            self.batch_configs[factory_name],
         )
+
+
+def reset_after_fork() -> None:
+    """
+    Forget the client factories, and the transports, in a forked process.
+
+    Their connections, redis pools and background tasks belong to the parent
+    process, the child process build its own on its first api call.
+    """
+    AsyncDjBlacksmithClient.client_factories.clear()
+    transports.reset()
+    reload_listener.reset()
+
+
+reload_listener = AsyncReloadListener(AsyncDjBlacksmithClient.reload)
+"""Reload the settings of the clients, broadcasted by redis."""
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_after_fork)
@@ -1,9 +1,14 @@
 """Build Blacksmith middlewares from Django settings."""
 
 import abc
+import logging
+import time
 from collections.abc import Mapping
-from typing import Any
+from dataclasses import asdict, replace
+from datetime import timedelta
+from typing import Any, Optional
 
+import httpx
 from blacksmith import (
     AsyncCircuitBreakerMiddleware,
     AsyncHTTPAddHeadersMiddleware,
@@ -11,10 +16,29 @@ from blacksmith import (
     AsyncHTTPCacheMiddleware,
     AsyncHTTPMiddleware,
     AsyncPrometheusMiddleware,
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
     PrometheusMetrics,
 )
+from blacksmith.domain.registry import registry
+from blacksmith.domain.typing import AsyncMiddleware
+from blacksmith.typing import ClientName, Path
 from django.utils.module_loading import import_string
-from redis import asyncio as aioredis
+
+from dj_blacksmith._metrics import get_counter
+from dj_blacksmith.client._concurrency import AsyncInFlight, AsyncRedis
+from dj_blacksmith.client.balancer import LoadBalancer
+from dj_blacksmith.client.timing import (
+    CallTimings,
+    RateLimiter,
+    current_timings,
+    last_resolution,
+    observe_metrics,
+)
+
+log = logging.getLogger(__name__)
 
 
 class AsyncHTTPMiddlewareBuilder(abc.ABC):
@@ -54,16 +78,175 @@ class AsyncHTTPCacheMiddlewareBuilder(AsyncHTTPMiddlewareBuilder):
     """Build HTTP Cache Middleware."""
 
     def build(self) -> AsyncHTTPCacheMiddleware:
+        return AsyncRedisHTTPCacheMiddleware(**self.build_kwargs())
+
+    def build_kwargs(self) -> dict[str, Any]:
+        """The parameters of the middleware, from the ``http_cache`` settings."""
         settings = self.settings["http_cache"]
-        cache = aioredis.from_url(settings["redis"])  # type: ignore
+        cache = AsyncRedis.from_url(settings["redis"])
         policy = import_string(settings.get("policy", "blacksmith.CacheControlPolicy"))
         srlz = import_string(settings.get("serializer", "blacksmith.JsonSerializer"))
-        return AsyncHTTPCacheMiddleware(
-            cache=cache,  # type: ignore
-            policy=policy(),
-            metrics=self.metrics,
-            serializer=srlz(),
+        return {
+            "cache": cache,
+            "policy": policy(),
+            "metrics": self.metrics,
+            "serializer": srlz(),
+        }
+
+
+class AsyncConditionalHTTPCacheMiddlewareBuilder(AsyncHTTPCacheMiddlewareBuilder):
+    """Build HTTP Cache Middleware, that revalidates the expired responses."""
+
+    def build(self) -> AsyncHTTPCacheMiddleware:
+        settings = self.settings["http_cache"]
+        return AsyncConditionalHTTPCacheMiddleware(
+            **self.build_kwargs(),
+            revalidate_ttl=settings.get("revalidate_ttl", 86400),
+        )
+
+
+class AsyncRedisHTTPCacheMiddleware(AsyncHTTPCacheMiddleware):
+    """The http cache middleware, that closes its redis client."""
+
+    def __init__(self, cache: AsyncRedis, **kwargs: Any):
+        super().__init__(cache, **kwargs)  # type: ignore
+        self.redis = cache
+
+    async def aclose(self) -> None:
+        """Close the connections to redis."""
+        await self.redis.close()
+
+
+REVALIDATE_PREFIX = "revalidate:"
+REFRESHED_HEADERS = ("age", "cache-control", "date", "etag", "expires", "vary")
+"""The headers of a ``304 Not Modified`` response updating the kept response."""
+
+
+class AsyncConditionalHTTPCacheMiddleware(AsyncRedisHTTPCacheMiddleware):
+    """
+    The http cache middleware, that revalidates the expired responses.
+
+    The responses having an ``ETag`` or a ``Last-Modified`` header are kept
+    ``revalidate_ttl`` seconds. Once expired, the request is sent with the
+    ``If-None-Match`` and ``If-Modified-Since`` headers, and a
+    ``304 Not Modified`` response reuses the kept body, and is cached again.
+    """
+
+    def __init__(self, cache: AsyncRedis, revalidate_ttl: int = 86400, **kwargs: Any):
+        super().__init__(cache, **kwargs)
+        self.revalidate_ttl = timedelta(seconds=revalidate_ttl)
+
+    def __call__(self, next: AsyncMiddleware) -> AsyncMiddleware:
+        return super().__call__(self.revalidate(next))
+
+    def revalidate(self, next: AsyncMiddleware) -> AsyncMiddleware:
+        """Send the request of a missing response, conditional if it is kept."""
+
+        async def handle(
+            req: HTTPRequest,
+            client_name: ClientName,
+            path: Path,
+            timeout: HTTPTimeout,
+        ) -> HTTPResponse:
+            if not self._policy.handle_request(req, client_name, path):
+                return await next(req, client_name, path, timeout)
+            kept = await self.get_kept(client_name, path, req)
+            if kept is None:
+                return await next(req, client_name, path, timeout)
+
+            kept_headers = httpx.Headers(kept.headers)
+            headers = dict(req.headers)
+            if "etag" in kept_headers:
+                headers["If-None-Match"] = kept_headers["etag"]
+            if "last-modified" in kept_headers:
+                headers["If-Modified-Since"] = kept_headers["last-modified"]
+            try:
+                resp = await next(
+                    replace(req, headers=headers), client_name, path, timeout
+                )
+            except HTTPError as exc:
+                if exc.response.status_code != 304:
+                    raise
+                resp = exc.response
+            if resp.status_code != 304:
+                self.inc_revalidated(client_name, req.method, path, "modified")
+                return resp
+            self.inc_revalidated(client_name, req.method, path, "not_modified")
+            return self.refresh(kept, resp)
+
+        return handle
+
+    def refresh(self, kept: HTTPResponse, not_modified: HTTPResponse) -> HTTPResponse:
+        """The kept response, with the headers of the ``304`` response."""
+        headers = httpx.Headers(kept.headers)
+        for key, val in httpx.Headers(not_modified.headers).items():
+            if key in REFRESHED_HEADERS:
+                headers[key] = val
+        return HTTPResponse(kept.status_code, dict(headers.items()), kept.json)
+
+    async def cache_response(
+        self,
+        client_name: ClientName,
+        path: Path,
+        req: HTTPRequest,
+        resp: HTTPResponse,
+    ) -> bool:
+        """Cache the response, and keep it to revalidate it once expired."""
+        is_cached = await super().cache_response(client_name, path, req, resp)
+        headers = httpx.Headers(resp.headers)
+        if (
+            resp.status_code != 200
+            or "no-store" in headers.get("cache-control", "")
+            or ("etag" not in headers and "last-modified" not in headers)
+        ):
+            return is_cached
+        vary = [
+            field.strip().lower()
+            for field in headers.get("vary", "").split(",")
+            if field.strip()
+        ]
+        vary_key = self._policy.get_vary_key(client_name, path, req)
+        await self._cache.set(
+            REVALIDATE_PREFIX + vary_key,
+            self._serializer.dumps(vary),
+            self.revalidate_ttl,
+        )
+        response_cache_key = self._policy.get_response_cache_key(
+            client_name, path, req, vary
+        )
+        kept = replace(resp, headers=dict(headers.items()))
+        await self._cache.set(
+            REVALIDATE_PREFIX + response_cache_key,
+            self._serializer.dumps(asdict(kept)),
+            self.revalidate_ttl,
+        )
+        return is_cached
+
+    async def get_kept(
+        self, client_name: ClientName, path: Path, req: HTTPRequest
+    ) -> Optional[HTTPResponse]:
+        """The response kept to be revalidated."""
+        vary_key = self._policy.get_vary_key(client_name, path, req)
+        vary_val = await self._cache.get(REVALIDATE_PREFIX + vary_key)
+        if not vary_val:
+            return None
+        vary = self._serializer.loads(vary_val)
+        response_cache_key = self._policy.get_response_cache_key(
+            client_name, path, req, vary
         )
+        val = await self._cache.get(REVALIDATE_PREFIX + response_cache_key)
+        if not val:
+            return None
+        return HTTPResponse(**self._serializer.loads(val))
+
+    def inc_revalidated(
+        self, client_name: ClientName, method: str, path: Path, state: str
+    ) -> None:
+        get_counter(
+            "blacksmith_cache_revalidated",
+            "Expired responses revalidated by a conditional request",
+            ["client_name", "method", "path", "state"],
+        ).labels(client_name, method, path, state).inc()
 
 
 class AsyncHTTPAddHeadersMiddlewareBuilder(AsyncHTTPMiddlewareBuilder):
@@ -80,3 +263,180 @@ class AsyncHTTPBearerMiddlewareBuilder(AsyncHTTPMiddlewareBuilder):
     def build(self) -> AsyncHTTPBearerMiddleware:
         headers = self.settings["bearer_token"]
         return AsyncHTTPBearerMiddleware(headers)
+
+
+class AsyncSlowCallLogMiddleware(AsyncHTTPMiddleware):
+    """
+    Log the api calls slower than a threshold, as structured records.
+
+    The latencies are the one measured by the prometheus and the http cache
+    middlewares, when they are installed after this one. Otherwise, the
+    latency of the request is measured by this middleware. The latency of the
+    transport is measured by the pooled transports, and is None for the
+    other transports.
+
+    :param threshold: default threshold, in seconds.
+    :param thresholds: threshold per client name, in seconds.
+    :param rate_limiter: sample and limit the number of records.
+    """
+
+    def __init__(
+        self,
+        threshold: float,
+        thresholds: Mapping[str, float],
+        rate_limiter: RateLimiter,
+    ):
+        self.threshold = threshold
+        self.thresholds = thresholds
+        self.rate_limiter = rate_limiter
+
+    def __call__(self, next: AsyncMiddleware) -> AsyncMiddleware:
+        async def handle(
+            req: HTTPRequest,
+            client_name: ClientName,
+            path: Path,
+            timeout: HTTPTimeout,
+        ) -> HTTPResponse:
+            timings = CallTimings()
+            token = current_timings.set(timings)
+            start = time.perf_counter()
+            status_code: Optional[int] = None
+            try:
+                resp = await next(req, client_name, path, timeout)
+                status_code = resp.status_code
+            except HTTPError as exc:
+                status_code = exc.response.status_code
+                raise exc
+            finally:
+                current_timings.reset(token)
+                if timings.request is None:
+                    # no prometheus middleware measured the latency for us
+                    timings.request = time.perf_counter() - start
+                self.log_slow_call(req, client_name, path, status_code, timings)
+            return resp
+
+        return handle
+
+    def log_slow_call(
+        self,
+        req: HTTPRequest,
+        client_name: ClientName,
+        path: Path,
+        status_code: Optional[int],
+        timings: CallTimings,
+    ) -> None:
+        latency = timings.request
+        threshold = self.thresholds.get(client_name, self.threshold)
+        if latency is not None and latency < threshold:
+            return
+        if latency is None and status_code is not None:
+            # the latency has not been measured on this call
+            return
+
+        accepted, suppressed = self.rate_limiter.acquire()
+        if suppressed:
+            log.warning("%d slow api calls have not been logged", suppressed)
+        if not accepted:
+            return
+
+        resolution = last_resolution.get()
+        service, version = registry.client_service.get(client_name, (None, None))
+        record = {
+            "client_name": client_name,
+            "service": service,
+            "version": version,
+            "method": req.method,
+            "path": path,
+            "status_code": status_code,
+            "latency": latency,
+            "sd_latency": (
+                resolution[1]
+                if resolution is not None and resolution[0] == client_name
+                else None
+            ),
+            "cache_latency": timings.cache,
+            "transport_latency": timings.transport,
+        }
+        log.warning(
+            "Slow api call %s - %s %s",
+            client_name,
+            req.method,
+            path,
+            extra={"blacksmith": record},
+        )
+
+
+class AsyncSlowCallLogMiddlewareBuilder(AsyncHTTPMiddlewareBuilder):
+    """Build Slow Call Log Middleware."""
+
+    def build(self) -> AsyncSlowCallLogMiddleware:
+        settings = self.settings.get("slow_call_log", {})
+        observe_metrics(self.metrics)
+        return AsyncSlowCallLogMiddleware(
+            threshold=settings.get("threshold", 1.0),
+            thresholds=settings.get("thresholds", {}),
+            rate_limiter=RateLimiter(
+                sample_rate=settings.get("sample_rate", 1.0),
+                max_records=settings.get("max_records", 10),
+                interval=settings.get("interval", 60.0),
+            ),
+        )
+
+
+class AsyncLoadBalancerMiddleware(AsyncHTTPMiddleware):
+    """
+    Feed the load balancer with the requests in flight, the latencies and the
+    errors of the instances.
+
+    It is installed by the client factory when a load balancer is configured.
+    """
+
+    def __init__(self, load_balancer: LoadBalancer):
+        self.load_balancer = load_balancer
+
+    def __call__(self, next: AsyncMiddleware) -> AsyncMiddleware:
+        async def handle(
+            req: HTTPRequest,
+            client_name: ClientName,
+            path: Path,
+            timeout: HTTPTimeout,
+        ) -> HTTPResponse:
+            endpoint = req.url_pattern[: len(req.url_pattern) - len(path)]
+            self.load_balancer.on_request(endpoint)
+            start = time.perf_counter()
+            failed = True
+            try:
+                resp = await next(req, client_name, path, timeout)
+                failed = False
+            except HTTPError as exc:
+                failed = exc.is_server_error
+                raise exc
+            finally:
+                self.load_balancer.on_response(
+                    endpoint, time.perf_counter() - start, failed
+                )
+            return resp
+
+        return handle
+
+
+class AsyncInFlightMiddleware(AsyncHTTPMiddleware):
+    """Count the api calls in flight, to drain them while shutting down."""
+
+    def __init__(self, in_flight: AsyncInFlight):
+        self.in_flight = in_flight
+
+    def __call__(self, next: AsyncMiddleware) -> AsyncMiddleware:
+        async def handle(
+            req: HTTPRequest,
+            client_name: ClientName,
+            path: Path,
+            timeout: HTTPTimeout,
+        ) -> HTTPResponse:
+            self.in_flight.enter()
+            try:
+                return await next(req, client_name, path, timeout)
+            finally:
+                self.in_flight.exit()
+
+        return handle
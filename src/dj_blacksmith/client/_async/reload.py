@@ -0,0 +1,111 @@
+"""
+Reload the settings of the clients, without restarting the workers.
+
+The settings are broadcasted with redis pub/sub by the ``blacksmith_reload``
+command, every worker listen to them in the background.
+"""
+
+import json
+import logging
+from collections.abc import Mapping
+from typing import Any, Callable, Optional
+
+from redis.exceptions import RedisError
+
+from dj_blacksmith._settings import get_reload
+from dj_blacksmith.client._concurrency import (
+    AsyncBackgroundTask,
+    AsyncRedis,
+    AsyncStopEvent,
+)
+from dj_blacksmith.client.config import (
+    get_client_overrides,
+    override_client_settings,
+    restore_client_overrides,
+)
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = "dj_blacksmith:reload"
+
+
+class AsyncReloadListener:
+    """
+    Listen to the settings broadcasted, and rebuild the clients.
+
+    The listener is started on the first use of a client, when the
+    ``BLACKSMITH_RELOAD`` setting is set.
+
+    :param on_reload: rebuild the client factories, from the names of the
+        clients of a message, and the time to drain the api calls of the old
+        ones. The settings are reloaded once per process, so the factories
+        built with the current settings have to be kept.
+    """
+
+    def __init__(self, on_reload: Callable[[list[str], float], Any]):
+        self.on_reload = on_reload
+        self.task: Optional[AsyncBackgroundTask] = None
+        self.stop = AsyncStopEvent()
+
+    def start(self) -> None:
+        if self.stop.is_set() or (self.task is not None and self.task.is_running()):
+            return
+        settings = get_reload()
+        if settings:
+            self.task = AsyncBackgroundTask(self.listen, settings)
+            self.task.start()
+
+    async def listen(self, settings: Mapping[str, Any]) -> None:
+        redis = AsyncRedis.from_url(settings["redis"])
+        pubsub = redis.pubsub()
+        try:
+            while not self.stop.is_set():
+                try:
+                    if not pubsub.subscribed:
+                        await pubsub.subscribe(settings.get("channel", DEFAULT_CHANNEL))
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=1.0
+                    )
+                except RedisError as exc:
+                    log.error("Unable to listen to the blacksmith reloads: %s", exc)
+                    await self.stop.wait(1.0)
+                    continue
+                if message is not None:
+                    await self.reload(
+                        message["data"], settings.get("drain_timeout", 30.0)
+                    )
+        finally:
+            await pubsub.reset()
+            await redis.close()
+
+    async def reload(self, data: bytes, timeout: float) -> None:
+        """
+        Reload the settings of a message, and rebuild their clients.
+
+        The previous settings are restored if the clients can't be rebuilt.
+        """
+        overrides = get_client_overrides()
+        try:
+            clients = json.loads(data)["clients"]
+            # the other listener of the process may have reloaded them
+            override_client_settings(clients)
+        except (ValueError, KeyError, TypeError, RuntimeError) as exc:
+            log.error("Invalid blacksmith settings reloaded: %s", exc)
+            return
+        try:
+            await self.on_reload(list(clients), timeout)
+        except Exception:
+            restore_client_overrides(overrides)
+            log.exception("Unable to reload the blacksmith clients")
+
+    def reset(self) -> None:
+        """Forget the listener, without stopping it, in a forked process."""
+        self.task = None
+        self.stop = AsyncStopEvent()
+
+    async def aclose(self) -> None:
+        """Stop listening."""
+        self.stop.set()
+        if self.task is not None:
+            await self.task.cancel()
+            self.task = None
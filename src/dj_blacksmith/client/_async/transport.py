@@ -0,0 +1,324 @@
+"""Transports that keep their connections, configured in the client settings."""
+
+import importlib.util
+import time
+from collections.abc import Hashable, Mapping
+from typing import Any, Optional, cast
+
+import httpx
+from blacksmith import (
+    AsyncAbstractTransport,
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    HTTPTimeoutError,
+)
+from blacksmith.domain.model import HTTPRawResponse
+from blacksmith.service._async.adapters.httpx import build_headers
+from blacksmith.service.http_body_serializer import serialize_response
+from blacksmith.service.ports import AsyncClient
+from blacksmith.typing import ClientName, Path, Proxies
+from django.utils.module_loading import import_string
+
+from dj_blacksmith._metrics import get_counter, get_gauge
+from dj_blacksmith.client._concurrency import AsyncLoopLocal
+from dj_blacksmith.client.json_codec import get_codec
+from dj_blacksmith.client.json_stream import JsonStreamDecoder, is_json
+from dj_blacksmith.client.timing import current_timings
+
+
+class AsyncPooledHttpxTransport(AsyncAbstractTransport):
+    """
+    A transport using httpx, that keeps a pool of connections.
+
+    The blacksmith httpx transport opens a new connection per request.
+
+    Using HTTP/2, the concurrent requests are multiplexed, as streams, on the
+    connections of the pool.
+
+    :param max_connections: maximum number of connections of the pool.
+    :param max_keepalive_connections: maximum number of idle connections kept.
+    :param keepalive_expiry: time to keep an idle connection, in seconds.
+    :param pool_timeout: time to wait for a connection of the pool, in seconds.
+    :param http2: negotiate HTTP/2, requires the h2 package.
+    :param http1: allow HTTP/1.1, disabled to use HTTP/2 without TLS.
+    :param uds: path of a unix domain socket, such as the one of a sidecar
+        proxy, used for every connections.
+    :param stream_json: decode the json bodies while they are received, the
+        items of an array, such as a collection, are decoded on their first
+        access.
+    :param json_codec: decode the json bodies with the codec, such as
+        ``orjson``, instead of the serializers of blacksmith.
+    :param pool: name of the pool, in the metrics, the name of the client that
+        built the transport when the pool is not named.
+    """
+
+    def __init__(
+        self,
+        verify_certificate: bool = True,
+        proxies: Optional[Proxies] = None,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5.0,
+        pool_timeout: Optional[float] = 5.0,
+        http2: bool = False,
+        http1: bool = True,
+        uds: Optional[str] = None,
+        stream_json: bool = False,
+        json_codec: Optional[str] = None,
+        pool: str = "default",
+    ):
+        super().__init__(verify_certificate, proxies)
+        if http2 and importlib.util.find_spec("h2") is None:
+            raise RuntimeError("HTTP/2 requires the h2 package")
+        if uds and proxies:
+            raise RuntimeError("A unix domain socket can't be used with proxies")
+        self.http2 = http2
+        self.http1 = http1
+        self.uds = uds
+        self.stream_json = stream_json
+        self.json_codec = get_codec(json_codec) if json_codec else None
+        self.pool = pool
+        self.requests = get_counter(
+            "blacksmith_transport_requests",
+            "Requests sent by the transports, per HTTP version.",
+            ["pool", "http_version"],
+        )
+        self.streams = get_gauge(
+            "blacksmith_transport_streams",
+            "Requests in flight on the connections of the transports.",
+            ["pool"],
+        ).labels(pool)
+        self.connections = get_gauge(
+            "blacksmith_transport_connections",
+            "Connections opened by the transports.",
+            ["pool"],
+        ).labels(pool)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.pool_timeout = pool_timeout
+        # the connections are bound to the event loop that opened them
+        self.clients = AsyncLoopLocal(self.build_client)
+
+    def build_client(self) -> AsyncClient:
+        if self.uds:
+            return AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    verify=self.verify_certificate,
+                    limits=self.limits,
+                    http1=self.http1,
+                    http2=self.http2,
+                    uds=self.uds,
+                )
+            )
+        return AsyncClient(
+            verify=self.verify_certificate,
+            proxies=self.proxies,  # type: ignore
+            limits=self.limits,
+            http1=self.http1,
+            http2=self.http2,
+        )
+
+    def count_connections(self, client: AsyncClient) -> Optional[int]:
+        """The connections opened by the client, None if they can't be counted."""
+        # httpx does not expose its connection pool
+        transport = getattr(client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        connections = getattr(pool, "connections", None)
+        return len(connections) if connections is not None else None
+
+    async def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: ClientName,
+        path: Path,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        client = self.clients.get()
+        self.streams.inc()
+        start = time.perf_counter()
+        try:
+            r = await client.send(
+                client.build_request(
+                    req.method,
+                    req.url,
+                    params=req.querystring,  # type: ignore
+                    headers=build_headers(req),
+                    content=req.body,
+                    timeout=httpx.Timeout(
+                        timeout.read, connect=timeout.connect, pool=self.pool_timeout
+                    ),
+                ),
+                stream=True,
+            )
+            try:
+                resp = await self.read(r)
+            finally:
+                await r.aclose()
+        except httpx.TimeoutException as exc:
+            raise HTTPTimeoutError(
+                f"{client_name} - {req.method} {path} - "
+                f"{exc.__class__.__name__} while calling {req.method} {req.url}"
+            ) from exc
+        finally:
+            self.streams.dec()
+            connections = self.count_connections(client)
+            if connections is not None:
+                self.connections.set(connections)
+            timings = current_timings.get()
+            if timings is not None:
+                timings.transport = time.perf_counter() - start
+
+        self.requests.labels(self.pool, r.http_version).inc()
+        if resp is None:
+            resp = serialize_response(cast(HTTPRawResponse, r))
+        if not r.is_success:
+            raise HTTPError(
+                f"{client_name} - {req.method} {path} - "
+                f"{r.status_code} {r.reason_phrase}",
+                req,
+                resp,
+            )
+        return resp
+
+    async def read(self, r: httpx.Response) -> Optional[HTTPResponse]:
+        """
+        Read the body of the response.
+
+        Using ``stream_json``, a json body is decoded while it is received,
+        using ``json_codec``, it is decoded by the codec. The other bodies are
+        decoded by blacksmith, and None is returned.
+        """
+        content_type = r.headers.get("Content-Type") or "application/json"
+        loads = self.json_codec.loads if self.json_codec else None
+        if (
+            not (self.stream_json or loads)
+            or not r.is_success
+            or r.status_code == 204
+            or not is_json(content_type)
+        ):
+            await r.aread()
+            return None
+        if not self.stream_json:
+            try:
+                json_ = loads(await r.aread())  # type: ignore
+            except ValueError:
+                json_ = {"error": r.text}
+            return HTTPResponse(r.status_code, r.headers, json_)
+        decoder = JsonStreamDecoder(loads)
+        async for chunk in r.aiter_bytes():
+            decoder.feed(chunk)
+        try:
+            json_ = decoder.close()
+        except ValueError:
+            json_ = {"error": "Invalid json body"}
+        return HTTPResponse(r.status_code, r.headers, json_)
+
+    async def aclose(self) -> None:
+        """Close the connections."""
+        for client in self.clients.pop_all():
+            await client.aclose()
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable version of a setting."""
+    if isinstance(value, Mapping):
+        return tuple(sorted((key, freeze(val)) for key, val in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(val) for val in value)
+    return value
+
+
+class AsyncTransportRegistry:
+    """
+    The transports of the process.
+
+    The clients that share a configuration share its transport, and so, its
+    pool of connections. A client configured with a ``pool`` name gets the
+    transport of that name, isolated from the other clients.
+    """
+
+    def __init__(self) -> None:
+        self.transports: dict[Hashable, AsyncAbstractTransport] = {}
+        self.configs: dict[Hashable, Hashable] = {}
+        self.retired: list[AsyncAbstractTransport] = []
+
+    def get(
+        self,
+        verify_certificate: bool,
+        proxies: Optional[Proxies],
+        settings: Mapping[str, Any],
+        reload: bool = False,
+        client_name: str = "default",
+    ) -> AsyncAbstractTransport:
+        """
+        The transport of the settings.
+
+        While reloading a client, a pool configured differently is replaced,
+        the replaced transport is retired, and kept for the clients using it.
+
+        A pool that is not named is labelled, in the metrics, by the name of the
+        client that built it.
+        """
+        params = dict(settings)
+        pool = params.pop("pool", None)
+        config = freeze((verify_certificate, proxies, params))
+        key = ("pool", pool) if pool else config
+        transport = self.transports.get(key)
+        if transport is not None and reload and self.configs[key] != config:
+            self.retired.append(self.transports.pop(key))
+            del self.configs[key]
+            transport = None
+        if transport is None:
+            cls: type[AsyncAbstractTransport] = AsyncPooledHttpxTransport
+            if "class" in params:
+                cls = import_string(params.pop("class"))
+            if issubclass(cls, AsyncPooledHttpxTransport):
+                params["pool"] = pool or client_name
+            transport = self.transports.setdefault(
+                key, cls(verify_certificate, proxies, **params)
+            )
+            self.configs.setdefault(key, config)
+        if self.configs[key] != config:
+            raise RuntimeError(f"Transport pool {pool} configured differently")
+        return transport
+
+    def __contains__(self, transport: Any) -> bool:
+        return any(
+            registered is transport
+            for registered in (*self.transports.values(), *self.retired)
+        )
+
+    def discard(self, transport: AsyncAbstractTransport) -> None:
+        """Forget a transport no longer used, so its owner can close it."""
+        for key, registered in list(self.transports.items()):
+            if registered is transport:
+                del self.transports[key]
+                del self.configs[key]
+        self.retired = [
+            registered for registered in self.retired if registered is not transport
+        ]
+
+    def reset(self) -> None:
+        """
+        Forget the transports, without closing their connections.
+
+        Used in a forked process, the connections belong to the parent.
+        """
+        self.transports.clear()
+        self.configs.clear()
+        self.retired.clear()
+
+    async def aclose(self) -> None:
+        """Close the connections of every transports."""
+        for transport in (*self.transports.values(), *self.retired):
+            close = getattr(transport, "aclose", None)
+            if close is not None:
+                await close()
+
+
+transports = AsyncTransportRegistry()
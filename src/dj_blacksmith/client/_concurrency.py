@@ -0,0 +1,378 @@
+"""
+Concurrency primitives shared by the async and the sync clients.
+
+The async version is used in the ``_async`` modules, unasync rename it to
+the sync version while generating the ``_sync`` modules.
+"""
+
+import asyncio
+import concurrent.futures
+import contextlib
+import contextvars
+import threading
+import time
+import weakref
+from collections.abc import Coroutine, Hashable, Mapping
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+import redis
+import redis.asyncio
+
+T = TypeVar("T")
+K = TypeVar("K", bound=Hashable)
+
+# the redis clients, used by the http cache middlewares
+AsyncRedis = redis.asyncio.Redis
+SyncRedis = redis.Redis
+
+
+class AsyncBackgroundTask:
+    """Run a coroutine function in a task of the running event loop."""
+
+    def __init__(self, func: Callable[..., Coroutine[Any, Any, Any]], *args: Any):
+        self.func = func
+        self.args = args
+        self.task: Optional[asyncio.Task[Any]] = None
+
+    def start(self) -> None:
+        self.task = asyncio.get_running_loop().create_task(self.func(*self.args))
+
+    def is_running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    async def join(self) -> None:
+        """Wait for the task to finish."""
+        if self.task is not None:
+            await self.task
+
+    async def cancel(self) -> None:
+        """Cancel the task, and wait for it."""
+        if self.task is not None and not self.task.done():
+            self.task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.task
+
+
+class SyncBackgroundTask:
+    """Run a function in a daemon thread."""
+
+    def __init__(self, func: Callable[..., Any], *args: Any):
+        self.func = func
+        self.args = args
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self.func, args=self.args, daemon=True)
+        self.thread.start()
+
+    def is_running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def join(self) -> None:
+        """Wait for the thread to finish."""
+        if self.thread is not None:
+            self.thread.join()
+
+    def cancel(self) -> None:
+        """
+        A thread can't be cancelled, the function has to watch a stop event.
+
+        The thread is a daemon, it does not prevent the process to exit.
+        """
+
+
+class AsyncPrefetch(Generic[T]):
+    """Run a coroutine function in a task, to get its result later."""
+
+    def __init__(self, func: Callable[..., Coroutine[Any, Any, T]], *args: Any):
+        self.task = asyncio.get_running_loop().create_task(func(*args))
+
+    async def result(self) -> T:
+        return await self.task
+
+    async def cancel(self) -> None:
+        """Cancel the task, and wait for it."""
+        if not self.task.done():
+            self.task.cancel()
+        with contextlib.suppress(Exception, asyncio.CancelledError):
+            await self.task
+
+
+class SyncPrefetch(Generic[T]):
+    """
+    Run a function in a daemon thread, to get its result later.
+
+    The function runs in a copy of the context, as a task would.
+    """
+
+    def __init__(self, func: Callable[..., T], *args: Any):
+        self.future: concurrent.futures.Future[T] = concurrent.futures.Future()
+        context = contextvars.copy_context()
+        self.thread = threading.Thread(
+            target=context.run, args=(self.run, func, *args), daemon=True
+        )
+        self.thread.start()
+
+    def run(self, func: Callable[..., T], *args: Any) -> None:
+        try:
+            self.future.set_result(func(*args))
+        except BaseException as exc:
+            self.future.set_exception(exc)
+
+    def result(self) -> T:
+        return self.future.result()
+
+    def cancel(self) -> None:
+        """
+        A thread can't be cancelled, its result is dropped.
+
+        The thread is a daemon, it does not prevent the process to exit.
+        """
+
+
+class AsyncBatch(Generic[K, T]):
+    """
+    Collect the keys added by the ready tasks, to load them together.
+
+    The keys are loaded on the next iteration of the event loop, so the
+    tasks that run concurrently, such as the ones of a ``gather``, share
+    the batch.
+    """
+
+    def __init__(self, func: Callable[[list[K]], Coroutine[Any, Any, Mapping[K, T]]]):
+        loop = asyncio.get_running_loop()
+        self.func = func
+        self.keys: dict[K, None] = {}
+        self.dispatched = False
+        self.future: asyncio.Future[Mapping[K, T]] = loop.create_future()
+        self.task: Optional[asyncio.Task[None]] = None
+        loop.call_soon(self.dispatch)
+
+    def add(self, key: K) -> bool:
+        """Add a key, False when the batch is already loading."""
+        if self.dispatched:
+            return False
+        self.keys[key] = None
+        return True
+
+    def dispatch(self) -> None:
+        self.dispatched = True
+        self.task = asyncio.get_running_loop().create_task(self.load())
+
+    async def load(self) -> None:
+        try:
+            self.future.set_result(await self.func(list(self.keys)))
+        except BaseException as exc:
+            self.future.set_exception(exc)
+
+    async def result(self, key: K) -> T:
+        # a cancelled caller does not cancel the batch of the other callers
+        results = await asyncio.shield(self.future)
+        return results[key]
+
+
+class SyncBatch(Generic[K, T]):
+    """
+    Collect the keys added until a result is needed, to load them together.
+
+    Without an event loop, the keys are loaded on the first call of
+    :meth:`result`, the keys added before are loaded together.
+    """
+
+    def __init__(self, func: Callable[[list[K]], Mapping[K, T]]):
+        self.func = func
+        self.keys: dict[K, None] = {}
+        self.dispatched = False
+        self.future: concurrent.futures.Future[Mapping[K, T]] = (
+            concurrent.futures.Future()
+        )
+        self.lock = threading.Lock()
+
+    def add(self, key: K) -> bool:
+        """Add a key, False when the batch is already loading."""
+        with self.lock:
+            if self.dispatched:
+                return False
+            self.keys[key] = None
+            return True
+
+    def load(self) -> None:
+        with self.lock:
+            if self.dispatched:
+                return
+            self.dispatched = True
+        try:
+            self.future.set_result(self.func(list(self.keys)))
+        except BaseException as exc:
+            self.future.set_exception(exc)
+
+    def result(self, key: K) -> T:
+        self.load()
+        return self.future.result()[key]
+
+
+class AsyncStopEvent:
+    """An event, used to stop the background tasks."""
+
+    def __init__(self) -> None:
+        # created lazily, to be bound to the running event loop
+        self.event: Optional[asyncio.Event] = None
+        self.stopped = False
+
+    def set(self) -> None:
+        self.stopped = True
+        if self.event is not None:
+            self.event.set()
+
+    def is_set(self) -> bool:
+        return self.stopped
+
+    async def wait(self, timeout: float) -> bool:
+        """Sleep until the event is set, or the timeout, and return the event."""
+        if self.event is None:
+            self.event = asyncio.Event()
+            if self.stopped:
+                self.event.set()
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self.event.wait(), timeout)
+        return self.stopped
+
+
+class SyncStopEvent:
+    """An event, used to stop the background threads."""
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+
+    def set(self) -> None:
+        self.event.set()
+
+    def is_set(self) -> bool:
+        return self.event.is_set()
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep until the event is set, or the timeout, and return the event."""
+        return self.event.wait(timeout)
+
+
+class AsyncLoopLocal(Generic[T]):
+    """
+    A value per event loop, such as a pool of connections.
+
+    The value is created on the first access in every event loop.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self.values: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, T] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self) -> T:
+        loop = asyncio.get_running_loop()
+        value = self.values.get(loop)
+        if value is None:
+            value = self.values[loop] = self.factory()
+        return value
+
+    def pop_all(self) -> list[T]:
+        """Remove the values, and return them."""
+        values = list(self.values.values())
+        self.values.clear()
+        return values
+
+
+class SyncLoopLocal(Generic[T]):
+    """
+    A value shared by the threads, such as a pool of connections.
+
+    The value is created on the first access.
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self.value: Optional[T] = None
+        self.lock = threading.Lock()
+
+    def get(self) -> T:
+        value = self.value
+        if value is None:
+            with self.lock:
+                if self.value is None:
+                    self.value = self.factory()
+                value = self.value
+        return value
+
+    def pop_all(self) -> list[T]:
+        """Remove the value, and return it."""
+        with self.lock:
+            values = [] if self.value is None else [self.value]
+            self.value = None
+        return values
+
+
+class AsyncInFlight:
+    """
+    Count the api calls in flight, to drain them.
+
+    :param parent: a counter of the api calls of every client factory, that
+        counts the api calls of this one too.
+    """
+
+    def __init__(self, parent: Optional["AsyncInFlight"] = None) -> None:
+        self.count = 0
+        self.parent = parent
+
+    def enter(self) -> None:
+        self.count += 1
+        if self.parent is not None:
+            self.parent.enter()
+
+    def exit(self) -> None:
+        self.count -= 1
+        if self.parent is not None:
+            self.parent.exit()
+
+    async def wait(self, timeout: float, interval: float = 0.05) -> bool:
+        """Wait for the api calls to finish, return False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.count > 0:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(interval)
+        return True
+
+
+class SyncInFlight:
+    """
+    Count the api calls in flight, of every threads, to drain them.
+
+    :param parent: a counter of the api calls of every client factory, that
+        counts the api calls of this one too.
+    """
+
+    def __init__(self, parent: Optional["SyncInFlight"] = None) -> None:
+        self.count = 0
+        self.parent = parent
+        self.lock = threading.Lock()
+
+    def enter(self) -> None:
+        with self.lock:
+            self.count += 1
+        if self.parent is not None:
+            self.parent.enter()
+
+    def exit(self) -> None:
+        with self.lock:
+            self.count -= 1
+        if self.parent is not None:
+            self.parent.exit()
+
+    def wait(self, timeout: float, interval: float = 0.05) -> bool:
+        """Wait for the api calls to finish, return False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self.count > 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+        return True
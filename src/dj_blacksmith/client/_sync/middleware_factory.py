@@ -1,12 +1,31 @@
 """Middleware"""
 
 import abc
+import logging
 from collections.abc import Mapping
 from typing import Any
 
-from blacksmith import SyncHTTPAddHeadersMiddleware, SyncHTTPMiddleware
+from blacksmith import (
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    SyncHTTPAddHeadersMiddleware,
+    SyncHTTPMiddleware,
+)
+from blacksmith.domain.typing import SyncMiddleware
+from blacksmith.typing import ClientName, Path
 from django.http.request import HttpRequest
 
+from dj_blacksmith._metrics import get_counter
+from dj_blacksmith.client.call_log import (
+    CallLog,
+    NPlusOneError,
+    get_call_log,
+    get_view_name,
+)
+
+log = logging.getLogger(__name__)
+
 
 class SyncAbstractMiddlewareFactoryBuilder(abc.ABC):
     """Build the factory"""
@@ -37,3 +56,81 @@ class SyncForwardHeaderFactoryBuilder(SyncAbstractMiddlewareFactoryBuilder):
             if val:
                 headers[hdr] = val
         return SyncHTTPAddHeadersMiddleware(headers)
+
+
+class SyncNPlusOneDetectorMiddleware(SyncHTTPMiddleware):
+    """
+    Flag the path templates called more than ``threshold`` times in a request.
+
+    :param call_log: the call log of the incoming request.
+    :param view_name: name of the view, for the logs and the metrics.
+    :param threshold: number of calls allowed per path template.
+    :param raise_error: raise a :class:`NPlusOneError` instead of logging.
+    """
+
+    def __init__(
+        self,
+        call_log: CallLog,
+        view_name: str,
+        threshold: int,
+        raise_error: bool,
+    ):
+        self.call_log = call_log
+        self.view_name = view_name
+        self.threshold = threshold
+        self.raise_error = raise_error
+
+    def __call__(self, next: SyncMiddleware) -> SyncMiddleware:
+        def handle(
+            req: HTTPRequest,
+            client_name: ClientName,
+            path: Path,
+            timeout: HTTPTimeout,
+        ) -> HTTPResponse:
+            count = self.call_log.record(client_name, req.method, path)
+            if count > self.threshold:
+                self.detected(client_name, req.method, path, count)
+            return next(req, client_name, path, timeout)
+
+        return handle
+
+    def detected(self, client_name: str, method: str, path: str, count: int) -> None:
+        key = (client_name, method, path)
+        if self.raise_error:
+            raise NPlusOneError(self.view_name, key, count)
+        if count == self.threshold + 1:
+            log.warning(
+                "N+1 api calls detected in %s: %s - %s %s called more than %d times",
+                self.view_name,
+                client_name,
+                method,
+                path,
+                self.threshold,
+            )
+            get_counter(
+                "blacksmith_n_plus_one",
+                "Incoming requests that call the same path template too many times",
+                ["view", "client_name", "method", "path"],
+            ).labels(self.view_name, client_name, method, path).inc()
+
+
+class SyncNPlusOneDetectorFactoryBuilder(SyncAbstractMiddlewareFactoryBuilder):
+    """
+    Detect N+1 api calls, using the ``n_plus_one`` settings.
+
+    The counter of calls is shared by every clients built for the same
+    incoming request.
+    """
+
+    def __init__(self, settings: Mapping[str, Any]):
+        n_plus_one = settings.get("n_plus_one", {})
+        self.threshold: int = n_plus_one.get("threshold", 5)
+        self.raise_error: bool = n_plus_one.get("raise_error", False)
+
+    def __call__(self, request: HttpRequest) -> SyncNPlusOneDetectorMiddleware:
+        return SyncNPlusOneDetectorMiddleware(
+            get_call_log(request),
+            get_view_name(request),
+            self.threshold,
+            self.raise_error,
+        )
@@ -0,0 +1,88 @@
+"""
+Iterate over the items of a collection, following the pagination links.
+
+Only the current page, and the next one, prefetched in background, are kept
+in memory, whatever the size of the collection.
+"""
+
+from collections.abc import Iterator, Mapping
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from blacksmith import CollectionIterator, SyncRouteProxy
+from blacksmith.domain.model.params import Metadata
+
+from dj_blacksmith.client._concurrency import SyncPrefetch
+
+
+class SyncCollectionStream:
+    """
+    Stream the items of a collection, page per page.
+
+    The next page is given by the ``next`` link of the response, its query
+    string is merged in the parameters of the request, so the pagination
+    parameters have to be declared in the request model of the collection.
+    Override :meth:`next_params` for an other pagination.
+
+    The error of an api call is raised. When the iteration stops before the
+    last page, :meth:`aclose` cancels the prefetch of the next page.
+
+    :param route: the resource of a client, such as ``api.users``.
+    :param params: the parameters of the request of the first page.
+    :param prefetch: fetch the next page while the items of the current page
+        are consumed.
+    """
+
+    def __init__(
+        self,
+        route: SyncRouteProxy[Any, Any, Any],
+        params: Optional[Mapping[str, Any]] = None,
+        prefetch: bool = True,
+    ):
+        self.route = route
+        self.params = dict(params or {})
+        self.prefetch = prefetch
+        self.next_page: Optional[SyncPrefetch[CollectionIterator[Any]]] = None
+
+    def next_params(
+        self, meta: Metadata, params: Mapping[str, Any]
+    ) -> Optional[Mapping[str, Any]]:
+        """The parameters of the next page, None for the last page."""
+        link = meta.links.get("next")
+        if not link or not link.get("url"):
+            return None
+        next_params = {**params, **dict(parse_qsl(urlsplit(link["url"]).query))}
+        if next_params == params:
+            # a next link to the same page would never end
+            return None
+        return next_params
+
+    def fetch(self, params: Mapping[str, Any]) -> CollectionIterator[Any]:
+        resp = self.route.collection_get(dict(params))
+        if resp.is_err():
+            raise resp.unwrap_err()
+        return resp.unwrap()
+
+    def __iter__(self) -> Iterator[Any]:
+        params: Mapping[str, Any] = self.params
+        page = self.fetch(params)
+        while True:
+            next_params = self.next_params(page.meta, params)
+            if next_params is not None and self.prefetch:
+                self.next_page = SyncPrefetch(self.fetch, next_params)
+            for item in page:
+                yield item
+            if next_params is None:
+                return
+            if self.next_page is not None:
+                page = self.next_page.result()
+                self.next_page = None
+            else:
+                page = self.fetch(next_params)
+            params = next_params
+
+    def close(self) -> None:
+        """Cancel the prefetch of the next page."""
+        if self.next_page is not None:
+            self.next_page.cancel()
+            self.next_page = None
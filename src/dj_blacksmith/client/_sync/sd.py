@@ -0,0 +1,429 @@
+"""Service discoveries built from the client settings, on top of blacksmith."""
+
+import logging
+import os
+import time
+from collections.abc import Collection, Mapping, Sequence
+from typing import Any, Callable, Optional
+
+from blacksmith import (
+    HTTPRequest,
+    HTTPTimeout,
+    SyncAbstractServiceDiscovery,
+    SyncAbstractTransport,
+    SyncConsulDiscovery,
+    SyncNomadDiscovery,
+    SyncRouterDiscovery,
+)
+from blacksmith.domain.exceptions import UnregisteredServiceException
+from blacksmith.domain.registry import registry
+from blacksmith.service._sync.adapters.httpx import SyncHttpxTransport
+from blacksmith.typing import ServiceName, Url, Version
+
+from dj_blacksmith.client._concurrency import SyncBackgroundTask, SyncStopEvent
+from dj_blacksmith.client.balancer import LoadBalancer, ZoneAffinity
+
+log = logging.getLogger(__name__)
+
+ServiceKey = tuple[ServiceName, Version]
+
+
+class SyncCachingDiscovery(SyncAbstractServiceDiscovery):
+    """
+    Keep the endpoints resolved by a service discovery in memory.
+
+    An endpoint is refreshed in background when it is about to expire, and
+    the last known endpoint is served while the service discovery fails.
+
+    :param sd: the service discovery that resolves the endpoints.
+    :param ttl: time to live of the endpoints, in seconds.
+    :param refresh_ahead: delay before the expiration, in seconds, from which
+        the endpoint is served from the cache and refreshed in background.
+    """
+
+    def __init__(
+        self,
+        sd: SyncAbstractServiceDiscovery,
+        ttl: float = 30.0,
+        refresh_ahead: float = 5.0,
+        _clock: Callable[[], float] = time.monotonic,
+    ):
+        self.sd = sd
+        self.ttl = ttl
+        self.refresh_ahead = min(refresh_ahead, ttl)
+        self.clock = _clock
+        self.endpoints: dict[ServiceKey, tuple[Url, float]] = {}
+        self.refreshing: dict[ServiceKey, SyncBackgroundTask] = {}
+
+    def resolve(self, service: ServiceName, version: Version) -> Url:
+        """Resolve the endpoint using the service discovery, and keep it."""
+        endpoint = self.sd.get_endpoint(service, version)
+        self.endpoints[(service, version)] = (endpoint, self.clock())
+        return endpoint
+
+    def refresh(self, service: ServiceName, version: Version) -> None:
+        """Resolve the endpoint, keeping the last known one on failure."""
+        try:
+            self.resolve(service, version)
+        except Exception as exc:
+            log.warning(
+                "Unable to refresh the endpoint of %s/%s: %r", service, version, exc
+            )
+
+    def refresh_in_background(self, service: ServiceName, version: Version) -> None:
+        task: Optional[SyncBackgroundTask] = self.refreshing.get((service, version))
+        if task is not None and task.is_running():
+            return
+        task = SyncBackgroundTask(self.refresh, service, version)
+        self.refreshing[(service, version)] = task
+        task.start()
+
+    def close(self) -> None:
+        """Stop the refreshes, and close the service discovery."""
+        for task in self.refreshing.values():
+            task.cancel()
+        close = getattr(self.sd, "close", None)
+        if close is not None:
+            close()
+
+    def get_endpoint(self, service: ServiceName, version: Version) -> Url:
+        cached = self.endpoints.get((service, version))
+        if cached is None:
+            return self.resolve(service, version)
+        endpoint, resolved_at = cached
+        age = self.clock() - resolved_at
+        if age < self.ttl - self.refresh_ahead:
+            return endpoint
+        if age < self.ttl:
+            self.refresh_in_background(service, version)
+            return endpoint
+        try:
+            return self.resolve(service, version)
+        except Exception as exc:
+            log.warning(
+                "Unable to resolve the endpoint of %s/%s, "
+                "using the last known endpoint %s: %r",
+                service,
+                version,
+                endpoint,
+                exc,
+            )
+            # serve it, and retry in background, until the next expiration
+            self.endpoints[(service, version)] = (
+                endpoint,
+                self.clock() - self.ttl + self.refresh_ahead,
+            )
+            return endpoint
+
+
+class SyncBalancedDiscovery(SyncAbstractServiceDiscovery):
+    """
+    A discovery that chooses an instance of a service using a load balancer.
+
+    With a zone affinity, the instances of the local zone are preferred.
+    """
+
+    load_balancer: LoadBalancer
+    zone_affinity: Optional[ZoneAffinity]
+    zones: dict[Url, str]
+    """Zone of the instances, by endpoint."""
+
+    def init_balancing(
+        self,
+        load_balancer: Optional[LoadBalancer],
+        zone_affinity: Optional[Mapping[str, Any]],
+    ) -> None:
+        self.load_balancer = load_balancer or LoadBalancer()
+        self.zone_affinity = ZoneAffinity(**zone_affinity) if zone_affinity else None
+        self.zones = {}
+
+    def prune(self, endpoints: Collection[Url]) -> None:
+        """Forget the zone and the statistics of the instances that are gone."""
+        for endpoint in list(self.zones):
+            if endpoint not in endpoints:
+                self.zones.pop(endpoint, None)
+        self.load_balancer.prune(endpoints)
+
+    def choose(self, endpoints: Sequence[Url]) -> Url:
+        if self.zone_affinity is not None:
+            endpoints = self.zone_affinity.select(
+                endpoints, self.zones, self.load_balancer
+            )
+        return self.load_balancer.choose(endpoints)
+
+
+class SyncConsulWatchDiscovery(SyncBalancedDiscovery, SyncConsulDiscovery):
+    """
+    A discovery based on consul, that watches the services in background.
+
+    The first lookup of a service resolves its instances, then a task, or a
+    daemon thread for the sync client, runs consul blocking queries to update
+    them as soon as they change. The next lookups read the instances in memory.
+
+    It accepts the parameters of the consul discovery, and:
+
+    :param wait: maximum duration of a blocking query, in seconds.
+    :param retry_delay: delay before a new query when consul fails, in seconds.
+    :param passing_only: only use the instances passing their health checks,
+        instead of every instances of the catalog.
+    :param zone_affinity: parameters of the :class:`ZoneAffinity`, the zone of
+        the instances is read in the consul node meta.
+    :param load_balancer: choose the instance to use, randomly by default.
+    """
+
+    def __init__(
+        self,
+        addr: Url = "http://consul:8500/v1",
+        service_name_fmt: str = "{service}-{version}",
+        service_url_fmt: str = "http://{address}:{port}/{version}",
+        unversioned_service_name_fmt: str = "{service}",
+        unversioned_service_url_fmt: str = "http://{address}:{port}",
+        consul_token: str = "",
+        wait: float = 55.0,
+        retry_delay: float = 1.0,
+        passing_only: bool = True,
+        zone_affinity: Optional[Mapping[str, Any]] = None,
+        load_balancer: Optional[LoadBalancer] = None,
+        _transport: Optional[SyncAbstractTransport] = None,
+    ) -> None:
+        super().__init__(
+            addr,
+            service_name_fmt,
+            service_url_fmt,
+            unversioned_service_name_fmt,
+            unversioned_service_url_fmt,
+            consul_token,
+        )
+        self.addr = addr
+        self.consul_token = consul_token
+        self.wait = wait
+        self.retry_delay = retry_delay
+        self.passing_only = passing_only
+        self.init_balancing(load_balancer, zone_affinity)
+        self.transport = _transport or SyncHttpxTransport()
+        self.endpoints: dict[ServiceKey, list[Url]] = {}
+        self.watchers: dict[ServiceKey, SyncBackgroundTask] = {}
+        self.stopped = SyncStopEvent()
+
+    def fetch(
+        self, service: ServiceName, version: Version, index: Optional[int] = None
+    ) -> int:
+        """
+        Update the endpoints of the service, and return the consul index.
+
+        If the index is set, consul responds when the service has changed
+        since this index, or after ``wait`` seconds.
+        """
+        querystring: dict[str, Any] = {}
+        if index is not None:
+            querystring = {"index": index, "wait": f"{self.wait:g}s"}
+        path = "/catalog/service/{name}"
+        if self.passing_only:
+            path = "/health/service/{name}"
+            querystring["passing"] = "true"
+        headers = {}
+        if self.consul_token:
+            headers["Authorization"] = f"Bearer {self.consul_token}"
+        resp = self.transport(
+            HTTPRequest(
+                "GET",
+                f"{self.addr}{path}",
+                path={"name": self.format_service_name(service, version)},
+                querystring=querystring,
+                headers=headers,
+            ),
+            "consul",
+            path,
+            HTTPTimeout(read=self.wait + 5),
+        )
+        endpoints = []
+        for srv in resp.json:  # type: ignore
+            address, port, zone = self.parse_instance(srv)
+            endpoint = self.format_endoint(version, address, port)
+            self.zones[endpoint] = zone
+            endpoints.append(endpoint)
+        self.endpoints[(service, version)] = endpoints
+        self.prune(
+            {endpoint for known in list(self.endpoints.values()) for endpoint in known}
+        )
+        new_index = int(resp.headers.get("X-Consul-Index", 0))
+        if index is not None and new_index < index:
+            # the index has been reset in consul
+            new_index = 0
+        return max(new_index, 1)
+
+    def parse_instance(self, srv: dict[str, Any]) -> tuple[str, int, str]:
+        """Address, port and zone of an instance, from the consul response."""
+        if self.passing_only:
+            service, node = srv["Service"], srv["Node"]
+            address, port = service["Address"] or node["Address"], service["Port"]
+            meta = node.get("Meta") or {}
+        else:
+            address, port = (
+                srv.get("ServiceAddress") or srv["Address"],
+                srv["ServicePort"],
+            )
+            meta = srv.get("NodeMeta") or {}
+        zone = ""
+        if self.zone_affinity is not None:
+            zone = meta.get(self.zone_affinity.meta_key, "")
+        return address, port, zone
+
+    def watch(self, service: ServiceName, version: Version, index: int) -> None:
+        while not self.stopped.is_set():
+            try:
+                index = self.fetch(service, version, index)
+            except Exception as exc:
+                log.warning(
+                    "Unable to watch the service %s/%s in consul: %r",
+                    service,
+                    version,
+                    exc,
+                )
+                self.stopped.wait(self.retry_delay)
+
+    def watch_in_background(
+        self, service: ServiceName, version: Version, index: int
+    ) -> None:
+        task: Optional[SyncBackgroundTask] = self.watchers.get((service, version))
+        if task is not None and task.is_running():
+            return
+        task = SyncBackgroundTask(self.watch, service, version, index)
+        self.watchers[(service, version)] = task
+        task.start()
+
+    def stop(self) -> None:
+        """Stop watching the services."""
+        self.stopped.set()
+        for task in self.watchers.values():
+            task.cancel()
+
+    def close(self) -> None:
+        self.stop()
+
+    def get_endpoint(self, service: ServiceName, version: Version) -> Url:
+        endpoints = self.endpoints.get((service, version))
+        if endpoints is None:
+            index = self.fetch(service, version)
+            endpoints = self.endpoints[(service, version)]
+            self.watch_in_background(service, version, index)
+        if not endpoints:
+            raise UnregisteredServiceException(service, version)
+        return self.choose(endpoints)
+
+
+compiled_endpoints: dict[tuple[str, str], dict[ServiceKey, Url]] = {}
+"""
+The endpoints formatted by the router discoveries, per url formats.
+
+Shared by the clients, and by the processes forked after the warm up.
+"""
+
+
+class SyncCompiledRouterDiscovery(SyncRouterDiscovery):
+    """
+    A router discovery that formats the endpoints once.
+
+    The endpoints of the services registered in the blacksmith registry are
+    formatted while building the first discovery, the other ones on their
+    first lookup.
+    """
+
+    def __init__(
+        self,
+        service_url_fmt: str = "http://router/{service}-{version}/{version}",
+        unversioned_service_url_fmt: str = "http://router/{service}",
+    ) -> None:
+        super().__init__(service_url_fmt, unversioned_service_url_fmt)
+        key = (service_url_fmt, unversioned_service_url_fmt)
+        endpoints = compiled_endpoints.get(key)
+        if endpoints is None:
+            endpoints = compiled_endpoints.setdefault(
+                key,
+                {
+                    (service, version): self.format_endpoint(service, version)
+                    for service, version in registry.client_service.values()
+                },
+            )
+        self.endpoints: dict[ServiceKey, Url] = endpoints
+
+    def format_endpoint(self, service: ServiceName, version: Version) -> Url:
+        if version is None:
+            return self.unversioned_service_url_fmt.format(service=service)
+        return self.service_url_fmt.format(service=service, version=version)
+
+    def get_endpoint(self, service: ServiceName, version: Version) -> Url:
+        endpoint = self.endpoints.get((service, version))
+        if endpoint is None:
+            endpoint = self.format_endpoint(service, version)
+            self.endpoints[(service, version)] = endpoint
+        return endpoint
+
+
+class SyncZoneNomadDiscovery(SyncBalancedDiscovery, SyncNomadDiscovery):
+    """
+    A nomad discovery that prefers an upstream of the local zone.
+
+    The upstream of the local zone is read in an environment variable that
+    contains the zone, the other upstream is used to spill over.
+
+    It accepts the parameters of the nomad discovery, and:
+
+    :param zone_service_env_fmt: pattern of the environment variable of the
+        upstream of the local zone.
+    :param unversioned_zone_service_env_fmt: pattern of the environment
+        variable of the upstream of the local zone, for unversioned service.
+    :param zone_affinity: parameters of the :class:`ZoneAffinity`.
+    """
+
+    def __init__(
+        self,
+        service_url_fmt: str = "http://{nomad_upstream_addr}/{version}",
+        service_env_fmt: str = "NOMAD_UPSTREAM_ADDR_{service}_{version}",
+        unversioned_service_url_fmt: str = "http://{nomad_upstream_addr}",
+        unversioned_service_env_fmt: str = "NOMAD_UPSTREAM_ADDR_{service}",
+        zone_service_env_fmt: str = "NOMAD_UPSTREAM_ADDR_{service}_{version}_{zone}",
+        unversioned_zone_service_env_fmt: str = "NOMAD_UPSTREAM_ADDR_{service}_{zone}",
+        zone_affinity: Optional[Mapping[str, Any]] = None,
+        load_balancer: Optional[LoadBalancer] = None,
+    ) -> None:
+        super().__init__(
+            service_url_fmt,
+            service_env_fmt,
+            unversioned_service_url_fmt,
+            unversioned_service_env_fmt,
+        )
+        self.zone_service_env_fmt = zone_service_env_fmt
+        self.unversioned_zone_service_env_fmt = unversioned_zone_service_env_fmt
+        self.init_balancing(load_balancer, zone_affinity or {})
+
+    def get_zone_endpoint(
+        self, service: ServiceName, version: Version
+    ) -> Optional[Url]:
+        if self.zone_affinity is None or not self.zone_affinity.zone:
+            return None
+        zone = self.zone_affinity.zone
+        env_fmt = (
+            self.zone_service_env_fmt
+            if version
+            else self.unversioned_zone_service_env_fmt
+        )
+        addr = os.getenv(env_fmt.format(service=service, version=version, zone=zone))
+        if not addr:
+            return None
+        url_fmt = self.service_url_fmt if version else self.unversioned_service_url_fmt
+        endpoint = url_fmt.format(nomad_upstream_addr=addr, version=version)
+        self.zones[endpoint] = zone
+        return endpoint
+
+    def get_endpoint(self, service: ServiceName, version: Version = None) -> Url:
+        endpoints = []
+        zone_endpoint = self.get_zone_endpoint(service, version)
+        if zone_endpoint:
+            endpoints.append(zone_endpoint)
+        try:
+            endpoints.append(super().get_endpoint(service, version))
+        except UnregisteredServiceException:
+            if not endpoints:
+                raise
+        return self.choose(endpoints)
@@ -0,0 +1,264 @@
+"""
+Balance the api calls between the instances of a service.
+
+The balancers are shared by the async and the sync clients, the statistics
+of the instances are fed by the load balancer middleware.
+"""
+
+import math
+import os
+import random
+import statistics
+import threading
+import time
+from collections.abc import Collection, Mapping, Sequence
+from typing import Any, Callable, Optional
+
+from blacksmith.typing import Url
+
+
+class InstanceStats:
+    """Statistics of an instance of a service, identified by its endpoint."""
+
+    def __init__(self) -> None:
+        self.in_flight = 0
+        self.latency = 0.0
+        """Exponentially weighted moving average of the latency, in seconds."""
+        self.last_response = 0.0
+        self.consecutive_errors = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+
+
+class LoadBalancer:
+    """
+    Choose an instance of a service, randomly, ejecting the outliers.
+
+    An instance is ejected after ``consecutive_errors`` transport errors or
+    server errors, for ``ejection_time`` seconds multiplied by the number of
+    times it has been ejected. No more than ``max_ejection_ratio`` of the
+    instances are ejected.
+
+    :param consecutive_errors: number of errors before ejecting an instance,
+        0 disable the ejection.
+    :param ejection_time: base duration of an ejection, in seconds.
+    :param max_ejection_ratio: maximum ratio of instances ejected.
+    :param decay: the decay of the latency moving average, in seconds.
+    """
+
+    def __init__(
+        self,
+        consecutive_errors: int = 5,
+        ejection_time: float = 30.0,
+        max_ejection_ratio: float = 0.5,
+        decay: float = 10.0,
+        _clock: Callable[[], float] = time.monotonic,
+    ):
+        self.consecutive_errors = consecutive_errors
+        self.ejection_time = ejection_time
+        self.max_ejection_ratio = max_ejection_ratio
+        self.decay = decay
+        self.clock = _clock
+        self.stats: dict[Url, InstanceStats] = {}
+        self.lock = threading.Lock()
+
+    def get_stats(self, endpoint: Url) -> InstanceStats:
+        stats = self.stats.get(endpoint)
+        if stats is None:
+            stats = self.stats.setdefault(endpoint, self.new_stats())
+        return stats
+
+    def new_stats(self) -> InstanceStats:
+        """The statistics of an instance seen for the first time."""
+        return InstanceStats()
+
+    def prune(self, endpoints: Collection[Url]) -> None:
+        """
+        Forget the statistics of the instances that are gone.
+
+        The instances with requests in flight are forgotten later.
+        """
+        with self.lock:
+            for endpoint, stats in list(self.stats.items()):
+                if endpoint not in endpoints and not stats.in_flight:
+                    del self.stats[endpoint]
+
+    def is_ejected(self, endpoint: Url) -> bool:
+        return self.get_stats(endpoint).ejected_until > self.clock()
+
+    def available(self, endpoints: Sequence[Url]) -> Sequence[Url]:
+        """The endpoints that are not ejected."""
+        available = [
+            endpoint for endpoint in endpoints if not self.is_ejected(endpoint)
+        ]
+        max_ejected = math.floor(len(endpoints) * self.max_ejection_ratio)
+        if len(endpoints) - len(available) > max_ejected:
+            # too many instances are failing, the service is failing
+            return endpoints
+        return available
+
+    def choose(self, endpoints: Sequence[Url]) -> Url:
+        """Choose the endpoint to use from the endpoints of the service."""
+        return self.pick(self.available(endpoints))
+
+    def pick(self, endpoints: Sequence[Url]) -> Url:
+        return random.choice(endpoints)
+
+    def on_request(self, endpoint: Url) -> None:
+        """Called by the middleware before sending a request."""
+        with self.lock:
+            self.get_stats(endpoint).in_flight += 1
+
+    def on_response(self, endpoint: Url, latency: float, failed: bool) -> None:
+        """Called by the middleware when the response has been received."""
+        with self.lock:
+            stats = self.get_stats(endpoint)
+            stats.in_flight -= 1
+            now = self.clock()
+            if stats.last_response:
+                weight = math.exp(-(now - stats.last_response) / self.decay)
+                stats.latency = stats.latency * weight + latency * (1 - weight)
+            else:
+                # the first response replaces the latency of a new instance
+                stats.latency = latency
+            stats.last_response = now
+            if not failed:
+                stats.consecutive_errors = 0
+                return
+            stats.consecutive_errors += 1
+            if (
+                self.consecutive_errors
+                and stats.consecutive_errors >= self.consecutive_errors
+            ):
+                stats.ejections += 1
+                stats.consecutive_errors = 0
+                stats.ejected_until = now + self.ejection_time * stats.ejections
+
+    def score(self, endpoint: Url) -> float:
+        return self.get_stats(endpoint).in_flight
+
+    def pick_two(self, endpoints: Sequence[Url]) -> Url:
+        """Pick the best of two random endpoints, using the score."""
+        if len(endpoints) == 1:
+            return endpoints[0]
+        first, second = random.sample(endpoints, 2)
+        if self.score(second) < self.score(first):
+            return second
+        return first
+
+
+class RoundRobinLoadBalancer(LoadBalancer):
+    """Choose the instances of a service one after the other."""
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.counter = 0
+
+    def pick(self, endpoints: Sequence[Url]) -> Url:
+        self.counter += 1
+        return endpoints[self.counter % len(endpoints)]
+
+
+class PowerOfTwoChoicesLoadBalancer(LoadBalancer):
+    """Choose the instance with less requests in flight, of two random ones."""
+
+    def pick(self, endpoints: Sequence[Url]) -> Url:
+        return self.pick_two(endpoints)
+
+
+class EWMALoadBalancer(LoadBalancer):
+    """
+    Choose the fastest instance, of two random ones.
+
+    The instances are compared using the moving average of their latency,
+    multiplied by their number of requests in flight. A new instance starts
+    with the median latency of the others, instead of winning every choice
+    until its first response.
+    """
+
+    def new_stats(self) -> InstanceStats:
+        stats = InstanceStats()
+        latencies = [
+            known.latency for known in list(self.stats.values()) if known.last_response
+        ]
+        if latencies:
+            stats.latency = statistics.median(latencies)
+        return stats
+
+    def score(self, endpoint: Url) -> float:
+        stats = self.get_stats(endpoint)
+        return stats.latency * (stats.in_flight + 1)
+
+    def pick(self, endpoints: Sequence[Url]) -> Url:
+        return self.pick_two(endpoints)
+
+
+class ZoneAffinity:
+    """
+    Prefer the instances of a service that are in the local zone.
+
+    The api calls spill over the other zones when the ratio of local instances
+    that are not ejected is under ``min_healthy_ratio``, or when the local
+    instances have, in average, ``max_in_flight`` requests in flight.
+
+    :param zone: the local zone.
+    :param zone_env: environment variable of the local zone, if not set.
+    :param meta_key: key of the zone in the consul node meta.
+    :param min_healthy_ratio: minimum ratio of healthy local instances.
+    :param max_in_flight: maximum requests in flight per local instance.
+    """
+
+    def __init__(
+        self,
+        zone: str = "",
+        zone_env: str = "",
+        meta_key: str = "zone",
+        min_healthy_ratio: float = 0.5,
+        max_in_flight: Optional[float] = None,
+    ):
+        self.zone = zone or (os.getenv(zone_env, "") if zone_env else "")
+        self.meta_key = meta_key
+        self.min_healthy_ratio = min_healthy_ratio
+        self.max_in_flight = max_in_flight
+
+    def select(
+        self,
+        endpoints: Sequence[Url],
+        zones: Mapping[Url, str],
+        load_balancer: LoadBalancer,
+    ) -> Sequence[Url]:
+        """The local endpoints, or every endpoints to spill over."""
+        if not self.zone:
+            return endpoints
+        local = [endpoint for endpoint in endpoints if zones.get(endpoint) == self.zone]
+        healthy = [
+            endpoint for endpoint in local if not load_balancer.is_ejected(endpoint)
+        ]
+        if not healthy or len(healthy) < len(local) * self.min_healthy_ratio:
+            return endpoints
+        if self.max_in_flight is not None:
+            in_flight = sum(
+                load_balancer.get_stats(endpoint).in_flight for endpoint in healthy
+            )
+            if in_flight >= self.max_in_flight * len(healthy):
+                return endpoints
+        return healthy
+
+
+STRATEGIES: Mapping[str, type[LoadBalancer]] = {
+    "random": LoadBalancer,
+    "round_robin": RoundRobinLoadBalancer,
+    "p2c": PowerOfTwoChoicesLoadBalancer,
+    "ewma": EWMALoadBalancer,
+}
+
+
+def build_load_balancer(settings: Mapping[str, Any]) -> Optional[LoadBalancer]:
+    """Build the load balancer of the ``load_balancer`` client setting."""
+    if "load_balancer" not in settings:
+        return None
+    params = dict(settings["load_balancer"])
+    strategy = params.pop("strategy", "random")
+    if strategy not in STRATEGIES:
+        raise RuntimeError(f"Unkown load balancer strategy {strategy}")
+    return STRATEGIES[strategy](**params)
@@ -0,0 +1,92 @@
+"""
+The settings of the batching of the ``get`` calls of the resources.
+
+The ``get`` calls of a resource, such as ``users.get({"id": ...})``, are
+collected, then sent as a bulk call, such as ``GET /users?ids=...``, using
+the ``collection_get`` of a resource.
+"""
+
+from collections.abc import Hashable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from blacksmith import HTTPError, HTTPRequest, HTTPResponse
+from blacksmith.typing import ClientName, ResourceName
+
+
+@dataclass(frozen=True)
+class BatchConfig:
+    """The bulk call of a resource."""
+
+    param: str
+    """The parameter of the ``get`` call that identifies an item, such as ``id``."""
+    bulk_param: str
+    """The parameter of the bulk call that receives the values of ``param``."""
+    bulk_resource: Optional[ResourceName] = None
+    """The resource of the bulk call, the batched resource by default."""
+    key: Optional[str] = None
+    """The field of the items of the bulk call matching ``param``."""
+    separator: Optional[str] = None
+    """Join the values of the bulk call, sent as a list by default."""
+    max_batch_size: int = 100
+    """The maximum number of values of a bulk call."""
+
+    def __post_init__(self) -> None:
+        if self.max_batch_size < 1:
+            raise ValueError(f"Invalid max_batch_size {self.max_batch_size}")
+
+    def get_key(self, params: Any) -> Optional[Hashable]:
+        """
+        The value of ``param``, None if the call can't be batched.
+
+        A call with other parameters than ``param`` is not batched.
+        """
+        if isinstance(params, Mapping):
+            if set(params) != {self.param}:
+                return None
+            return params[self.param]
+        fields = getattr(params, "model_fields_set", None)
+        if fields != {self.param}:
+            return None
+        return getattr(params, self.param)
+
+    def get_bulk_params(self, keys: Sequence[Any]) -> dict[str, Any]:
+        if self.separator is not None:
+            return {self.bulk_param: self.separator.join(str(key) for key in keys)}
+        return {self.bulk_param: list(keys)}
+
+    def get_item_key(self, item: Mapping[str, Any]) -> str:
+        """The value of ``param`` of an item of the bulk call, as a string."""
+        return str(item.get(self.key or self.param))
+
+    def chunks(self, keys: Sequence[Any]) -> Iterator[Sequence[Any]]:
+        for pos in range(0, len(keys), self.max_batch_size):
+            yield keys[pos : pos + self.max_batch_size]
+
+
+def build_batch_configs(
+    settings: Mapping[str, Mapping[str, Any]],
+) -> Mapping[tuple[ClientName, ResourceName], BatchConfig]:
+    """
+    The bulk calls of the ``batch`` setting, per client and resource.
+
+    The keys of the setting are ``<client>.<resource>``.
+    """
+    configs: dict[tuple[ClientName, ResourceName], BatchConfig] = {}
+    for name, config in settings.items():
+        client_name, _, resource = name.partition(".")
+        if not client_name or not resource:
+            raise ValueError(f"Invalid resource {name}, expected <client>.<resource>")
+        configs[client_name, resource] = BatchConfig(**config)
+    return configs
+
+
+def build_not_found(
+    client_name: ClientName, path: str, endpoint: str, key: Any, param: str
+) -> HTTPError:
+    """The error of an item missing in the response of a bulk call."""
+    return HTTPError(
+        f"{client_name} - GET {path} - 404 Not Found",
+        HTTPRequest("GET", endpoint + path, path={param: key}),
+        HTTPResponse(404, {}, {"error": "Not found in the bulk call"}),
+    )
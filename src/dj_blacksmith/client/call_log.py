@@ -0,0 +1,63 @@
+"""Keep track of the api calls made while processing an incoming request."""
+
+from django.http.request import HttpRequest
+
+CallKey = tuple[str, str, str]
+
+UNKNOWN_VIEW = "unknown"
+
+
+class NPlusOneError(RuntimeError):
+    """Raised when the same path template is called too many times in a request."""
+
+    def __init__(self, view_name: str, key: CallKey, count: int):
+        client_name, method, path = key
+        super().__init__(
+            f"{view_name} - {client_name} - {method} {path} "
+            f"called {count} times in one request"
+        )
+        self.view_name = view_name
+        self.key = key
+        self.count = count
+
+
+class CallLog:
+    """
+    Count the api calls per client name, http method and path template.
+
+    The path template is the path registered in the resource, such as
+    ``/users/{username}``, so calls to different users share the same key.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[CallKey, int] = {}
+
+    def record(self, client_name: str, method: str, path: str) -> int:
+        """Record a call and return the number of time it has been called."""
+        key = (client_name, method, path)
+        count = self.calls.get(key, 0) + 1
+        self.calls[key] = count
+        return count
+
+
+def get_call_log(request: HttpRequest) -> CallLog:
+    """Get the call log of the request, shared by every clients of the request."""
+    try:
+        return request.blacksmith_call_log  # type: ignore
+    except AttributeError:
+        call_log = CallLog()
+        request.blacksmith_call_log = call_log  # type: ignore
+        return call_log
+
+
+def get_view_name(request: HttpRequest) -> str:
+    """
+    Name of the view processing the request, used in logs and metrics.
+
+    The path of an unresolved request is not used, it would create a metric
+    serie per url.
+    """
+    match = getattr(request, "resolver_match", None)
+    if match is not None:
+        return match.view_name
+    return UNKNOWN_VIEW
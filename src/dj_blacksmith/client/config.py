@@ -0,0 +1,298 @@
+"""
+The ``BLACKSMITH_CLIENT`` settings, validated and compiled once.
+
+The dotted paths of the settings are imported while compiling, a mistake
+in the settings is reported by a django system check, instead of the first
+api call of the client.
+"""
+
+import inspect
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Optional
+
+from blacksmith import AbstractCollectionParser, HTTPTimeout
+from blacksmith.domain.registry import registry
+from blacksmith.typing import Proxies
+from django.core import checks
+from django.utils.module_loading import import_string
+
+from dj_blacksmith._settings import get_clients, get_transport
+from dj_blacksmith.client.balancer import STRATEGIES
+from dj_blacksmith.client.batching import build_batch_configs
+from dj_blacksmith.client.json_codec import JSON_CODECS
+from dj_blacksmith.client.profiling import (
+    KIND_CONFIG,
+    KIND_IMPORT_STRING,
+    MeasureHook,
+    no_measure,
+)
+from dj_blacksmith.client.validation import ResponseValidation
+
+SERVICE_DISCOVERIES: Mapping[str, str] = {
+    "consul": "consul_sd_config",
+    "consul_watch": "consul_sd_config",
+    "nomad": "nomad_sd_config",
+    "router": "router_sd_config",
+    "static": "static_sd_config",
+}
+"""The service discoveries, and the name of their settings."""
+
+SD_CLASSES: Mapping[str, str] = {
+    "consul": "blacksmith.AsyncConsulDiscovery",
+    "consul_watch": "dj_blacksmith.client._async.sd.AsyncConsulWatchDiscovery",
+    "nomad": "blacksmith.AsyncNomadDiscovery",
+    "nomad_zone": "dj_blacksmith.client._async.sd.AsyncZoneNomadDiscovery",
+    "router": "dj_blacksmith.client._async.sd.AsyncCompiledRouterDiscovery",
+}
+"""
+The service discoveries built with their settings as keyword arguments.
+
+The sync versions accept the same parameters.
+"""
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """The compiled settings of a client."""
+
+    name: str
+    settings: Mapping[str, Any]
+    """The settings of the client, given to the middleware builders."""
+    timeout: HTTPTimeout
+    proxies: Optional[Proxies]
+    verify_certificate: bool
+    collection_parser: type[AbstractCollectionParser]
+    middlewares: tuple[type[Any], ...]
+    middleware_factories: tuple[type[Any], ...]
+    transport: Optional[type[Any]]
+    """The transport of the ``BLACKSMITH_TRANSPORT`` setting."""
+
+
+def import_setting(name: str, path: str) -> Any:
+    try:
+        return import_string(path)
+    except ImportError as exc:
+        raise RuntimeError(f"Client {name}: can't import {path}: {exc}") from exc
+
+
+def check_sd_config(name: str, sd: str, sd_config: Any) -> None:
+    """Bind the settings of the service discovery to its parameters."""
+    if not isinstance(sd_config, Mapping):
+        raise RuntimeError(
+            f"Client {name}: Invalid {SERVICE_DISCOVERIES[sd]}: expected a mapping"
+        )
+    cls = "nomad_zone" if sd == "nomad" and "zone_affinity" in sd_config else sd
+    if cls not in SD_CLASSES:
+        return
+    try:
+        inspect.signature(import_string(SD_CLASSES[cls])).bind(**sd_config)
+    except TypeError as exc:
+        raise RuntimeError(
+            f"Client {name}: Invalid {SERVICE_DISCOVERIES[sd]}: {exc}"
+        ) from exc
+
+
+def check_metrics(
+    name: str,
+    settings: Mapping[str, Any],
+    registries: dict[Any, tuple[str, Mapping[str, Any]]],
+) -> None:
+    """
+    The clients share the blacksmith metrics of their prometheus registry,
+    so they must be registered with the same settings.
+
+    :param registries: the first client of every registries, and its settings.
+    """
+    metrics = dict(settings.get("metrics", {}))
+    metrics_registry = metrics.pop("registry", None)
+    first, first_metrics = registries.setdefault(metrics_registry, (name, metrics))
+    if metrics != first_metrics:
+        raise RuntimeError(
+            f"Client {name}: The metrics settings differ from the client {first}, "
+            "they share the prometheus registry"
+        )
+
+
+def compile_client(
+    name: str, settings: Mapping[str, Any], measure: MeasureHook = no_measure
+) -> ClientConfig:
+    """
+    Validate the settings of a client, and import its dotted paths.
+
+    :param measure: measure the imports of the dotted paths, while profiling.
+    """
+
+    def import_path(path: str) -> Any:
+        with measure(KIND_IMPORT_STRING, path):
+            return import_setting(name, path)
+
+    sd = settings.get("sd", "")
+    if sd not in SERVICE_DISCOVERIES:
+        raise RuntimeError(f"Client {name}: Unkown service discovery {sd}")
+    if SERVICE_DISCOVERIES[sd] not in settings:
+        raise RuntimeError(f"Client {name}: Missing {SERVICE_DISCOVERIES[sd]}")
+    try:
+        timeout = HTTPTimeout(**settings.get("timeout", {}))
+    except TypeError as exc:
+        raise RuntimeError(f"Client {name}: Invalid timeout: {exc}") from exc
+    if "load_balancer" in settings and sd != "consul_watch":
+        raise RuntimeError(
+            f"Client {name}: Load balancing requires the consul_watch service discovery"
+        )
+    if sd == "consul" and "zone_affinity" in settings["consul_sd_config"]:
+        raise RuntimeError(
+            f"Client {name}: Zone affinity requires the consul_watch service discovery"
+        )
+    check_sd_config(name, sd, settings[SERVICE_DISCOVERIES[sd]])
+    if "sd_cache" in settings and (
+        sd == "consul_watch"
+        or (sd == "nomad" and "zone_affinity" in settings["nomad_sd_config"])
+    ):
+        raise RuntimeError(
+            f"Client {name}: The sd_cache can't cache a load balanced service discovery"
+        )
+    strategy = settings.get("load_balancer", {}).get("strategy", "random")
+    if strategy not in STRATEGIES:
+        raise RuntimeError(f"Client {name}: Unkown load balancer strategy {strategy}")
+    json_codec = settings.get("json_codec", "json")
+    if json_codec not in JSON_CODECS:
+        raise RuntimeError(f"Client {name}: Unkown json codec {json_codec}")
+    try:
+        validation = ResponseValidation(**settings.get("response_validation", {}))
+        # the resources registered while the apps are ready
+        validation.check_resources(registry.clients)
+    except (TypeError, ValueError) as exc:
+        raise RuntimeError(
+            f"Client {name}: Invalid response validation: {exc}"
+        ) from exc
+    try:
+        build_batch_configs(settings.get("batch", {}))
+    except (TypeError, ValueError) as exc:
+        raise RuntimeError(f"Client {name}: Invalid batch: {exc}") from exc
+    if "class" in settings.get("transport", {}):
+        import_path(settings["transport"]["class"])
+    if "http_cache" in settings:
+        for key in ("policy", "serializer"):
+            if key in settings["http_cache"]:
+                import_path(settings["http_cache"][key])
+    transport = get_transport()
+    return ClientConfig(
+        name=name,
+        settings=MappingProxyType(dict(settings)),
+        timeout=timeout,
+        proxies=settings.get("proxies"),
+        verify_certificate=settings.get("verify_certificate", True),
+        collection_parser=import_path(
+            settings.get("collection_parser", "blacksmith.CollectionParser")
+        ),
+        middlewares=tuple(
+            import_path(path) for path in settings.get("middlewares", [])
+        ),
+        middleware_factories=tuple(
+            import_path(path) for path in settings.get("middleware_factories", [])
+        ),
+        transport=import_path(transport) if transport else None,
+    )
+
+
+_configs: dict[str, ClientConfig] = {}
+_overrides: dict[str, Mapping[str, Any]] = {}
+"""The settings of the clients reloaded while running."""
+
+
+def get_client_settings() -> Mapping[str, Mapping[str, Any]]:
+    """The ``BLACKSMITH_CLIENT`` setting, with the reloaded settings."""
+    return {**get_clients(), **_overrides}
+
+
+def compile_clients(measure: MeasureHook = no_measure) -> Mapping[str, RuntimeError]:
+    """
+    Compile the settings of every clients, and keep them.
+
+    The errors are returned per client, and reported by the system check.
+
+    :param measure: measure the compilation of the clients, while profiling.
+    """
+    errors: dict[str, RuntimeError] = {}
+    registries: dict[Any, tuple[str, Mapping[str, Any]]] = {}
+    _configs.clear()
+    for name, settings in get_client_settings().items():
+        try:
+            with measure(KIND_CONFIG, name):
+                _configs[name] = compile_client(name, settings, measure)
+            check_metrics(name, settings, registries)
+        except RuntimeError as exc:
+            errors[name] = exc
+    return errors
+
+
+def get_client_config(name: str) -> ClientConfig:
+    config = _configs.get(name)
+    if config is None:
+        settings = get_client_settings().get(name)
+        if settings is None:
+            raise RuntimeError(f"Client {name} does not exists")
+        config = _configs.setdefault(name, compile_client(name, settings))
+    return config
+
+
+def get_client_configs() -> Mapping[str, ClientConfig]:
+    """The compiled settings of the clients."""
+    return MappingProxyType(_configs)
+
+
+def override_client_settings(
+    clients: Mapping[str, Mapping[str, Any]],
+) -> list[str]:
+    """
+    Reload the settings of clients, while running.
+
+    The settings given replace the top level keys of the settings of the
+    clients. The settings are all compiled before any of them is replaced.
+
+    :return: the name of the clients whose settings changed.
+    """
+    settings = get_client_settings()
+    configs: dict[str, ClientConfig] = {}
+    for name, client_settings in clients.items():
+        if name not in settings:
+            raise RuntimeError(f"Client {name} does not exists")
+        new_settings = {**settings[name], **client_settings}
+        if new_settings != settings[name]:
+            configs[name] = compile_client(name, new_settings)
+    for name, config in configs.items():
+        _overrides[name] = config.settings
+        _configs[name] = config
+    return list(configs)
+
+
+def get_client_overrides() -> Mapping[str, Mapping[str, Any]]:
+    """The settings of the clients reloaded while running."""
+    return dict(_overrides)
+
+
+def restore_client_overrides(overrides: Mapping[str, Mapping[str, Any]]) -> None:
+    """Restore the reloaded settings, when the reload of the clients failed."""
+    for name in {*_overrides, *overrides}:
+        _configs.pop(name, None)
+    _overrides.clear()
+    _overrides.update(overrides)
+
+
+def reset_client_configs(setting: str, **kwargs: Any) -> None:
+    """Forget the compiled settings when the blacksmith settings change."""
+    if setting.startswith("BLACKSMITH_"):
+        _configs.clear()
+        _overrides.clear()
+
+
+def check_client_configs(**kwargs: Any) -> list[checks.CheckMessage]:
+    """The django system check of the ``BLACKSMITH_CLIENT`` setting."""
+    return [
+        checks.Error(
+            str(exc), obj=f"BLACKSMITH_CLIENT[{name!r}]", id="dj_blacksmith.E001"
+        )
+        for name, exc in compile_clients().items()
+    ]
@@ -0,0 +1,104 @@
+"""
+The json codecs of the request and response bodies.
+
+orjson, an optional dependency, encodes and decodes the bodies several times
+faster than the json module. When it is not installed, the json module is
+used instead.
+"""
+
+import json
+import logging
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Optional, Union
+
+from blacksmith.domain.model.http import RequestBody
+from blacksmith.service.http_body_serializer import (
+    ENCODERS_BY_TYPE,
+    JSONEncoder,
+    JsonRequestSerializer,
+    register_http_body_serializer,
+    unregister_http_body_serializer,
+)
+from blacksmith.typing import Json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+log = logging.getLogger(__name__)
+
+JSON_CODECS = ("json", "orjson")
+"""The names of the codecs of the ``json_codec`` settings."""
+
+
+@dataclass(frozen=True)
+class JsonCodec:
+    """Encode and decode json bodies."""
+
+    name: str
+    loads: Callable[[Union[bytes, str]], Any]
+    dumps: Callable[[Any], RequestBody]
+
+
+def encode_default(obj: Any) -> Any:
+    """Encode the types that orjson does not support, such as pydantic's ones."""
+    for typ, serializer in ENCODERS_BY_TYPE.items():
+        if isinstance(obj, typ):
+            return serializer(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def orjson_dumps(obj: Any) -> RequestBody:
+    return orjson.dumps(obj, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def get_codec(name: str) -> JsonCodec:
+    """The codec of the given name, the json module when orjson is missing."""
+    if name not in JSON_CODECS:
+        raise RuntimeError(f"Unkown json codec {name}")
+    if name == "orjson":
+        if orjson is not None:
+            return JsonCodec("orjson", orjson.loads, orjson_dumps)
+        log.warning("orjson is not installed, the json module is used")
+    return JsonCodec("json", json.loads, partial(json.dumps, cls=JSONEncoder))
+
+
+class JsonCodecSerializer(JsonRequestSerializer):
+    """The blacksmith json serializer, using a codec."""
+
+    def __init__(self, codec: JsonCodec):
+        self.codec = codec
+
+    def serialize(self, body: Union[dict[str, Any], Sequence[Any]]) -> RequestBody:
+        return self.codec.dumps(body)
+
+    def deserialize(self, body: bytes, encoding: Optional[str]) -> Json:
+        return self.codec.loads(body)
+
+
+_serializer: Optional[JsonCodecSerializer] = None
+
+
+def use_codec(name: Optional[str]) -> None:
+    """
+    Encode and decode the json bodies of every clients with the codec.
+
+    The request bodies are serialized by blacksmith, before the middlewares and
+    the transport, so the codec of the request bodies is not set per client.
+    """
+    global _serializer
+    if _serializer is not None:
+        unregister_http_body_serializer(_serializer)
+        _serializer = None
+    if name and name != "json":
+        _serializer = JsonCodecSerializer(get_codec(name))
+        register_http_body_serializer(_serializer)
+
+
+def reset_codec(setting: str, value: Any, **kwargs: Any) -> None:
+    """Use the codec of the ``BLACKSMITH_JSON_CODEC`` setting when it changes."""
+    if setting == "BLACKSMITH_JSON_CODEC":
+        use_codec(value)
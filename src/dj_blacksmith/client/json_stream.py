@@ -0,0 +1,145 @@
+"""
+Decode the json bodies while their bytes arrive.
+
+The items of a json array, such as a collection, are split while the body is
+received, and decoded one at a time, on their first access. The raw body
+and the decoded tree are never kept in memory together.
+"""
+
+import codecs
+import json
+import re
+from collections.abc import Iterator, Sequence
+from typing import Any, Callable, Optional, Union, overload
+
+# the C scanner of the json module, without the checks of json.loads
+scan = json.JSONDecoder().scan_once
+WHITESPACES = re.compile(r"[ \t\r\n]*")
+SEPARATOR = re.compile(r"[ \t\r\n]*([,\]])[ \t\r\n]*")
+
+
+def scan_item(text: Union[bytes, str]) -> Any:
+    return scan(text, 0)[0]
+
+
+def is_json(content_type: str) -> bool:
+    mimetype = content_type.split(";", 1)[0].strip().lower()
+    return mimetype == "application/json" or mimetype.endswith("+json")
+
+
+class JsonItems(Sequence[Any]):
+    """
+    The items of a json array, decoded on access.
+
+    A deep copy, such as the one of the http cache, decodes every items.
+
+    :param loads: decode the json text of an item, such as ``orjson.loads``.
+    """
+
+    def __init__(self, items: list[str], loads: Callable[[str], Any] = scan_item):
+        self.items = items
+        self.loads = loads
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[Any]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self.loads(item) for item in self.items[index]]
+        return self.loads(self.items[index])
+
+    def __iter__(self) -> Iterator[Any]:
+        for item in self.items:
+            yield self.loads(item)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, JsonItems)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> list[Any]:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"<JsonItems ({len(self.items)} items)>"
+
+
+class JsonStreamDecoder:
+    """
+    Decode a json body, chunk per chunk.
+
+    A top level array is split into the json text of its items, the other
+    bodies are decoded once received.
+
+    :param loads: decode the json texts, the items are split by the json
+        module anyway.
+    """
+
+    def __init__(self, loads: Optional[Callable[[str], Any]] = None) -> None:
+        self.loads = loads
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.is_array: Optional[bool] = None
+        self.items: list[str] = []
+        self.done = False
+        self.retry_at = 0
+
+    def feed(self, chunk: bytes) -> None:
+        self.text += self.decoder.decode(chunk)
+        if self.is_array is None:
+            text = self.text.lstrip(" \t\r\n")
+            if not text:
+                return
+            self.is_array = text[0] == "["
+            if self.is_array:
+                self.text = text[1:]
+        # an item is decoded again when the text of the incomplete item
+        # doubled, to not decode a large item for every chunk
+        if self.is_array and not self.done and len(self.text) >= self.retry_at:
+            self.split()
+
+    def split(self) -> None:
+        """Split the complete items of the text, and drop their text."""
+        text = self.text
+        items = self.items
+        pos = WHITESPACES.match(text).end()  # type: ignore
+        if not items and text[pos : pos + 1] == "]":
+            self.text = text[pos + 1 :]
+            self.done = True
+            return
+        while True:
+            try:
+                _, end = scan(text, pos)
+            except (StopIteration, ValueError):
+                break
+            # a number, such as ``1.`` or ``3e``, may continue in the next
+            # chunk, an item is complete once followed by its separator
+            match = SEPARATOR.match(text, end)
+            if match is None:
+                break
+            items.append(text[pos:end])
+            pos = match.end()
+            if match.group(1) == "]":
+                self.done = True
+                break
+        self.text = text[pos:]
+        self.retry_at = 2 * len(self.text)
+
+    def close(self) -> Any:
+        """Return the decoded body, the items of an array are decoded lazily."""
+        self.text += self.decoder.decode(b"", final=True)
+        if not self.is_array:
+            if not self.text.strip():
+                return ""
+            return (self.loads or json.loads)(self.text)
+        if not self.done:
+            self.split()
+        if not self.done or self.text.strip(" \t\r\n"):
+            raise ValueError("Invalid json array")
+        return JsonItems(self.items, self.loads or scan_item)
@@ -0,0 +1,181 @@
+"""
+Profile the startup of the blacksmith clients.
+
+The profile is run in a fresh python process, by the
+``blacksmith_profile_startup`` command, the resources must not be imported
+yet to measure them:
+
+.. code-block:: bash
+
+   python -m dj_blacksmith.client.profiling [--sync]
+
+The time and the memory allocated are measured while importing the
+resources, importing the dotted paths of the settings, and building the
+client factories. The measures are written in JSON on the standard output.
+
+The settings are compiled and the client factories are built by
+:func:`~dj_blacksmith.client.config.compile_clients` and ``client_factory``,
+their ``measure`` hook measures their steps.
+"""
+
+import asyncio
+import importlib
+import json
+import sys
+import time
+import tracemalloc
+from collections.abc import Iterator, Sequence
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+KIND_IMPORT_STRING = "import_string"
+KIND_SETUP = "setup"
+KIND_IMPORT = "import"
+KIND_CONFIG = "config"
+KIND_SD = "sd"
+KIND_TRANSPORT = "transport"
+KIND_MIDDLEWARES = "middlewares"
+KIND_INITIALIZE = "initialize"
+
+MeasureHook = Callable[[str, str], AbstractContextManager[Any]]
+"""Measure a step of the startup, by its kind and its name."""
+
+
+def no_measure(kind: str, name: str) -> AbstractContextManager[Any]:
+    """The steps are not measured, out of the profile."""
+    return nullcontext()
+
+
+@dataclass
+class Measure:
+    kind: str
+    """The step of the startup, ``import``, ``import_string``, ``sd``, ..."""
+    name: str
+    """The module, the dotted path, or the client name."""
+    duration: float
+    """Elapsed time, in seconds."""
+    memory: int
+    """Memory still allocated after the step, in bytes."""
+    peak: int
+    """Peak of memory allocated during the step, in bytes."""
+    depth: int = 0
+    """The steps measured during another step are nested."""
+
+
+class Profile:
+    """The measures of the startup, in the order of the steps."""
+
+    def __init__(self) -> None:
+        self.measures: list[Measure] = []
+        self.peaks: list[int] = []
+        """The peaks of the steps in progress, the nested steps reset it."""
+
+    @contextmanager
+    def measure(self, kind: str, name: str) -> Iterator[None]:
+        """Measure a step, the memory is measured if tracemalloc is tracing."""
+        tracing = tracemalloc.is_tracing()
+        memory = 0
+        if tracing:
+            memory, peak = tracemalloc.get_traced_memory()
+            if self.peaks:
+                self.peaks[-1] = max(self.peaks[-1], peak)
+            tracemalloc.reset_peak()
+        measure = Measure(kind, name, 0, 0, 0, len(self.peaks))
+        self.measures.append(measure)
+        self.peaks.append(0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            measure.duration = time.perf_counter() - start
+            peak = self.peaks.pop()
+            if tracing:
+                current, current_peak = tracemalloc.get_traced_memory()
+                peak = max(peak, current_peak)
+                measure.memory = current - memory
+                measure.peak = peak - memory
+                if self.peaks:
+                    self.peaks[-1] = max(self.peaks[-1], peak)
+
+    def to_json(self) -> list[dict[str, Any]]:
+        return [asdict(measure) for measure in self.measures]
+
+
+def profile_resources(profile: Profile) -> None:
+    """Import the resources, like the app does while it is ready."""
+    from dj_blacksmith._settings import get_imports
+    from dj_blacksmith.client import resources
+
+    for modname in resources.iter_modules(*get_imports()):
+        with profile.measure(KIND_IMPORT, modname):
+            importlib.import_module(modname)
+
+
+def profile_startup(sync: bool = False) -> Profile:
+    """
+    Setup django, then profile the startup of the blacksmith clients.
+
+    :param sync: profile the sync client factories, the async ones by default.
+    """
+    import django
+    from django.conf import settings
+
+    from dj_blacksmith._settings import get_clients
+    from dj_blacksmith.client.config import compile_clients
+
+    # the profile imports the resources, instead of the app
+    settings.BLACKSMITH_LAZY_IMPORT = True
+    settings.BLACKSMITH_MANIFEST = None
+    settings.BLACKSMITH_WARM_UP = False
+
+    profile = Profile()
+    # the settings are compiled while the app is ready, they are compiled
+    # before, to measure the imports of their dotted paths.
+    errors = compile_clients(profile.measure)
+    if errors:
+        raise next(iter(errors.values()))
+    with profile.measure(KIND_SETUP, "django"):
+        django.setup()
+
+    from dj_blacksmith.client import resources
+
+    resources.loader = None
+    profile_resources(profile)
+
+    if sync:
+        from dj_blacksmith.client._sync.client import (
+            client_factory,
+            close_client_factory,
+        )
+
+        for name in get_clients():
+            close_client_factory(client_factory(name, measure=profile.measure))
+    else:
+        from dj_blacksmith.client._async.client import (
+            client_factory as async_client_factory,
+        )
+        from dj_blacksmith.client._async.client import (
+            close_client_factory as async_close_client_factory,
+        )
+
+        async def profile_client_factories() -> None:
+            for name in get_clients():
+                await async_close_client_factory(
+                    await async_client_factory(name, measure=profile.measure)
+                )
+
+        asyncio.run(profile_client_factories())
+    return profile
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    tracemalloc.start()
+    profile = profile_startup(sync="--sync" in argv)
+    tracemalloc.stop()
+    sys.stdout.write(json.dumps(profile.to_json()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Import the blacksmith resources, while starting, or on the first use of a client.
+
+Importing the resources is the main part of the boot time of a process that
+has many resources. They can be imported lazily, the modules of a client are
+read in a manifest built by the ``blacksmith_manifest`` command.
+"""
+
+import importlib
+import json
+import pkgutil
+import threading
+from collections.abc import Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Optional
+
+from blacksmith.domain.registry import registry
+from blacksmith.typing import ClientName
+
+manifest: dict[ClientName, list[str]] = {}
+"""The modules that registered the clients, recorded while scanning."""
+
+
+def iter_modules(*modules: str) -> Iterator[str]:
+    """The resource modules, and the modules of the resource packages."""
+    for modname in modules:
+        if modname.startswith("."):
+            raise ValueError(f"{modname}: Relative package unsupported")
+        yield modname
+        mod = importlib.import_module(modname)
+        if hasattr(mod, "__path__"):
+            for _loader, submod, _is_pkg in pkgutil.walk_packages(
+                path=mod.__path__,
+                prefix=mod.__name__ + ".",
+            ):
+                yield submod
+
+
+def scan(*modules: str) -> None:
+    """
+    Import the resource modules, like :func:`blacksmith.scan`.
+
+    The modules that register the resources of the clients are recorded in the
+    manifest, a client may have its resources in many modules.
+    """
+    for modname in iter_modules(*modules):
+        registered = {name: set(routes) for name, routes in registry.clients.items()}
+        importlib.import_module(modname)
+        for client_name, routes in registry.clients.items():
+            if set(routes) - registered.get(client_name, set()):
+                manifest.setdefault(client_name, []).append(modname)
+
+
+def read_manifest(path: str) -> Mapping[ClientName, Sequence[str]]:
+    try:
+        return json.loads(Path(path).read_text())
+    except OSError as exc:
+        raise RuntimeError(
+            f"Unable to read the blacksmith manifest {path}: {exc}, "
+            "it is built by the blacksmith_manifest command"
+        ) from exc
+
+
+def write_manifest(path: str) -> None:
+    Path(path).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+class ResourceLoader:
+    """
+    Import the resources of a client on its first use.
+
+    The modules of the client are read in the manifest, the resource modules
+    are all scanned if the client is not in the manifest.
+
+    :param modules: the resource modules, of the ``BLACKSMITH_IMPORT`` setting.
+    :param manifest: the modules that register the clients.
+    """
+
+    def __init__(
+        self,
+        modules: Sequence[str],
+        manifest: Optional[Mapping[ClientName, Sequence[str]]] = None,
+    ):
+        self.modules = modules
+        self.manifest = manifest or {}
+        self.scanned = False
+        self.loaded: set[ClientName] = set()
+        self.lock = threading.Lock()
+
+    def load(self, client_name: ClientName) -> None:
+        """
+        Import the modules of the client.
+
+        Every module of the manifest is imported, even if the client has been
+        registered by one of them, or by another module, before.
+        """
+        if client_name in self.loaded:
+            return
+        with self.lock:
+            if client_name in self.loaded:
+                return
+            for modname in self.manifest.get(client_name, []):
+                importlib.import_module(modname)
+            if client_name not in registry.client_service and not self.scanned:
+                scan(*self.modules)
+                self.scanned = True
+            self.loaded.add(client_name)
+
+
+loader: Optional[ResourceLoader] = None
+"""The loader of the resources, when they are imported lazily."""
+
+
+def load_client(client_name: ClientName) -> None:
+    """Import the resources of the client, if they are imported lazily."""
+    if loader is not None:
+        loader.load(client_name)
@@ -0,0 +1,113 @@
+"""Share the timings measured while processing an api call."""
+
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from blacksmith import PrometheusMetrics
+
+
+@dataclass
+class CallTimings:
+    """Timings of an api call, in seconds."""
+
+    request: Optional[float] = None
+    """Latency of the http request, as observed by the prometheus middleware."""
+    cache: Optional[float] = None
+    """Latency of the http cache middleware, if the response comes from the cache."""
+    transport: Optional[float] = None
+    """Latency of the transport call, as measured by the pooled transports."""
+    sd: Optional[float] = None
+    """Latency of the service discovery, while building the client."""
+
+
+current_timings: ContextVar[Optional[CallTimings]] = ContextVar(
+    "blacksmith_call_timings", default=None
+)
+"""Timings of the api call being processed."""
+
+last_resolution: ContextVar[Optional[tuple[str, float]]] = ContextVar(
+    "blacksmith_last_resolution", default=None
+)
+"""Client name and latency of the last endpoint resolution."""
+
+
+class _ObservedChild:
+    def __init__(self, child: Any, field: str):
+        self.child = child
+        self.field = field
+
+    def observe(self, amount: float) -> None:
+        timings = current_timings.get()
+        if timings is not None:
+            setattr(timings, self.field, amount)
+        self.child.observe(amount)
+
+
+class ObservedHistogram:
+    """
+    Forward the observations of a prometheus histogram to the current timings.
+
+    The observed latency is stored in the ``field`` of the :class:`CallTimings`.
+    """
+
+    def __init__(self, histogram: Any, field: str):
+        self.histogram = histogram
+        self.field = field
+
+    def labels(self, *args: Any, **kwargs: Any) -> _ObservedChild:
+        return _ObservedChild(self.histogram.labels(*args, **kwargs), self.field)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.histogram, name)
+
+
+def observe_metrics(metrics: PrometheusMetrics) -> None:
+    """Share the latencies measured by the prometheus and http cache middlewares."""
+    for attr, field in (
+        ("blacksmith_request_latency_seconds", "request"),
+        ("blacksmith_cache_latency_seconds", "cache"),
+    ):
+        histogram = getattr(metrics, attr)
+        if not isinstance(histogram, ObservedHistogram):
+            setattr(metrics, attr, ObservedHistogram(histogram, field))
+
+
+class RateLimiter:
+    """
+    Sample and limit the number of records per interval of time.
+
+    :param sample_rate: ratio of accepted records, between 0 and 1.
+    :param max_records: maximum number of records accepted per interval.
+    :param interval: interval of time, in seconds.
+    """
+
+    def __init__(self, sample_rate: float, max_records: int, interval: float):
+        self.sample_rate = sample_rate
+        self.max_records = max_records
+        self.interval = interval
+        self.window_start = 0.0
+        self.accepted = 0
+        self.suppressed = 0
+
+    def acquire(self) -> tuple[bool, int]:
+        """
+        Return if the record is accepted, and the number of records suppressed
+        during the previous interval, when a new one begins.
+        """
+        suppressed = 0
+        now = time.monotonic()
+        if now - self.window_start >= self.interval:
+            suppressed = self.suppressed
+            self.window_start = now
+            self.accepted = 0
+            self.suppressed = 0
+        if self.accepted >= self.max_records or (
+            self.sample_rate < 1 and random.random() >= self.sample_rate
+        ):
+            self.suppressed += 1
+            return False, suppressed
+        self.accepted += 1
+        return True, suppressed
@@ -0,0 +1,208 @@
+"""
+Build the response models without validating them.
+
+For trusted services, the validation of a large response model costs more
+than the api call. The response models are built without validation, or not
+built at all, and a sample of the responses is still validated to detect
+the changes of the contract of a service.
+"""
+
+import copy
+import logging
+import random
+from collections.abc import Iterator, Mapping
+from dataclasses import replace
+from typing import Any, Optional, get_args
+
+from blacksmith.domain.registry import ApiRoutes, Contract, Resources
+from blacksmith.typing import ClientName, ResourceName
+from pydantic import BaseModel, ValidationError
+
+from dj_blacksmith._metrics import get_counter
+
+log = logging.getLogger(__name__)
+
+VALIDATION_MODES = ("validate", "sampled", "construct", "raw")
+"""
+The modes of the validation of the responses.
+
+* ``validate``: the response models are validated, as blacksmith does.
+* ``sampled``: the response models are built without validation, a sample
+  of them are validated.
+* ``construct``: the response models are built without validation.
+* ``raw``: the response models are not built, the json is returned.
+"""
+
+
+def has_nested_models(schema: type[BaseModel]) -> bool:
+    """If the fields of a model contain models, that are built by the validation."""
+
+    def is_model(annotation: Any) -> bool:
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return True
+        return any(is_model(arg) for arg in get_args(annotation))
+
+    return any(is_model(field.annotation) for field in schema.model_fields.values())
+
+
+class ResponseModel:
+    """
+    Build the response model of a resource, in place of the model class.
+
+    A sampled response is validated to detect the changes of the contract,
+    an invalid one is logged, and counted, and the response is always returned
+    built without validation, so the views receive the same values whatever
+    the sample. The nested models are only built by the validation, so a model
+    with nested models must be validated.
+    """
+
+    def __init__(
+        self,
+        schema: type[BaseModel],
+        mode: str,
+        sample_rate: float,
+        client_name: ClientName,
+        resource: ResourceName,
+    ):
+        if mode in ("sampled", "construct") and has_nested_models(schema):
+            raise ValueError(
+                f"The response model {schema.__name__} of {client_name}.{resource} "
+                f"has nested models, it can't be built in {mode} mode"
+            )
+        self.schema = schema
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.client_name = client_name
+        self.resource = resource
+
+    def __call__(self, **json: Any) -> Any:
+        if self.mode == "raw":
+            return json
+        if self.mode == "sampled" and random.random() < self.sample_rate:
+            try:
+                self.schema.model_validate(json)
+            except ValidationError as exc:
+                log.warning(
+                    "Invalid response of %s.%s: %s",
+                    self.client_name,
+                    self.resource,
+                    exc,
+                )
+                get_counter(
+                    "blacksmith_response_validation_errors",
+                    "Sampled responses that do not validate their response model.",
+                    ["client_name", "resource"],
+                ).labels(self.client_name, self.resource).inc()
+        return self.schema.model_construct(**json)
+
+    def __repr__(self) -> str:
+        return f"<ResponseModel {self.schema.__name__} ({self.mode})>"
+
+
+class ResponseValidation:
+    """
+    The validation of the response models of the clients of a factory.
+
+    :param mode: the mode of the resources, one of :data:`VALIDATION_MODES`.
+    :param sample_rate: the ratio of the responses validated in ``sampled``
+        mode.
+    :param resources: the mode of a client, such as ``notif``, or of a
+        resource, such as ``notif.user``, overriding ``mode``.
+    """
+
+    def __init__(
+        self,
+        mode: str = "validate",
+        sample_rate: float = 0.01,
+        resources: Optional[Mapping[str, str]] = None,
+    ):
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.overrides = dict(resources or {})
+        for val in (mode, *self.overrides.values()):
+            if val not in VALIDATION_MODES:
+                raise ValueError(f"Unkown validation mode {val}")
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"Invalid sample rate {sample_rate}")
+        self.routes: dict[
+            tuple[ClientName, ResourceName], tuple[ApiRoutes, ApiRoutes]
+        ] = {}
+
+    def get_mode(self, client_name: ClientName, resource: ResourceName) -> str:
+        return self.overrides.get(
+            f"{client_name}.{resource}", self.overrides.get(client_name, self.mode)
+        )
+
+    def build_contract(
+        self, client_name: ClientName, resource: ResourceName, contract: Contract
+    ) -> Contract:
+        mode = self.get_mode(client_name, resource)
+        wrapped: dict[Any, Any] = {}
+        for method, (request, response) in contract.items():
+            if response is not None:
+                response = ResponseModel(
+                    response, mode, self.sample_rate, client_name, resource
+                )
+            wrapped[method] = (request, response)
+        return wrapped
+
+    def get_routes(
+        self, client_name: ClientName, resource: ResourceName, routes: ApiRoutes
+    ) -> ApiRoutes:
+        """The routes of the resource, with their response models wrapped."""
+        cached = self.routes.get((client_name, resource))
+        if cached is not None and cached[0] is routes:
+            return cached[1]
+        if self.get_mode(client_name, resource) == "validate":
+            return routes
+        wrapped = copy.copy(routes)
+        for attr in ("resource", "collection"):
+            route = getattr(routes, attr)
+            if route is not None and route.contract is not None:
+                contract = self.build_contract(client_name, resource, route.contract)
+                setattr(wrapped, attr, replace(route, contract=contract))
+        self.routes[client_name, resource] = (routes, wrapped)
+        return wrapped
+
+    def check_resources(self, clients: Mapping[ClientName, Resources]) -> None:
+        """
+        Build the routes of the resources registered, to check their modes.
+
+        :raises ValueError: a model with nested models is not validated.
+        """
+        for client_name, resources in clients.items():
+            for resource, routes in resources.items():
+                self.get_routes(client_name, resource, routes)
+
+    def get_resources(self, client_name: ClientName, resources: Resources) -> Resources:
+        """The resources of a client, built as configured."""
+        if self.mode == "validate" and not any(
+            key.split(".", 1)[0] == client_name for key in self.overrides
+        ):
+            return resources
+        return ValidatedResources(self, client_name, resources)
+
+
+class ValidatedResources(Mapping[ResourceName, ApiRoutes]):
+    """The resources of a client, their routes are wrapped on access."""
+
+    def __init__(
+        self,
+        validation: ResponseValidation,
+        client_name: ClientName,
+        resources: Resources,
+    ):
+        self.validation = validation
+        self.client_name = client_name
+        self.resources = resources
+
+    def __getitem__(self, resource: ResourceName) -> ApiRoutes:
+        return self.validation.get_routes(
+            self.client_name, resource, self.resources[resource]
+        )
+
+    def __iter__(self) -> Iterator[ResourceName]:
+        return iter(self.resources)
+
+    def __len__(self) -> int:
+        return len(self.resources)
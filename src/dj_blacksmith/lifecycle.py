@@ -0,0 +1,70 @@
+"""Close the clients when the server shuts down."""
+
+from collections.abc import Awaitable, MutableMapping
+from typing import Any, Callable
+
+from dj_blacksmith.client._async.client import AsyncDjBlacksmithClient
+from dj_blacksmith.client._sync.client import SyncDjBlacksmithClient
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+class LifespanMiddleware:
+    """
+    Handle the ASGI lifespan protocol, closing the clients on shutdown.
+
+    The django ASGI application does not support the lifespan protocol,
+    it is wrapped by this middleware:
+
+    .. code-block:: python
+
+       application = LifespanMiddleware(get_asgi_application())
+
+    :param app: the ASGI application.
+    :param timeout: time to drain the api calls in flight, in seconds.
+    """
+
+    def __init__(self, app: ASGIApp, timeout: float = 30.0):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "lifespan":
+            await self.app(scope, receive, send)
+            return
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                try:
+                    await AsyncDjBlacksmithClient.aclose(self.timeout)
+                except Exception as exc:
+                    # reported by the ASGI server, that stops anyway
+                    await send(
+                        {"type": "lifespan.shutdown.failed", "message": str(exc)}
+                    )
+                else:
+                    await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def worker_exit(server: Any, worker: Any) -> None:
+    """
+    A gunicorn hook, that closes the clients of the WSGI worker.
+
+    Installed in the gunicorn configuration file:
+
+    .. code-block:: python
+
+       from dj_blacksmith.lifecycle import worker_exit
+
+    The api calls in flight are drained up to half the ``graceful_timeout``,
+    the worker has been stopping since the start of the graceful timeout,
+    and is killed by the arbiter at its end.
+    """
+    SyncDjBlacksmithClient.close(worker.cfg.graceful_timeout / 2)
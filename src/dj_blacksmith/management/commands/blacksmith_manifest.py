@@ -0,0 +1,30 @@
+"""Build the manifest of the resources, to import them lazily."""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from dj_blacksmith._settings import get_imports, get_manifest
+from dj_blacksmith.client import resources
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the modules that register the blacksmith clients, "
+        "in the BLACKSMITH_MANIFEST file."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--output",
+            default=get_manifest(),
+            help="path of the manifest, the BLACKSMITH_MANIFEST setting by default",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        resources.scan(*get_imports())
+        if options["output"]:
+            resources.write_manifest(options["output"])
+        else:
+            self.stdout.write(json.dumps(resources.manifest, indent=2, sort_keys=True))
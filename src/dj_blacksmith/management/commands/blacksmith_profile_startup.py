@@ -0,0 +1,86 @@
+"""Profile the startup of the blacksmith clients, in a fresh process."""
+
+import json
+import os
+import subprocess
+import sys
+from collections.abc import Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the time and the memory spent while importing the resources, "
+        "the dotted paths of the settings, and building the client factories."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="profile the sync client factories, the async ones by default",
+        )
+        parser.add_argument(
+            "--json",
+            action="store_true",
+            help="write the measures in JSON, instead of a table",
+        )
+        parser.add_argument(
+            "--output",
+            help="path of a JSON file to write the measures to, for the CI",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        measures = self.profile(options["sync"])
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(measures, indent=2))
+        if options["json"]:
+            self.stdout.write(json.dumps(measures, indent=2))
+        else:
+            self.print_table(measures)
+
+    def profile(self, sync: bool) -> list[dict[str, Any]]:
+        # the resources are already imported in this process
+        cmd = [sys.executable, "-m", "dj_blacksmith.client.profiling"]
+        if sync:
+            cmd.append("--sync")
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)}
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        if proc.returncode:
+            raise CommandError(f"The startup profile failed:\n{proc.stderr}")
+        return json.loads(proc.stdout)
+
+    def print_table(self, measures: Sequence[Mapping[str, Any]]) -> None:
+        rows = [
+            (
+                "  " * measure.get("depth", 0) + measure["kind"],
+                measure["name"],
+                f"{measure['duration'] * 1000:.3f}",
+                f"{measure['memory'] / 1024:.1f}",
+                f"{measure['peak'] / 1024:.1f}",
+            )
+            for measure in measures
+        ]
+        # the nested steps are part of their parent step
+        steps = [m for m in measures if not m.get("depth", 0)]
+        rows.append(
+            (
+                "total",
+                "",
+                f"{sum(m['duration'] for m in steps) * 1000:.3f}",
+                f"{sum(m['memory'] for m in steps) / 1024:.1f}",
+                "",
+            )
+        )
+        header = ("step", "name", "time (ms)", "memory (KiB)", "peak (KiB)")
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(5)]
+        for row in [header, *rows]:
+            self.stdout.write(
+                "  ".join(
+                    cell.ljust(width) if i < 2 else cell.rjust(width)
+                    for i, (cell, width) in enumerate(zip(row, widths))
+                )
+            )
@@ -0,0 +1,44 @@
+"""Broadcast the settings of the clients, to reload them in every workers."""
+
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from dj_blacksmith._settings import get_clients, get_reload
+from dj_blacksmith.client._async.reload import DEFAULT_CHANNEL
+from dj_blacksmith.client._concurrency import SyncRedis
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish the BLACKSMITH_CLIENT setting of this process, "
+        "the workers rebuild the clients whose settings changed."
+    )
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument(
+            "clients",
+            nargs="*",
+            help="name of the clients to reload, every clients by default",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        settings = get_reload()
+        if not settings:
+            raise CommandError("The BLACKSMITH_RELOAD setting is missing")
+        clients = get_clients()
+        names = options["clients"] or list(clients)
+        for name in names:
+            if name not in clients:
+                raise CommandError(f"Client {name} does not exists")
+        try:
+            message = json.dumps({"clients": {name: clients[name] for name in names}})
+        except TypeError as exc:
+            raise CommandError(f"The settings can't be broadcasted: {exc}") from exc
+        redis = SyncRedis.from_url(settings["redis"])
+        try:
+            count = redis.publish(settings.get("channel", DEFAULT_CHANNEL), message)
+        finally:
+            redis.close()
+        self.stdout.write(f"Reloading {', '.join(names)} in {count} processes")
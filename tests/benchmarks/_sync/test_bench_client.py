@@ -0,0 +1,217 @@
+"""
+Benchmarks of the hot path of the client.
+
+The timings are compared to the baseline stored in ``tests/benchmarks/baseline``
+by ``just bench``, and the allocations are compared to a budget in every tests.
+"""
+
+import tracemalloc
+import warnings
+from typing import Any, Callable
+
+import pytest
+from blacksmith import (
+    PrometheusMetrics,
+    SyncClientFactory,
+    SyncHTTPCacheMiddleware,
+    SyncRouterDiscovery,
+)
+from django.test import RequestFactory, override_settings
+
+from dj_blacksmith.client._sync.client import (
+    SyncClientProxy,
+    SyncDjBlacksmithClient,
+    build_middlewares,
+    build_sd,
+    middleware_factories,
+)
+from tests.benchmarks.fixtures import (
+    SyncCachableTransport,
+    SyncMemoryCache,
+    sync_gather,
+    sync_run,
+)
+
+HEADERS_BUILDER = (
+    "dj_blacksmith.client._sync.middleware.SyncHTTPAddHeadersMiddlewareBuilder"
+)
+MIDDLEWARES = {
+    0: [],
+    3: [
+        "dj_blacksmith.SyncSlowCallLogMiddlewareBuilder",
+        "dj_blacksmith.SyncPrometheusMiddlewareBuilder",
+        "dj_blacksmith.SyncCircuitBreakerMiddlewareBuilder",
+    ],
+}
+MIDDLEWARES[10] = MIDDLEWARES[3] + [HEADERS_BUILDER] * 7
+
+CLIENT_SETTINGS = {
+    "sd": "router",
+    "router_sd_config": {},
+    "http_headers": {"X-Bench": "1"},
+    "forwarded_headers": ["Authorization", "Accept-Language"],
+    "middleware_factories": [
+        "dj_blacksmith.SyncForwardHeaderFactoryBuilder",
+        "dj_blacksmith.SyncNPlusOneDetectorFactoryBuilder",
+    ],
+    "n_plus_one": {"threshold": 1_000_000_000},
+}
+
+# Budget of memory allocated while processing a call, in bytes.
+ALLOC_PEAK_BUDGET = 64 * 1024
+# Budget of memory retained per call, to catch leaks, in bytes.
+ALLOC_RETAINED_BUDGET = 512
+
+
+def blacksmith_settings(middlewares: int) -> dict[str, Any]:
+    return {
+        "BLACKSMITH_CLIENT": {
+            "default": {**CLIENT_SETTINGS, "middlewares": MIDDLEWARES[middlewares]},
+        },
+        "BLACKSMITH_TRANSPORT": "tests.unittests.fixtures.SyncDummyTransport",
+    }
+
+
+def measure_allocations(fn: Callable[[], Any], calls: int = 200) -> tuple[int, float]:
+    """
+    Return the peak of allocated memory and the memory retained per call.
+
+    The warnings, such as the deprecations of the dependencies, are ignored
+    while measuring, pytest records them, they would be counted.
+    """
+    fn()  # warm up caches
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        tracemalloc.start()
+        try:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            for _ in range(calls):
+                fn()
+            after, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return peak - before, (after - before) / calls
+
+
+@pytest.mark.parametrize("middlewares", [0, 3, 10])
+def test_bench_dj_client_call(benchmark: Any, req: RequestFactory, middlewares: int):
+    request = req.get("/", HTTP_AUTHORIZATION="Bearer abc")
+
+    def call():
+        dj_cli = SyncDjBlacksmithClient(request)
+        cli = dj_cli("default")
+        api = cli("dummy")
+        return api.dummies.get({"name": "foo"})
+
+    with override_settings(**blacksmith_settings(middlewares)):
+        resp = benchmark(sync_run, call)
+        peak, retained = measure_allocations(lambda: sync_run(call))
+
+    assert resp.unwrap().name == "alive"
+    assert peak < ALLOC_PEAK_BUDGET
+    assert retained < ALLOC_RETAINED_BUDGET
+
+
+@pytest.mark.parametrize("middlewares", [0, 3, 10])
+def test_bench_client_proxy_call(benchmark: Any, req: RequestFactory, middlewares: int):
+    with override_settings(**blacksmith_settings(middlewares)):
+        dj_cli = SyncDjBlacksmithClient(req.get("/"))
+        prox: SyncClientProxy = sync_run(dj_cli)
+
+        def call():
+            return prox("dummy")
+
+        cli = benchmark(sync_run, call)
+        peak, retained = measure_allocations(lambda: sync_run(call))
+
+    assert cli.name == "dummy"
+    assert peak < ALLOC_PEAK_BUDGET
+    assert retained < ALLOC_RETAINED_BUDGET
+
+
+def test_bench_middleware_factories(benchmark: Any, req: RequestFactory):
+    request = req.get("/", HTTP_AUTHORIZATION="Bearer abc")
+    with override_settings(**blacksmith_settings(0)):
+        factories = middleware_factories()
+
+    def build():
+        return [m(request) for m in factories]
+
+    mdlws = benchmark(build)
+    assert len(mdlws) == 2
+
+
+@pytest.mark.parametrize("middlewares", [3, 10])
+def test_bench_build_middlewares(benchmark: Any, middlewares: int):
+    settings = {**CLIENT_SETTINGS, "middlewares": MIDDLEWARES[middlewares]}
+    metrics = PrometheusMetrics()
+
+    def build():
+        return list(build_middlewares(settings, metrics))
+
+    mdlws = benchmark(build)
+    assert len(mdlws) == middlewares
+
+
+@pytest.mark.parametrize(
+    "settings,expected",
+    [
+        ({"sd": "router", "router_sd_config": {}}, "http://router/dummy-v1/v1"),
+        (
+            {"sd": "static", "static_sd_config": {"dummy/v1": "http://dummy/v1"}},
+            "http://dummy/v1",
+        ),
+    ],
+    ids=["router", "static"],
+)
+def test_bench_sd(benchmark: Any, settings: dict[str, Any], expected: str):
+    sd = build_sd(settings)
+
+    def lookup():
+        return sd.get_endpoint("dummy", "v1")
+
+    endpoint = benchmark(sync_run, lookup)
+    assert endpoint == expected
+
+
+@pytest.mark.parametrize("cache_hit", [True, False], ids=["hit", "miss"])
+def test_bench_http_cache(benchmark: Any, cache_hit: bool):
+    cache = SyncMemoryCache()
+    factory: SyncClientFactory[Any] = SyncClientFactory(
+        sd=SyncRouterDiscovery(), transport=SyncCachableTransport()
+    )
+    factory.add_middleware(SyncHTTPCacheMiddleware(cache))
+    prox = SyncClientProxy(factory, [])
+
+    def call():
+        api = prox("dummy")
+        if not cache_hit:
+            cache.data.clear()
+        return api.dummies.get({"name": "foo"})
+
+    resp = benchmark(sync_run, call)
+    peak, retained = measure_allocations(lambda: sync_run(call))
+
+    assert resp.unwrap().name == "alive"
+    assert peak < ALLOC_PEAK_BUDGET
+    assert retained < ALLOC_RETAINED_BUDGET
+
+
+@pytest.mark.parametrize("middlewares", [0, 3])
+def test_bench_concurrent_calls(benchmark: Any, req: RequestFactory, middlewares: int):
+    request = req.get("/")
+
+    def call():
+        dj_cli = SyncDjBlacksmithClient(request)
+        cli = dj_cli("default")
+        api = cli("dummy")
+        return api.dummies.get({"name": "foo"})
+
+    def load():
+        sync_gather(call, 100)
+
+    with override_settings(**blacksmith_settings(middlewares)):
+        # measure the steady state, the client factory is built once
+        sync_run(call)
+        benchmark(sync_run, load)
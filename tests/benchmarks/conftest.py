@@ -0,0 +1,27 @@
+import prometheus_client  # type: ignore
+import pytest
+from django.test import RequestFactory
+
+from dj_blacksmith import AsyncDjBlacksmithClient, SyncDjBlacksmithClient
+
+
+@pytest.fixture
+def req():
+    return RequestFactory()
+
+
+@pytest.fixture(autouse=True)
+def prometheus_registry():
+    prometheus_client.REGISTRY = prometheus_client.CollectorRegistry()
+    yield prometheus_client.REGISTRY
+
+
+@pytest.fixture(autouse=True)
+def clear_client_factories():
+    yield
+    for cli in (AsyncDjBlacksmithClient, SyncDjBlacksmithClient):
+        cli.client_factories.clear()
+        cli.middleware_factories.clear()
+        cli.response_validations.clear()
+        cli.batch_configs.clear()
+        cli.client_settings.clear()
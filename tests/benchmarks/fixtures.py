@@ -0,0 +1,89 @@
+import asyncio
+from collections.abc import Awaitable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Optional
+
+from blacksmith import (
+    AsyncAbstractTransport,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    SyncAbstractTransport,
+)
+from blacksmith.middleware._async.http_cache import AsyncAbstractCache
+from blacksmith.middleware._sync.http_cache import SyncAbstractCache
+
+_loop = asyncio.new_event_loop()
+
+
+def async_run(fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Run a coroutine function in the benchmark event loop."""
+    return _loop.run_until_complete(fn())
+
+
+def sync_run(fn: Callable[[], Any]) -> Any:
+    return fn()
+
+
+async def async_gather(fn: Callable[[], Awaitable[Any]], count: int) -> None:
+    """Run the coroutine function count times concurrently."""
+    await asyncio.gather(*(fn() for _ in range(count)))
+
+
+def sync_gather(fn: Callable[[], Any], count: int) -> None:
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda _: fn(), range(count)))
+
+
+CACHE_HEADERS = {"Cache-Control": "public, max-age=60"}
+
+
+class AsyncCachableTransport(AsyncAbstractTransport):
+    async def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        return HTTPResponse(200, CACHE_HEADERS, {"id": "1", "name": "alive"})
+
+
+class SyncCachableTransport(SyncAbstractTransport):
+    def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        return HTTPResponse(200, CACHE_HEADERS, {"id": "1", "name": "alive"})
+
+
+class AsyncMemoryCache(AsyncAbstractCache):
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.data.get(key)
+
+    async def set(self, key: str, val: str, ex: timedelta) -> None:
+        self.data[key] = val
+
+
+class SyncMemoryCache(SyncAbstractCache):
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+
+    def initialize(self) -> None:
+        pass
+
+    def get(self, key: str) -> Optional[str]:
+        return self.data.get(key)
+
+    def set(self, key: str, val: str, ex: timedelta) -> None:
+        self.data[key] = val
@@ -0,0 +1,64 @@
+"""
+Benchmarks of the json codecs, on bodies of 50KB and 500KB.
+
+The time to decode a body, with orjson, is compared to the one of the json
+module, the decoder of blacksmith.
+"""
+
+import json
+import timeit
+from typing import Any
+
+import pytest
+
+from dj_blacksmith.client.json_codec import get_codec
+
+pytest.importorskip("orjson")
+
+
+def build_body(size: int) -> bytes:
+    items: list[dict[str, Any]] = []
+    body = b"[]"
+    while len(body) < size:
+        items.extend(
+            {
+                "id": str(i),
+                "name": f"user {i}",
+                "email": f"user{i}@example.net",
+                "age": i % 100,
+                "score": i / 7,
+                "active": i % 2 == 0,
+                "tags": ["a", "b"],
+            }
+            for i in range(len(items), len(items) + 100)
+        )
+        body = json.dumps(items).encode()
+    return body
+
+
+BODIES = {"50KB": build_body(50_000), "500KB": build_body(500_000)}
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson"])
+@pytest.mark.parametrize("size", list(BODIES))
+def test_bench_decode(benchmark: Any, codec: str, size: str):
+    loads = get_codec(codec).loads
+    body = BODIES[size]
+    assert benchmark(loads, body) == json.loads(body)
+
+
+@pytest.mark.parametrize("codec", ["json", "orjson"])
+@pytest.mark.parametrize("size", list(BODIES))
+def test_bench_encode(benchmark: Any, codec: str, size: str):
+    dumps = get_codec(codec).dumps
+    items = json.loads(BODIES[size])
+    assert json.loads(benchmark(dumps, items)) == items
+
+
+@pytest.mark.parametrize("size", list(BODIES))
+def test_bench_orjson_faster(size: str):
+    body = BODIES[size]
+    json_time = min(timeit.repeat(lambda: json.loads(body), number=5, repeat=5))
+    orjson_loads = get_codec("orjson").loads
+    orjson_time = min(timeit.repeat(lambda: orjson_loads(body), number=5, repeat=5))
+    assert orjson_time < json_time / 1.5
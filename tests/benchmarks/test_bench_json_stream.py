@@ -0,0 +1,58 @@
+"""
+Benchmarks of the decoding of a large collection.
+
+The peak of memory of the json decoded while the body is received is compared
+to the one of the body decoded once received, such as by blacksmith.
+"""
+
+import json
+import tracemalloc
+from typing import Any, Callable
+
+from dj_blacksmith.client.json_stream import JsonStreamDecoder
+
+ITEMS = [
+    {"id": str(i), "name": f"user {i}", "email": f"user{i}@example.net", "age": i}
+    for i in range(5000)
+]
+BODY = json.dumps(ITEMS).encode()
+CHUNKS = [BODY[pos : pos + 4096] for pos in range(0, len(BODY), 4096)]
+
+
+def decode_buffered() -> int:
+    body = b"".join(CHUNKS)
+    count = 0
+    for _ in json.loads(body):
+        count += 1
+    return count
+
+
+def decode_streamed() -> int:
+    decoder = JsonStreamDecoder()
+    for chunk in CHUNKS:
+        decoder.feed(chunk)
+    count = 0
+    for _ in decoder.close():
+        count += 1
+    return count
+
+
+def measure_peak(fn: Callable[[], Any]) -> int:
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before
+
+
+def test_bench_decode_buffered(benchmark: Any):
+    assert benchmark(decode_buffered) == len(ITEMS)
+
+
+def test_bench_decode_streamed(benchmark: Any):
+    assert benchmark(decode_streamed) == len(ITEMS)
+    assert measure_peak(decode_streamed) < measure_peak(decode_buffered) / 2
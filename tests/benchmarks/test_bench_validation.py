@@ -0,0 +1,53 @@
+"""
+Benchmarks of the response models, validated or not.
+
+The validation of pydantic is as fast as building a model without validation,
+the nested models can't be built without validation. Skipping the models,
+with the ``raw`` mode, is what matters.
+"""
+
+import timeit
+from typing import Any
+
+import pytest
+from blacksmith import Response
+
+from dj_blacksmith.client.validation import ResponseModel
+
+
+class User(Response):
+    id: str
+    name: str
+    email: str
+    age: int
+    tags: list[str]
+    scores: list[float]
+    meta: dict[str, str]
+
+
+JSON = {
+    "id": "1",
+    "name": "user 1",
+    "email": "user1@example.net",
+    "age": 42,
+    "tags": ["a", "b"],
+    "scores": [float(i) for i in range(50)],
+    "meta": {f"key{i}": "value" for i in range(20)},
+}
+
+
+@pytest.mark.parametrize("mode", ["validate", "sampled", "construct", "raw"])
+def test_bench_response_model(benchmark: Any, mode: str):
+    if mode == "validate":
+        build: Any = User
+    else:
+        build = ResponseModel(User, mode, 0.01, "api", "users")
+    resp = benchmark(lambda: build(**JSON))
+    assert resp is not None
+
+
+def test_bench_raw_faster():
+    model = ResponseModel(User, "raw", 0.01, "api", "users")
+    validate_time = min(timeit.repeat(lambda: User(**JSON), number=200, repeat=5))
+    raw_time = min(timeit.repeat(lambda: model(**JSON), number=200, repeat=5))
+    assert raw_time < validate_time / 2
@@ -1,3 +1,4 @@
+import os
 from typing import Any
 
 import pytest
@@ -19,6 +20,7 @@ from blacksmith.service._async.adapters.httpx import AsyncHttpxTransport
 from django.test import override_settings
 from prometheus_client import CollectorRegistry  # type: ignore
 
+from dj_blacksmith.client._async import client as client_module
 from dj_blacksmith.client._async.client import (
     AsyncClientProxy,
     AsyncDjBlacksmithClient,
@@ -29,8 +31,22 @@ from dj_blacksmith.client._async.client import (
     build_sd,
     build_transport,
     client_factory,
+    close_client_factory,
+    get_in_flight,
+    in_flight,
     middleware_factories,
+    reset_after_fork,
+    warm_up,
 )
+from dj_blacksmith.client._async.middleware import (
+    AsyncInFlightMiddleware,
+    AsyncLoadBalancerMiddleware,
+)
+from dj_blacksmith.client._async.sd import compiled_endpoints
+from dj_blacksmith.client._async.transport import transports
+from dj_blacksmith.client.batching import BatchConfig
+from dj_blacksmith.client.config import override_client_settings
+from dj_blacksmith.client.validation import ResponseValidation
 from tests.unittests.fixtures import (
     AsyncDummyTransport,
     DummyCollectionParser,
@@ -120,6 +136,19 @@ def consul_blacksmith_cli(url: str, tok: str) -> AsyncClientFactory[Any]:
             },
             id="consul",
         ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "static",
+                    "static_sd_config": {
+                        "srv": "http://srv:80",
+                        "api/v1": "http://api.v1:80",
+                    },
+                    "sd_cache": {"ttl": 60, "refresh_ahead": 10},
+                },
+            },
+            id="cached",
+        ),
     ],
 )
 async def test_build_sd(params: dict[str, Any], monkeypatch: Any):
@@ -140,7 +169,13 @@ async def test_build_sd(params: dict[str, Any], monkeypatch: Any):
         {
             "settings": {"sd": "STATIC"},
             "expected_message": "Unkown service discovery STATIC",
-        }
+        },
+        {
+            "settings": {"sd": "consul_watch", "consul_sd_config": {}, "sd_cache": {}},
+            "expected_message": (
+                "The sd_cache can't cache a load balanced service discovery"
+            ),
+        },
     ],
 )
 async def test_build_sd_errors(params: dict[str, Any]):
@@ -246,6 +281,21 @@ def test_build_metrics(params: dict[str, Any], prometheus_registry: CollectorReg
     )
 
 
+def test_build_metrics_shared(prometheus_registry: CollectorRegistry):
+    metrics = build_metrics({"metrics": {"buckets": [0.1, 0.2]}})
+    assert build_metrics({"metrics": {"buckets": [0.1, 0.2]}}) is metrics
+    with pytest.raises(RuntimeError) as ctx:
+        build_metrics({"metrics": {"buckets": [0.5]}})
+    assert str(ctx.value) == (
+        "The blacksmith metrics are registered with {'buckets': [0.1, 0.2]}, "
+        "they can't be registered with {'buckets': [0.5]}"
+    )
+    other = build_metrics(
+        {"metrics": {"buckets": [0.5], "registry": CollectorRegistry()}}
+    )
+    assert other is not metrics
+
+
 @pytest.mark.parametrize(
     "params",
     [
@@ -288,7 +338,10 @@ async def test_build_middlewares(params: dict[str, Any], prometheus_registry: An
                     },
                 }
             },
-            "expected_middlewares": [AsyncCircuitBreakerMiddleware],
+            "expected_middlewares": [
+                AsyncInFlightMiddleware,
+                AsyncCircuitBreakerMiddleware,
+            ],
             "expected_proxies": {
                 "http://": "http://letmeout:8080/",
                 "https://": "https://letmeout:8443/",
@@ -308,7 +361,7 @@ async def test_build_middlewares(params: dict[str, Any], prometheus_registry: An
                 },
                 "BLACKSMITH_TRANSPORT": "tests.unittests.fixtures.AsyncDummyTransport",
             },
-            "expected_middlewares": [],
+            "expected_middlewares": [AsyncInFlightMiddleware],
             "expected_proxies": None,
             "expected_verify_cert": True,
             "expected_timeout": HTTPTimeout(30, 15),
@@ -324,7 +377,31 @@ async def test_build_middlewares(params: dict[str, Any], prometheus_registry: An
                     },
                 },
             },
-            "expected_middlewares": [],
+            "expected_middlewares": [AsyncInFlightMiddleware],
+            "expected_proxies": None,
+            "expected_verify_cert": True,
+            "expected_timeout": HTTPTimeout(30, 15),
+            "expected_collection_parser": CollectionParser,
+            "expected_transport": AsyncHttpxTransport,
+        },
+        {
+            "settings": {
+                "BLACKSMITH_CLIENT": {
+                    "default": {
+                        "sd": "consul_watch",
+                        "consul_sd_config": {},
+                        "load_balancer": {"strategy": "ewma"},
+                        "middlewares": [
+                            "dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder",
+                        ],
+                    },
+                },
+            },
+            "expected_middlewares": [
+                AsyncInFlightMiddleware,
+                AsyncCircuitBreakerMiddleware,
+                AsyncLoadBalancerMiddleware,
+            ],
             "expected_proxies": None,
             "expected_verify_cert": True,
             "expected_timeout": HTTPTimeout(30, 15),
@@ -409,10 +486,12 @@ def test_build_middlewares_factories(params: dict[str, Any]):
         {
             "settings": {
                 "default": {
+                    "sd": "router",
+                    "router_sd_config": {},
                     "middleware_factories": [
                         "tests.unittests.fixtures.DummyMiddlewareFactory1",
                         "tests.unittests.fixtures.DummyMiddlewareFactory2",
-                    ]
+                    ],
                 }
             }
         }
@@ -436,3 +515,326 @@ async def test_client_proxy_header_injection(
     cli = await prox("dummy")
     resp = await cli.dummies.get({"name": "foo"})
     assert resp.raw_result.unwrap().headers == {"Foo": "Bar"}  # type: ignore
+
+
+async def test_client_proxy_response_validation(
+    dummy_async_client_factory: AsyncClientFactory[Any],
+):
+    prox = AsyncClientProxy(
+        dummy_async_client_factory,
+        [],
+        ResponseValidation(resources={"dummy.dummies": "raw"}),
+    )
+    cli = await prox("dummy")
+    resp = await cli.dummies.get({"name": "foo"})
+    assert resp.unwrap() == {"id": "1", "name": "alive"}
+
+
+async def test_response_validation_settings(req: Any, prometheus_registry: Any):
+    settings = {
+        "validated": {
+            "sd": "router",
+            "router_sd_config": {},
+            "response_validation": {"mode": "sampled", "sample_rate": 0.1},
+        },
+        "default": {"sd": "router", "router_sd_config": {}},
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await AsyncDjBlacksmithClient(req)("validated")
+        assert cli.response_validation is not None
+        assert cli.response_validation.mode == "sampled"
+        assert cli.response_validation.sample_rate == 0.1
+        cli = await AsyncDjBlacksmithClient(req)("default")
+        assert cli.response_validation is None
+
+
+async def test_batch_settings(req: Any, prometheus_registry: Any):
+    settings = {
+        "batched": {
+            "sd": "router",
+            "router_sd_config": {},
+            "batch": {"dummy.dummies": {"param": "name", "bulk_param": "names"}},
+        },
+        "default": {"sd": "router", "router_sd_config": {}},
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await AsyncDjBlacksmithClient(req)("batched")
+        assert cli.batch_loader is not None
+        assert cli.batch_loader.configs == {
+            ("dummy", "dummies"): BatchConfig("name", "names")
+        }
+        cli = await AsyncDjBlacksmithClient(req)("default")
+        assert cli.batch_loader is None
+
+
+async def test_reset_after_fork(req: Any, prometheus_registry: Any):
+    settings = {"default": {"sd": "router", "router_sd_config": {}, "transport": {}}}
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        await AsyncDjBlacksmithClient(req)()
+    assert AsyncDjBlacksmithClient.client_factories
+    assert transports.transports
+
+    reset_after_fork()
+    assert AsyncDjBlacksmithClient.client_factories == {}
+    assert transports.transports == {}
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+async def test_fork(req: Any, prometheus_registry: Any):
+    settings = {"default": {"sd": "router", "router_sd_config": {}}}
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        await AsyncDjBlacksmithClient(req)()
+    pid = os.fork()
+    if pid == 0:  # coverage: ignore
+        os._exit(1 if AsyncDjBlacksmithClient.client_factories else 0)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    # the parent keeps its clients
+    assert AsyncDjBlacksmithClient.client_factories
+
+
+def test_warm_up():
+    settings = {
+        "default": {
+            "sd": "router",
+            "router_sd_config": {"service_url_fmt": "http://warm/{service}/{version}"},
+            "middlewares": ["dj_blacksmith.AsyncPrometheusMiddlewareBuilder"],
+        }
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        warm_up()
+    endpoints = compiled_endpoints[
+        ("http://warm/{service}/{version}", "http://router/{service}")
+    ]
+    assert endpoints[("dummy", "v1")] == "http://warm/dummy/v1"
+
+
+def test_warm_up_errors():
+    settings = {
+        "default": {
+            "sd": "router",
+            "router_sd_config": {},
+            "middlewares": ["tests.unittests.fixtures.Nope"],
+        }
+    }
+    with (
+        override_settings(BLACKSMITH_CLIENT=settings),
+        pytest.raises(RuntimeError) as ctx,
+    ):
+        warm_up()
+    assert str(ctx.value) == (
+        "Client default: can't import tests.unittests.fixtures.Nope: "
+        'Module "tests.unittests.fixtures" does not define a "Nope" attribute/class'
+    )
+
+
+async def test_aclose(req: Any, http_server: Any, prometheus_registry: Any):
+    settings = {
+        "default": {
+            "sd": "static",
+            "static_sd_config": {"dummy/v1": http_server.url},
+            "transport": {"pool": "aclose"},
+        }
+    }
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await AsyncDjBlacksmithClient(req)()
+        api = await cli("dummy")
+        await api.dummies.get({"name": "alive"})
+    transport: Any = cli.client_factory.transport
+    assert len(http_server.connections) == 1
+
+    await AsyncDjBlacksmithClient.aclose(timeout=1)
+    assert AsyncDjBlacksmithClient.client_factories == {}
+    # the connection has been closed
+    await transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies/alive"),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+    assert len(http_server.connections) == 2
+    await transport.aclose()
+
+
+async def test_aclose_timeout(caplog: pytest.LogCaptureFixture):
+    in_flight.enter()
+    try:
+        await AsyncDjBlacksmithClient.aclose(timeout=0.01)
+    finally:
+        in_flight.exit()
+    assert caplog.messages == ["Closing the clients with 1 api calls in flight"]
+
+
+async def test_close_client_factory():
+    closed: list[str] = []
+
+    class Closable:
+        def __init__(self, name: str):
+            self.name = name
+
+        async def aclose(self) -> None:
+            closed.append(self.name)
+
+    cli: Any = AsyncClientFactory(Closable("sd"), transport=Closable("transport"))  # type: ignore
+    cli.add_middleware(Closable("middleware"))
+    await close_client_factory(cli)
+    assert closed == ["transport", "sd", "middleware"]
+
+
+async def test_close_client_factory_shared_transport(prometheus_registry: Any):
+    closed: list[str] = []
+
+    class ClosableTransport(AsyncDummyTransport):
+        async def aclose(self) -> None:
+            closed.append("transport")
+
+    settings = {
+        "default": {
+            "sd": "router",
+            "router_sd_config": {},
+            "transport": {
+                "class": "tests.unittests.fixtures.AsyncDummyTransport",
+                "pool": "shared",
+            },
+        }
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await client_factory()
+    assert cli.transport in transports
+    cli.transport = ClosableTransport()
+    await close_client_factory(cli)
+    assert closed == ["transport"]
+
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await client_factory()
+    closed.clear()
+    await close_client_factory(cli)
+    # closed by the registry
+    assert closed == []
+
+
+async def test_in_flight(prometheus_registry: Any):
+    settings = {"default": {"sd": "router", "router_sd_config": {}}}
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await client_factory()
+    factory_in_flight = get_in_flight(cli)
+    factory_in_flight.enter()
+    try:
+        assert factory_in_flight.count == 1
+        assert in_flight.count == 1
+    finally:
+        factory_in_flight.exit()
+    assert in_flight.count == 0
+
+
+async def test_reload(
+    req: Any, prometheus_registry: Any, caplog: pytest.LogCaptureFixture
+):
+    settings = {
+        "default": {"sd": "router", "router_sd_config": {}},
+        "unused": {"sd": "router", "router_sd_config": {}},
+    }
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        cli = await AsyncDjBlacksmithClient(req)()
+        old_factory = cli.client_factory
+        get_in_flight(old_factory).enter()
+
+        names = override_client_settings(
+            {"default": {"timeout": {"read": 5}}, "unused": {"timeout": {"read": 5}}}
+        )
+        assert names == ["default", "unused"]
+        await AsyncDjBlacksmithClient.reload(names, timeout=0.01)
+
+        new_factory = AsyncDjBlacksmithClient.client_factories["default"]
+        assert new_factory is not old_factory
+        assert new_factory.timeout == HTTPTimeout(5)
+        # built on its first use
+        assert "unused" not in AsyncDjBlacksmithClient.client_factories
+        cli = await AsyncDjBlacksmithClient(req)()
+        assert cli.client_factory is new_factory
+
+    get_in_flight(old_factory).exit()
+    assert caplog.messages == ["Closing a reloaded client with 1 api calls in flight"]
+
+
+async def test_reload_once(req: Any, prometheus_registry: Any):
+    settings = {"default": {"sd": "router", "router_sd_config": {}}}
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        old_factory = (await AsyncDjBlacksmithClient(req)()).client_factory
+        # the settings have been reloaded by the listener of the other clients
+        override_client_settings({"default": {"timeout": {"read": 5}}})
+        assert override_client_settings({"default": {"timeout": {"read": 5}}}) == []
+        await AsyncDjBlacksmithClient.reload(["default"], timeout=0.01)
+        new_factory = AsyncDjBlacksmithClient.client_factories["default"]
+        assert new_factory is not old_factory
+        assert new_factory.timeout == HTTPTimeout(5)
+
+        # already built with the reloaded settings
+        await AsyncDjBlacksmithClient.reload(["default"], timeout=0.01)
+        assert AsyncDjBlacksmithClient.client_factories["default"] is new_factory
+
+
+async def test_reload_transport_pool(req: Any, prometheus_registry: Any):
+    settings = {
+        "default": {
+            "sd": "router",
+            "router_sd_config": {},
+            "transport": {"pool": "reload", "max_connections": 10},
+        },
+        "unnamed": {
+            "sd": "router",
+            "router_sd_config": {},
+            "transport": {"max_connections": 10},
+        },
+    }
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        old_pool = (await AsyncDjBlacksmithClient(req)()).client_factory.transport
+        old_unnamed = (
+            await AsyncDjBlacksmithClient(req)("unnamed")
+        ).client_factory.transport
+        names = override_client_settings(
+            {
+                "default": {"transport": {"pool": "reload", "max_connections": 20}},
+                "unnamed": {"transport": {"max_connections": 20}},
+            }
+        )
+        await AsyncDjBlacksmithClient.reload(names, timeout=0.01)
+        new_pool: Any = AsyncDjBlacksmithClient.client_factories["default"].transport
+        assert new_pool is not old_pool
+        assert new_pool.limits.max_connections == 20
+        # the replaced transports are closed
+        assert old_pool not in transports
+        assert old_unnamed not in transports
+    await AsyncDjBlacksmithClient.aclose(timeout=1)
+
+
+async def test_reload_error(req: Any, prometheus_registry: Any, monkeypatch: Any):
+    settings = {
+        "default": {"sd": "router", "router_sd_config": {}},
+        "api": {"sd": "router", "router_sd_config": {}},
+    }
+
+    def boom(name: str) -> Any:
+        if name == "api":
+            raise RuntimeError("Boom")
+        return {}
+
+    AsyncDjBlacksmithClient.client_factories.clear()
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        await AsyncDjBlacksmithClient(req)()
+        await AsyncDjBlacksmithClient(req)("api")
+        factories = dict(AsyncDjBlacksmithClient.client_factories)
+        names = override_client_settings(
+            {"default": {"timeout": {"read": 5}}, "api": {"timeout": {"read": 5}}}
+        )
+        monkeypatch.setattr(client_module, "batch_configs", boom)
+        with pytest.raises(RuntimeError) as ctx:
+            await AsyncDjBlacksmithClient.reload(names, timeout=0.01)
+        assert str(ctx.value) == "Boom"
+        # none of the clients is reloaded
+        assert AsyncDjBlacksmithClient.client_factories == factories
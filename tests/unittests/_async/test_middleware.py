@@ -1,16 +1,34 @@
-from typing import Any
+from datetime import timedelta
+from typing import Any, Optional
 
 import pytest
-from blacksmith import CacheControlPolicy, PrometheusMetrics
+from blacksmith import (
+    AsyncAbstractTransport,
+    AsyncPrometheusMiddleware,
+    CacheControlPolicy,
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    PrometheusMetrics,
+)
 from prometheus_client import CollectorRegistry  # type: ignore
 
 from dj_blacksmith.client._async.middleware import (
     AsyncCircuitBreakerMiddlewareBuilder,
+    AsyncConditionalHTTPCacheMiddleware,
+    AsyncConditionalHTTPCacheMiddlewareBuilder,
     AsyncHTTPAddHeadersMiddlewareBuilder,
     AsyncHTTPBearerMiddlewareBuilder,
     AsyncHTTPCacheMiddlewareBuilder,
+    AsyncInFlightMiddleware,
+    AsyncLoadBalancerMiddleware,
     AsyncPrometheusMiddlewareBuilder,
+    AsyncSlowCallLogMiddlewareBuilder,
 )
+from dj_blacksmith.client._concurrency import AsyncInFlight
+from dj_blacksmith.client.balancer import LoadBalancer
+from tests.unittests.fixtures import AsyncDummyTransport
 
 
 @pytest.mark.parametrize(
@@ -107,6 +125,146 @@ def test_build_cache(params: dict[str, Any]):
     )
 
 
+def test_build_conditional_cache():
+    builder = AsyncConditionalHTTPCacheMiddlewareBuilder(
+        {"http_cache": {"redis": "redis://red/42", "revalidate_ttl": 3600}}, None
+    )
+    cache = builder.build()
+    assert isinstance(cache, AsyncConditionalHTTPCacheMiddleware)
+    assert cache.revalidate_ttl == timedelta(seconds=3600)
+    assert cache._policy.__class__.__name__ == "CacheControlPolicy"  # type: ignore
+
+
+class AsyncMemoryCache:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    async def set(self, key: str, val: str, ex: timedelta) -> None:
+        self.values[key] = val
+
+    def expire(self) -> None:
+        """Expire the cached responses, the kept ones remain."""
+        self.values = {
+            key: val
+            for key, val in self.values.items()
+            if key.startswith("revalidate:")
+        }
+
+
+class AsyncConditionalTransport(AsyncAbstractTransport):
+    def __init__(self, *responses: HTTPResponse) -> None:
+        super().__init__()
+        self.responses = list(responses)
+        self.headers: list[dict[str, str]] = []
+
+    async def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        self.headers.append(req.headers)
+        resp = self.responses.pop(0)
+        if resp.status_code >= 300:
+            raise HTTPError(f"{resp.status_code}", req, resp)
+        return resp
+
+
+async def call_conditional_cache(
+    transport: AsyncConditionalTransport, cache: AsyncMemoryCache
+) -> HTTPResponse:
+    handle = AsyncConditionalHTTPCacheMiddleware(cache)(transport)  # type: ignore
+    return await handle(
+        HTTPRequest("GET", "http://dummy/dummies/{name}", path={"name": "alive"}),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+
+
+async def test_conditional_cache_not_modified():
+    cache = AsyncMemoryCache()
+    transport = AsyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {
+                "Cache-Control": "public, max-age=60",
+                "ETag": '"v1"',
+                "Content-Length": "25",
+            },
+            {"id": "1", "name": "alive"},
+        ),
+        HTTPResponse(304, {"Cache-Control": "public, max-age=120", "ETag": '"v1"'}, {}),
+    )
+    await call_conditional_cache(transport, cache)
+    cache.expire()
+    resp = await call_conditional_cache(transport, cache)
+    assert transport.headers == [{}, {"If-None-Match": '"v1"'}]
+    assert resp.status_code == 200
+    assert resp.headers == {
+        "cache-control": "public, max-age=120",
+        "etag": '"v1"',
+        "content-length": "25",
+    }
+    assert resp.json == {"id": "1", "name": "alive"}
+
+    # cached again
+    resp = await call_conditional_cache(transport, cache)
+    assert resp.json == {"id": "1", "name": "alive"}
+    assert len(transport.headers) == 2
+
+
+async def test_conditional_cache_modified():
+    cache = AsyncMemoryCache()
+    transport = AsyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {"Cache-Control": "no-cache", "Last-Modified": "Mon, 19 Oct 2026"},
+            {"id": "1", "name": "alive"},
+        ),
+        HTTPResponse(200, {"Cache-Control": "no-cache"}, {"id": "2", "name": "alive"}),
+        HTTPResponse(200, {}, {"id": "3", "name": "alive"}),
+    )
+    await call_conditional_cache(transport, cache)
+    resp = await call_conditional_cache(transport, cache)
+    assert resp.json == {"id": "2", "name": "alive"}
+    # the response without validators is not kept
+    resp = await call_conditional_cache(transport, cache)
+    assert transport.headers == [
+        {},
+        {"If-Modified-Since": "Mon, 19 Oct 2026"},
+        {"If-Modified-Since": "Mon, 19 Oct 2026"},
+    ]
+
+
+async def test_conditional_cache_error():
+    cache = AsyncMemoryCache()
+    transport = AsyncConditionalTransport(
+        HTTPResponse(200, {"ETag": '"v1"'}, {"id": "1", "name": "alive"}),
+        HTTPResponse(503, {}, {}),
+    )
+    await call_conditional_cache(transport, cache)
+    with pytest.raises(HTTPError):
+        await call_conditional_cache(transport, cache)
+
+
+async def test_conditional_cache_no_store():
+    cache = AsyncMemoryCache()
+    transport = AsyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {"Cache-Control": "no-store", "ETag": '"v1"'},
+            {"id": "1", "name": "alive"},
+        ),
+    )
+    await call_conditional_cache(transport, cache)
+    assert cache.values == {}
+
+
 @pytest.mark.parametrize(
     "params",
     [
@@ -138,3 +296,147 @@ def test_add_bearer_token(params: dict[str, Any]):
     builder = AsyncHTTPBearerMiddlewareBuilder(params["settings"], params["metrics"])
     cache = builder.build()
     assert cache.headers == params["expected"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0}},
+                "with_prometheus": True,
+                "calls": 2,
+                "expected_records": 2,
+            },
+            id="reuse prometheus timings",
+        ),
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0}},
+                "with_prometheus": False,
+                "calls": 2,
+                "expected_records": 2,
+            },
+            id="measure timings",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "slow_call_log": {"threshold": 0, "thresholds": {"dummy": 60}}
+                },
+                "with_prometheus": True,
+                "calls": 2,
+                "expected_records": 0,
+            },
+            id="per client threshold",
+        ),
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0, "max_records": 1}},
+                "with_prometheus": True,
+                "calls": 3,
+                "expected_records": 1,
+            },
+            id="rate limited",
+        ),
+    ],
+)
+async def test_slow_call_log(
+    params: dict[str, Any],
+    prometheus_registry: CollectorRegistry,
+    caplog: pytest.LogCaptureFixture,
+):
+    metrics = PrometheusMetrics(registry=prometheus_registry)
+    builder = AsyncSlowCallLogMiddlewareBuilder(params["settings"], metrics)
+    slow_call_log = builder.build()
+    next: Any = AsyncDummyTransport()
+    if params["with_prometheus"]:
+        next = AsyncPrometheusMiddleware(metrics)(next)
+    handle = slow_call_log(next)
+    for _ in range(params["calls"]):
+        await handle(
+            HTTPRequest("GET", "/dummies/{name}"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+
+    records = [r.blacksmith for r in caplog.records if hasattr(r, "blacksmith")]
+    assert len(records) == params["expected_records"]
+    for record in records:
+        assert record["service"] == "dummy"
+        assert record["version"] == "v1"
+        assert record["path"] == "/dummies/{name}"
+        assert record["status_code"] == 200
+        assert record["latency"] >= 0
+        # the dummy transport does not measure its latency
+        assert record["transport_latency"] is None
+        assert record["cache_latency"] is None
+
+
+class FailingTransport(AsyncAbstractTransport):
+    def __init__(self, status_code: int):
+        super().__init__()
+        self.status_code = status_code
+
+    async def __call__(
+        self, req: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        raise HTTPError(
+            f"{self.status_code}", req, HTTPResponse(self.status_code, {}, {})
+        )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"next": AsyncDummyTransport(), "expected_errors": 0}, id="success"
+        ),
+        pytest.param(
+            {"next": FailingTransport(404), "expected_errors": 0}, id="client error"
+        ),
+        pytest.param(
+            {"next": FailingTransport(503), "expected_errors": 1}, id="server error"
+        ),
+    ],
+)
+async def test_load_balancer_middleware(params: dict[str, Any]):
+    load_balancer = LoadBalancer()
+    handle = AsyncLoadBalancerMiddleware(load_balancer)(params["next"])
+    try:
+        await handle(
+            HTTPRequest("GET", "http://10.0.0.1:8000/v1/dummies/{name}"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    except HTTPError:
+        pass
+    stats = load_balancer.stats["http://10.0.0.1:8000/v1"]
+    assert stats.in_flight == 0
+    assert stats.latency >= 0
+    assert stats.consecutive_errors == params["expected_errors"]
+
+
+async def test_in_flight_middleware():
+    in_flight = AsyncInFlight()
+    counts: list[int] = []
+
+    async def next(
+        req: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        counts.append(in_flight.count)
+        raise HTTPError("503", req, HTTPResponse(503, {}, {}))
+
+    handle = AsyncInFlightMiddleware(in_flight)(next)
+    with pytest.raises(HTTPError):
+        await handle(
+            HTTPRequest("GET", "http://dummy/dummies/alive"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    assert counts == [1]
+    assert in_flight.count == 0
+    assert await in_flight.wait(0) is True
@@ -0,0 +1,131 @@
+from typing import Any
+
+import pytest
+from blacksmith import (
+    AsyncAbstractTransport,
+    AsyncClientFactory,
+    AsyncRouterDiscovery,
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+)
+from blacksmith.domain.model.params import Metadata
+
+from dj_blacksmith.client._async.client import AsyncClientProxy
+from dj_blacksmith.client._async.pagination import AsyncCollectionStream
+
+
+class AsyncPagedTransport(AsyncAbstractTransport):
+    """Serve a collection of 2 items per page."""
+
+    def __init__(self, pages: int, failing_page: int = 0):
+        super().__init__()
+        self.pages = pages
+        self.failing_page = failing_page
+        self.calls: list[int] = []
+
+    async def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        page = int(req.querystring.get("page", 1))  # type: ignore
+        self.calls.append(page)
+        if page == self.failing_page:
+            raise HTTPError("Boom", req, HTTPResponse(500, {}, {}))
+        headers = {}
+        if page < self.pages:
+            headers["link"] = f'<{req.url}?page={page + 1}>; rel="next"'
+        return HTTPResponse(
+            200,
+            headers,
+            [{"id": f"{page}.{i}", "name": "alive"} for i in range(2)],
+        )
+
+
+def build_proxy(transport: AsyncPagedTransport) -> AsyncClientProxy:
+    factory: AsyncClientFactory[Any] = AsyncClientFactory(
+        sd=AsyncRouterDiscovery(), transport=transport
+    )
+    return AsyncClientProxy(factory, [])
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+async def test_stream_collection(prefetch: bool):
+    transport = AsyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    items = [
+        item.id
+        async for item in prox.stream_collection(
+            "dummy", "paged_dummies", prefetch=prefetch
+        )
+    ]
+    assert items == ["1.0", "1.1", "2.0", "2.1", "3.0", "3.1"]
+    assert transport.calls == [1, 2, 3]
+
+
+async def test_stream_collection_params():
+    transport = AsyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    items = [
+        item.id
+        async for item in prox.stream_collection("dummy", "paged_dummies", {"page": 2})
+    ]
+    assert items == ["2.0", "2.1", "3.0", "3.1"]
+    assert transport.calls == [2, 3]
+
+
+async def test_stream_collection_break():
+    transport = AsyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    stream = prox.stream_collection("dummy", "paged_dummies", prefetch=False)
+    async for item in stream:
+        assert item.id == "1.0"
+        break
+    await stream.aclose()
+    assert transport.calls == [1]
+
+
+async def test_stream_collection_error():
+    transport = AsyncPagedTransport(pages=3, failing_page=2)
+    prox = build_proxy(transport)
+    items: list[str] = []
+    with pytest.raises(HTTPError) as ctx:
+        async for item in prox.stream_collection("dummy", "paged_dummies"):
+            items.append(item.id)
+    assert str(ctx.value) == "Boom"
+    assert items == ["1.0", "1.1"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "links": {"next": {"url": "http://dummy/d?page=2&q=x", "rel": "next"}},
+                "params": {"page": 1, "size": 10},
+                "expected": {"page": "2", "size": 10, "q": "x"},
+            },
+            id="next",
+        ),
+        pytest.param(
+            {"links": {}, "params": {"page": 1}, "expected": None},
+            id="last page",
+        ),
+        pytest.param(
+            {
+                "links": {"next": {"url": "http://dummy/d?page=1", "rel": "next"}},
+                "params": {"page": "1"},
+                "expected": None,
+            },
+            id="same page",
+        ),
+    ],
+)
+def test_next_params(params: dict[str, Any]):
+    stream = AsyncCollectionStream(None)  # type: ignore
+    meta = Metadata(count=0, total_count=None, links=params["links"])
+    assert stream.next_params(meta, params["params"]) == params["expected"]
@@ -0,0 +1,417 @@
+from typing import Any, Callable
+
+import pytest
+from blacksmith import (
+    AsyncAbstractServiceDiscovery,
+    AsyncAbstractTransport,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+)
+from blacksmith.domain.exceptions import UnregisteredServiceException
+from blacksmith.typing import ServiceName, Url, Version
+
+from dj_blacksmith.client._async.client import build_sd
+from dj_blacksmith.client._async.sd import (
+    AsyncCachingDiscovery,
+    AsyncCompiledRouterDiscovery,
+    AsyncConsulWatchDiscovery,
+    AsyncZoneNomadDiscovery,
+)
+from dj_blacksmith.client.balancer import RoundRobinLoadBalancer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeDiscovery(AsyncAbstractServiceDiscovery):
+    def __init__(self):
+        self.calls = 0
+        self.error: Any = None
+
+    async def get_endpoint(self, service: ServiceName, version: Version) -> Url:
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"http://{service}.{version}:{self.calls}"
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_sd():
+    return FakeDiscovery()
+
+
+@pytest.fixture
+def caching_sd(fake_sd: FakeDiscovery, clock: FakeClock):
+    return AsyncCachingDiscovery(fake_sd, ttl=30, refresh_ahead=5, _clock=clock)
+
+
+async def join_refreshes(sd: AsyncCachingDiscovery):
+    for task in sd.refreshing.values():
+        await task.join()
+
+
+def test_build_sd_cache():
+    sd = build_sd(
+        {
+            "sd": "router",
+            "router_sd_config": {},
+            "sd_cache": {"ttl": 60, "refresh_ahead": 10},
+        }
+    )
+    assert isinstance(sd, AsyncCachingDiscovery)
+    assert sd.ttl == 60
+    assert sd.refresh_ahead == 10
+
+
+async def test_cache_endpoint(
+    caching_sd: AsyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    clock.now += 20
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    assert fake_sd.calls == 1
+
+    assert await caching_sd.get_endpoint("api", "v2") == "http://api.v2:2"
+    assert fake_sd.calls == 2
+
+
+async def test_refresh_ahead(
+    caching_sd: AsyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    await caching_sd.get_endpoint("api", "v1")
+    clock.now += 26
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    await join_refreshes(caching_sd)
+    assert fake_sd.calls == 2
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:2"
+    assert fake_sd.calls == 2
+
+
+async def test_expired(
+    caching_sd: AsyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    await caching_sd.get_endpoint("api", "v1")
+    clock.now += 31
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:2"
+    assert fake_sd.calls == 2
+
+
+async def test_last_known_good(
+    caching_sd: AsyncCachingDiscovery,
+    fake_sd: FakeDiscovery,
+    clock: FakeClock,
+    caplog: Any,
+):
+    await caching_sd.get_endpoint("api", "v1")
+    fake_sd.error = ConnectionError("consul is down")
+
+    clock.now += 26
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    await join_refreshes(caching_sd)
+    assert fake_sd.calls == 2
+    assert "Unable to refresh the endpoint of api/v1" in caplog.text
+
+    clock.now += 5
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    assert fake_sd.calls == 3
+    assert "using the last known endpoint http://api.v1:1" in caplog.text
+
+    # the next calls are served from the cache, and refreshed in background
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    await join_refreshes(caching_sd)
+    assert fake_sd.calls == 4
+
+    fake_sd.error = None
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    await join_refreshes(caching_sd)
+    assert await caching_sd.get_endpoint("api", "v1") == "http://api.v1:5"
+
+
+async def test_unknown_endpoint_error(
+    caching_sd: AsyncCachingDiscovery, fake_sd: FakeDiscovery
+):
+    fake_sd.error = ConnectionError("consul is down")
+    with pytest.raises(ConnectionError):
+        await caching_sd.get_endpoint("api", "v1")
+
+
+class FakeConsulTransport(AsyncAbstractTransport):
+    """Respond the instances of the service, one response per call."""
+
+    def __init__(self, responses: list[Any]):
+        super().__init__()
+        self.responses = responses
+        self.requests: list[HTTPRequest] = []
+        self.on_last_response: Callable[[], None] = lambda: None
+
+    async def __call__(
+        self, request: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        self.requests.append(request)
+        if len(self.responses) > 1:
+            resp = self.responses.pop(0)
+        else:
+            self.on_last_response()
+            resp = self.responses[0]
+        if isinstance(resp, Exception):
+            raise resp
+        index, instances = resp
+        return HTTPResponse(
+            200,
+            {"X-Consul-Index": str(index)},
+            [
+                {
+                    "Address": addr,
+                    "ServicePort": port,
+                    "NodeMeta": {"zone": f"zone-{addr[-1]}"},
+                }
+                for addr, port in instances
+            ],
+        )
+
+
+def consul_watch_sd(
+    transport: FakeConsulTransport, **kwargs: Any
+) -> AsyncConsulWatchDiscovery:
+    sd = AsyncConsulWatchDiscovery(
+        addr="http://consul:8500/v1",
+        service_url_fmt="http://{address}:{port}/{version}",
+        retry_delay=0,
+        # the fake transport responds the catalog of the services
+        passing_only=False,
+        _transport=transport,
+        **kwargs,
+    )
+    transport.on_last_response = sd.stopped.set
+    return sd
+
+
+async def join_watchers(sd: AsyncConsulWatchDiscovery):
+    for task in sd.watchers.values():
+        await task.join()
+
+
+def test_build_sd_load_balancer():
+    sd = build_sd(
+        {
+            "sd": "consul_watch",
+            "consul_sd_config": {},
+            "load_balancer": {"strategy": "round_robin"},
+        }
+    )
+    assert isinstance(sd, AsyncConsulWatchDiscovery)
+    assert isinstance(sd.load_balancer, RoundRobinLoadBalancer)
+
+
+def test_build_sd_load_balancer_error():
+    with pytest.raises(RuntimeError) as ctx:
+        build_sd({"sd": "router", "router_sd_config": {}, "load_balancer": {}})
+    assert (
+        str(ctx.value) == "Load balancing requires the consul_watch service discovery"
+    )
+
+
+def test_build_sd_consul_watch():
+    sd = build_sd(
+        {
+            "sd": "consul_watch",
+            "consul_sd_config": {"addr": "http://consul:8500/v1", "wait": 10},
+        }
+    )
+    assert isinstance(sd, AsyncConsulWatchDiscovery)
+    assert sd.wait == 10
+    assert sd.passing_only is True
+
+
+async def test_consul_watch():
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            (43, [("10.0.0.2", 8000)]),
+            (44, [("10.0.0.2", 8000), ("10.0.0.3", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport)
+    assert await sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    await join_watchers(sd)
+
+    assert sd.endpoints == {
+        ("api", "v1"): ["http://10.0.0.2:8000/v1", "http://10.0.0.3:8000/v1"],
+    }
+    assert [(req.url, req.querystring) for req in transport.requests] == [
+        ("http://consul:8500/v1/catalog/service/api-v1", {}),
+        ("http://consul:8500/v1/catalog/service/api-v1", {"index": 42, "wait": "55s"}),
+        ("http://consul:8500/v1/catalog/service/api-v1", {"index": 43, "wait": "55s"}),
+    ]
+    assert await sd.get_endpoint("api", "v1") in sd.endpoints[("api", "v1")]
+    assert len(transport.requests) == 3
+
+
+async def test_consul_watch_index_reset():
+    transport = FakeConsulTransport([(10, [("10.0.0.1", 8000)])])
+    sd = consul_watch_sd(transport)
+    assert await sd.fetch("api", "v1", 50) == 1
+    assert await sd.fetch("api", "v1", 5) == 10
+
+
+async def test_consul_watch_error(caplog: Any):
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            ConnectionError("consul is down"),
+            (43, [("10.0.0.2", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport)
+    assert await sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    await join_watchers(sd)
+    assert "Unable to watch the service api/v1 in consul" in caplog.text
+    assert sd.endpoints == {("api", "v1"): ["http://10.0.0.2:8000/v1"]}
+
+
+async def test_consul_watch_unregistered():
+    transport = FakeConsulTransport([(42, [])])
+    sd = consul_watch_sd(transport)
+    with pytest.raises(UnregisteredServiceException):
+        await sd.get_endpoint("api", "v1")
+    await sd.stop()
+
+
+async def test_consul_watch_load_balancer():
+    transport = FakeConsulTransport([(42, [("10.0.0.1", 8000), ("10.0.0.2", 8000)])])
+    sd = consul_watch_sd(transport, load_balancer=RoundRobinLoadBalancer())
+    endpoints = {await sd.get_endpoint("api", "v1") for _ in range(2)}
+    assert endpoints == {"http://10.0.0.1:8000/v1", "http://10.0.0.2:8000/v1"}
+    await join_watchers(sd)
+
+
+class FakeConsulHealthTransport(AsyncAbstractTransport):
+    async def __call__(
+        self, request: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        self.request = request
+        return HTTPResponse(
+            200,
+            {"X-Consul-Index": "42"},
+            [
+                {
+                    "Node": {"Address": "10.0.0.1"},
+                    "Service": {"Address": "", "Port": 8000},
+                },
+                {
+                    "Node": {"Address": "10.0.0.1"},
+                    "Service": {"Address": "10.0.1.1", "Port": 8001},
+                },
+            ],
+        )
+
+
+async def test_consul_watch_passing_only():
+    transport = FakeConsulHealthTransport()
+    sd = AsyncConsulWatchDiscovery(_transport=transport)
+    await sd.fetch("api", "v1")
+    assert transport.request.url == "http://consul:8500/v1/health/service/api-v1"
+    assert transport.request.querystring == {"passing": "true"}
+    assert sd.endpoints == {
+        ("api", "v1"): ["http://10.0.0.1:8000/v1", "http://10.0.1.1:8001/v1"],
+    }
+
+
+async def test_compiled_router():
+    sd = AsyncCompiledRouterDiscovery(
+        service_url_fmt="http://{service}.{version}:80",
+        unversioned_service_url_fmt="http://{service}:80",
+    )
+    # the services of the registry are compiled
+    assert sd.endpoints[("dummy", "v1")] == "http://dummy.v1:80"
+    assert await sd.get_endpoint("dummy", "v1") == "http://dummy.v1:80"
+
+    assert await sd.get_endpoint("api", "v2") == "http://api.v2:80"
+    assert await sd.get_endpoint("srv", None) == "http://srv:80"
+    assert sd.endpoints[("api", "v2")] == "http://api.v2:80"
+    assert sd.endpoints[("srv", None)] == "http://srv:80"
+
+
+async def test_consul_watch_zone_affinity():
+    transport = FakeConsulTransport([(42, [("10.0.0.1", 8000), ("10.0.0.2", 8000)])])
+    sd = consul_watch_sd(transport, zone_affinity={"zone": "zone-2"})
+    for _ in range(5):
+        assert await sd.get_endpoint("api", "v1") == "http://10.0.0.2:8000/v1"
+    assert sd.zones == {
+        "http://10.0.0.1:8000/v1": "zone-1",
+        "http://10.0.0.2:8000/v1": "zone-2",
+    }
+    await join_watchers(sd)
+
+
+async def test_consul_watch_prune():
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            (43, [("10.0.0.2", 8000)]),
+            (44, [("10.0.0.2", 8000), ("10.0.0.3", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport, zone_affinity={"zone": "zone-1"})
+    sd.load_balancer.on_request("http://10.0.0.9:8000/v1")
+    sd.load_balancer.on_response("http://10.0.0.9:8000/v1", 0.1, False)
+    assert await sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    await join_watchers(sd)
+    # the instances that are gone are forgotten
+    assert sd.zones == {
+        "http://10.0.0.2:8000/v1": "zone-2",
+        "http://10.0.0.3:8000/v1": "zone-3",
+    }
+    assert "http://10.0.0.9:8000/v1" not in sd.load_balancer.stats
+
+
+def test_build_sd_zone_nomad():
+    sd = build_sd(
+        {
+            "sd": "nomad",
+            "nomad_sd_config": {"zone_affinity": {"zone": "eu-west-1a"}},
+        }
+    )
+    assert isinstance(sd, AsyncZoneNomadDiscovery)
+    assert sd.zone_affinity is not None
+    assert sd.zone_affinity.zone == "eu-west-1a"
+
+
+async def test_zone_nomad(monkeypatch: Any):
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_api_v1", "127.0.0.1:9000")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_api_v1_eu-west-1a", "127.0.0.1:9001")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_srv", "127.0.0.1:9002")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_srv2_eu-west-1a", "127.0.0.1:9003")
+    sd = AsyncZoneNomadDiscovery(
+        zone_affinity={"zone_env": "NOMAD_META_zone", "min_healthy_ratio": 1}
+    )
+    assert sd.zone_affinity is not None
+    assert sd.zone_affinity.zone == ""
+    assert await sd.get_endpoint("api", "v1") == "http://127.0.0.1:9000/v1"
+
+    monkeypatch.setenv("NOMAD_META_zone", "eu-west-1a")
+    sd = AsyncZoneNomadDiscovery(
+        zone_affinity={"zone_env": "NOMAD_META_zone", "min_healthy_ratio": 1}
+    )
+    assert await sd.get_endpoint("api", "v1") == "http://127.0.0.1:9001/v1"
+    assert await sd.get_endpoint("srv", None) == "http://127.0.0.1:9002"
+    assert await sd.get_endpoint("srv2", None) == "http://127.0.0.1:9003"
+    with pytest.raises(UnregisteredServiceException):
+        await sd.get_endpoint("srv3", None)
+
+    # spill over when the local upstream fails
+    for _ in range(sd.load_balancer.consecutive_errors):
+        sd.load_balancer.on_request("http://127.0.0.1:9001/v1")
+        sd.load_balancer.on_response("http://127.0.0.1:9001/v1", 0.1, True)
+    assert await sd.get_endpoint("api", "v1") == "http://127.0.0.1:9000/v1"
@@ -0,0 +1,147 @@
+from typing import Any
+
+from blacksmith import (
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    SyncAbstractTransport,
+    SyncClientFactory,
+    SyncRouterDiscovery,
+)
+
+from dj_blacksmith.client._sync.batch import (
+    SyncBatchedClient,
+    SyncBatchedRouteProxy,
+)
+from dj_blacksmith.client._sync.client import SyncClientProxy
+from dj_blacksmith.client.batching import BatchConfig
+
+
+class SyncBulkTransport(SyncAbstractTransport):
+    """Serve the dummies, one per get call, or many per bulk call."""
+
+    def __init__(self, page_size: int = 0) -> None:
+        super().__init__()
+        self.calls: list[Any] = []
+        self.page_size = page_size
+
+    def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        if "names" not in req.querystring:
+            name = req.path["name"]
+            self.calls.append(name)
+            return HTTPResponse(200, {}, {"id": f"id-{name}", "name": name})
+        names = req.querystring["names"]
+        self.calls.append(names)
+        if "boom" in names:
+            raise HTTPError("Boom", req, HTTPResponse(500, {}, {}))
+        items = [
+            {"id": f"id-{name}", "name": name}
+            for name in names  # type: ignore
+            if name != "missing"
+        ]
+        headers = {"Total-Count": str(len(items))}
+        if self.page_size:
+            page = int(req.querystring.get("page", 1))  # type: ignore
+            if page * self.page_size < len(items):
+                headers["link"] = f'<{req.url}?page={page + 1}>; rel="next"'
+            items = items[(page - 1) * self.page_size : page * self.page_size]
+        return HTTPResponse(200, headers, items)
+
+
+def build_proxy(transport: SyncBulkTransport, **config: Any) -> SyncClientProxy:
+    factory: SyncClientFactory[Any] = SyncClientFactory(
+        sd=SyncRouterDiscovery(), transport=transport
+    )
+    return SyncClientProxy(
+        factory,
+        [],
+        batch_configs={
+            ("dummy", "dummies"): BatchConfig(
+                **{"param": "name", "bulk_param": "names", **config}
+            )
+        },
+    )
+
+
+def test_batched_client():
+    prox = build_proxy(SyncBulkTransport())
+    cli = prox("dummy")
+    assert isinstance(cli, SyncBatchedClient)
+    assert isinstance(cli.dummies, SyncBatchedRouteProxy)
+    assert not isinstance(cli.paged_dummies, SyncBatchedRouteProxy)
+
+    cli = SyncClientProxy(prox.client_factory, [])("dummy")
+    assert not isinstance(cli, SyncBatchedClient)
+
+
+def test_get_many():
+    transport = SyncBulkTransport()
+    cli = build_proxy(transport)("dummy")
+    resps = cli.dummies.get_many(["a", "missing", "b", "a"])
+    assert transport.calls == [["a", "missing", "b"]]
+    assert resps[0].unwrap().id == "id-a"
+    assert resps[0].raw_result.unwrap().headers == {"Total-Count": "2"}
+    assert resps[2].unwrap().id == "id-b"
+    assert resps[3] is resps[0]
+    err = resps[1].unwrap_err()
+    assert str(err) == "dummy - GET /dummies - 404 Not Found"
+    assert err.status_code == 404
+
+    # the loaded items are kept by the client proxy
+    resp = cli.dummies.get({"name": "b"})
+    assert resp is resps[2]
+    assert transport.calls == [["a", "missing", "b"]]
+
+
+def test_get_many_chunks():
+    transport = SyncBulkTransport()
+    cli = build_proxy(transport, max_batch_size=2)("dummy")
+    resps = cli.dummies.get_many(["a", "b", "c"])
+    assert [resp.unwrap().name for resp in resps] == ["a", "b", "c"]
+    assert transport.calls == [["a", "b"], ["c"]]
+
+
+def test_get_many_pages():
+    transport = SyncBulkTransport(page_size=2)
+    cli = build_proxy(transport)("dummy")
+    resps = cli.dummies.get_many(["a", "b", "missing", "c"])
+    # the items of the next pages are not missing
+    assert [resp.is_ok() for resp in resps] == [True, True, False, True]
+    assert resps[3].unwrap().name == "c"
+    assert transport.calls == [["a", "b", "missing", "c"]] * 2
+
+
+def test_get_many_error():
+    transport = SyncBulkTransport()
+    cli = build_proxy(transport)("dummy")
+    resps = cli.dummies.get_many(["a", "boom"])
+    assert [str(resp.unwrap_err()) for resp in resps] == ["Boom", "Boom"]
+
+    # the errors are not kept
+    resp = cli.dummies.get({"name": "boom"})
+    assert resp.unwrap().name == "boom"
+    assert transport.calls == [["a", "boom"], "boom"]
+
+
+def test_get_single():
+    transport = SyncBulkTransport()
+    cli = build_proxy(transport)("dummy")
+    resp = cli.dummies.get({"name": "a"})
+    assert resp.unwrap().id == "id-a"
+    assert transport.calls == ["a"]
+
+
+def test_get_timeout():
+    transport = SyncBulkTransport()
+    cli = build_proxy(transport)("dummy")
+    cli.dummies.get({"name": "a"}, 10)
+    cli.dummies.get({"name": "a"}, 10)
+    # not batched, nor kept
+    assert transport.calls == ["a", "a"]
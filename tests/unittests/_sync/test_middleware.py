@@ -1,16 +1,34 @@
-from typing import Any
+from datetime import timedelta
+from typing import Any, Optional
 
 import pytest
-from blacksmith import CacheControlPolicy, PrometheusMetrics
+from blacksmith import (
+    CacheControlPolicy,
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    PrometheusMetrics,
+    SyncAbstractTransport,
+    SyncPrometheusMiddleware,
+)
 from prometheus_client import CollectorRegistry  # type: ignore
 
+from dj_blacksmith.client._concurrency import SyncInFlight
 from dj_blacksmith.client._sync.middleware import (
     SyncCircuitBreakerMiddlewareBuilder,
+    SyncConditionalHTTPCacheMiddleware,
+    SyncConditionalHTTPCacheMiddlewareBuilder,
     SyncHTTPAddHeadersMiddlewareBuilder,
     SyncHTTPBearerMiddlewareBuilder,
     SyncHTTPCacheMiddlewareBuilder,
+    SyncInFlightMiddleware,
+    SyncLoadBalancerMiddleware,
     SyncPrometheusMiddlewareBuilder,
+    SyncSlowCallLogMiddlewareBuilder,
 )
+from dj_blacksmith.client.balancer import LoadBalancer
+from tests.unittests.fixtures import SyncDummyTransport
 
 
 @pytest.mark.parametrize(
@@ -105,6 +123,146 @@ def test_build_cache(params: dict[str, Any]):
     )
 
 
+def test_build_conditional_cache():
+    builder = SyncConditionalHTTPCacheMiddlewareBuilder(
+        {"http_cache": {"redis": "redis://red/42", "revalidate_ttl": 3600}}, None
+    )
+    cache = builder.build()
+    assert isinstance(cache, SyncConditionalHTTPCacheMiddleware)
+    assert cache.revalidate_ttl == timedelta(seconds=3600)
+    assert cache._policy.__class__.__name__ == "CacheControlPolicy"  # type: ignore
+
+
+class SyncMemoryCache:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        return self.values.get(key)
+
+    def set(self, key: str, val: str, ex: timedelta) -> None:
+        self.values[key] = val
+
+    def expire(self) -> None:
+        """Expire the cached responses, the kept ones remain."""
+        self.values = {
+            key: val
+            for key, val in self.values.items()
+            if key.startswith("revalidate:")
+        }
+
+
+class SyncConditionalTransport(SyncAbstractTransport):
+    def __init__(self, *responses: HTTPResponse) -> None:
+        super().__init__()
+        self.responses = list(responses)
+        self.headers: list[dict[str, str]] = []
+
+    def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        self.headers.append(req.headers)
+        resp = self.responses.pop(0)
+        if resp.status_code >= 300:
+            raise HTTPError(f"{resp.status_code}", req, resp)
+        return resp
+
+
+def call_conditional_cache(
+    transport: SyncConditionalTransport, cache: SyncMemoryCache
+) -> HTTPResponse:
+    handle = SyncConditionalHTTPCacheMiddleware(cache)(transport)  # type: ignore
+    return handle(
+        HTTPRequest("GET", "http://dummy/dummies/{name}", path={"name": "alive"}),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+
+
+def test_conditional_cache_not_modified():
+    cache = SyncMemoryCache()
+    transport = SyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {
+                "Cache-Control": "public, max-age=60",
+                "ETag": '"v1"',
+                "Content-Length": "25",
+            },
+            {"id": "1", "name": "alive"},
+        ),
+        HTTPResponse(304, {"Cache-Control": "public, max-age=120", "ETag": '"v1"'}, {}),
+    )
+    call_conditional_cache(transport, cache)
+    cache.expire()
+    resp = call_conditional_cache(transport, cache)
+    assert transport.headers == [{}, {"If-None-Match": '"v1"'}]
+    assert resp.status_code == 200
+    assert resp.headers == {
+        "cache-control": "public, max-age=120",
+        "etag": '"v1"',
+        "content-length": "25",
+    }
+    assert resp.json == {"id": "1", "name": "alive"}
+
+    # cached again
+    resp = call_conditional_cache(transport, cache)
+    assert resp.json == {"id": "1", "name": "alive"}
+    assert len(transport.headers) == 2
+
+
+def test_conditional_cache_modified():
+    cache = SyncMemoryCache()
+    transport = SyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {"Cache-Control": "no-cache", "Last-Modified": "Mon, 19 Oct 2026"},
+            {"id": "1", "name": "alive"},
+        ),
+        HTTPResponse(200, {"Cache-Control": "no-cache"}, {"id": "2", "name": "alive"}),
+        HTTPResponse(200, {}, {"id": "3", "name": "alive"}),
+    )
+    call_conditional_cache(transport, cache)
+    resp = call_conditional_cache(transport, cache)
+    assert resp.json == {"id": "2", "name": "alive"}
+    # the response without validators is not kept
+    resp = call_conditional_cache(transport, cache)
+    assert transport.headers == [
+        {},
+        {"If-Modified-Since": "Mon, 19 Oct 2026"},
+        {"If-Modified-Since": "Mon, 19 Oct 2026"},
+    ]
+
+
+def test_conditional_cache_error():
+    cache = SyncMemoryCache()
+    transport = SyncConditionalTransport(
+        HTTPResponse(200, {"ETag": '"v1"'}, {"id": "1", "name": "alive"}),
+        HTTPResponse(503, {}, {}),
+    )
+    call_conditional_cache(transport, cache)
+    with pytest.raises(HTTPError):
+        call_conditional_cache(transport, cache)
+
+
+def test_conditional_cache_no_store():
+    cache = SyncMemoryCache()
+    transport = SyncConditionalTransport(
+        HTTPResponse(
+            200,
+            {"Cache-Control": "no-store", "ETag": '"v1"'},
+            {"id": "1", "name": "alive"},
+        ),
+    )
+    call_conditional_cache(transport, cache)
+    assert cache.values == {}
+
+
 @pytest.mark.parametrize(
     "params",
     [
@@ -134,3 +292,147 @@ def test_add_bearer_token(params: dict[str, Any]):
     builder = SyncHTTPBearerMiddlewareBuilder(params["settings"], params["metrics"])
     cache = builder.build()
     assert cache.headers == params["expected"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0}},
+                "with_prometheus": True,
+                "calls": 2,
+                "expected_records": 2,
+            },
+            id="reuse prometheus timings",
+        ),
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0}},
+                "with_prometheus": False,
+                "calls": 2,
+                "expected_records": 2,
+            },
+            id="measure timings",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "slow_call_log": {"threshold": 0, "thresholds": {"dummy": 60}}
+                },
+                "with_prometheus": True,
+                "calls": 2,
+                "expected_records": 0,
+            },
+            id="per client threshold",
+        ),
+        pytest.param(
+            {
+                "settings": {"slow_call_log": {"threshold": 0, "max_records": 1}},
+                "with_prometheus": True,
+                "calls": 3,
+                "expected_records": 1,
+            },
+            id="rate limited",
+        ),
+    ],
+)
+def test_slow_call_log(
+    params: dict[str, Any],
+    prometheus_registry: CollectorRegistry,
+    caplog: pytest.LogCaptureFixture,
+):
+    metrics = PrometheusMetrics(registry=prometheus_registry)
+    builder = SyncSlowCallLogMiddlewareBuilder(params["settings"], metrics)
+    slow_call_log = builder.build()
+    next: Any = SyncDummyTransport()
+    if params["with_prometheus"]:
+        next = SyncPrometheusMiddleware(metrics)(next)
+    handle = slow_call_log(next)
+    for _ in range(params["calls"]):
+        handle(
+            HTTPRequest("GET", "/dummies/{name}"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+
+    records = [r.blacksmith for r in caplog.records if hasattr(r, "blacksmith")]
+    assert len(records) == params["expected_records"]
+    for record in records:
+        assert record["service"] == "dummy"
+        assert record["version"] == "v1"
+        assert record["path"] == "/dummies/{name}"
+        assert record["status_code"] == 200
+        assert record["latency"] >= 0
+        # the dummy transport does not measure its latency
+        assert record["transport_latency"] is None
+        assert record["cache_latency"] is None
+
+
+class FailingTransport(SyncAbstractTransport):
+    def __init__(self, status_code: int):
+        super().__init__()
+        self.status_code = status_code
+
+    def __call__(
+        self, req: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        raise HTTPError(
+            f"{self.status_code}", req, HTTPResponse(self.status_code, {}, {})
+        )
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"next": SyncDummyTransport(), "expected_errors": 0}, id="success"
+        ),
+        pytest.param(
+            {"next": FailingTransport(404), "expected_errors": 0}, id="client error"
+        ),
+        pytest.param(
+            {"next": FailingTransport(503), "expected_errors": 1}, id="server error"
+        ),
+    ],
+)
+def test_load_balancer_middleware(params: dict[str, Any]):
+    load_balancer = LoadBalancer()
+    handle = SyncLoadBalancerMiddleware(load_balancer)(params["next"])
+    try:
+        handle(
+            HTTPRequest("GET", "http://10.0.0.1:8000/v1/dummies/{name}"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    except HTTPError:
+        pass
+    stats = load_balancer.stats["http://10.0.0.1:8000/v1"]
+    assert stats.in_flight == 0
+    assert stats.latency >= 0
+    assert stats.consecutive_errors == params["expected_errors"]
+
+
+def test_in_flight_middleware():
+    in_flight = SyncInFlight()
+    counts: list[int] = []
+
+    def next(
+        req: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        counts.append(in_flight.count)
+        raise HTTPError("503", req, HTTPResponse(503, {}, {}))
+
+    handle = SyncInFlightMiddleware(in_flight)(next)
+    with pytest.raises(HTTPError):
+        handle(
+            HTTPRequest("GET", "http://dummy/dummies/alive"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    assert counts == [1]
+    assert in_flight.count == 0
+    assert in_flight.wait(0) is True
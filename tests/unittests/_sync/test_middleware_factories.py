@@ -1,11 +1,17 @@
 from typing import Any
 
 import pytest
+from blacksmith import HTTPRequest, HTTPTimeout
 from django.test import RequestFactory
+from django.urls import ResolverMatch
+from prometheus_client import CollectorRegistry  # type: ignore
 
 from dj_blacksmith.client._sync.middleware_factory import (
     SyncForwardHeaderFactoryBuilder,
+    SyncNPlusOneDetectorFactoryBuilder,
 )
+from dj_blacksmith.client.call_log import NPlusOneError, get_call_log, get_view_name
+from tests.unittests.fixtures import SyncDummyTransport
 
 
 @pytest.mark.parametrize(
@@ -23,3 +29,93 @@ def test_add_header(req: RequestFactory, params: dict[str, Any]):
     fb = SyncForwardHeaderFactoryBuilder({"forwarded_headers": params["fwd_headers"]})
     mid = fb(request)
     assert mid.headers == params["expected"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {
+            "settings": {},
+            "calls": 6,
+            "expected_logs": [
+                "N+1 api calls detected in unknown: "
+                "dummy - GET /dummies/{name} called more than 5 times"
+            ],
+            "expected_metric": 1.0,
+        },
+        {
+            "settings": {"n_plus_one": {"threshold": 2}},
+            "calls": 10,
+            "expected_logs": [
+                "N+1 api calls detected in unknown: "
+                "dummy - GET /dummies/{name} called more than 2 times"
+            ],
+            "expected_metric": 1.0,
+        },
+        {
+            "settings": {"n_plus_one": {"threshold": 2}},
+            "calls": 2,
+            "expected_logs": [],
+            "expected_metric": None,
+        },
+    ],
+)
+def test_n_plus_one_detector(
+    req: RequestFactory,
+    params: dict[str, Any],
+    prometheus_registry: CollectorRegistry,
+    caplog: pytest.LogCaptureFixture,
+):
+    request = req.get("/users")
+    fb = SyncNPlusOneDetectorFactoryBuilder(params["settings"])
+    next = SyncDummyTransport()
+    for _ in range(params["calls"]):
+        # a middleware is built per client, they share the call log of the request
+        mid = fb(request)
+        mid(next)(
+            HTTPRequest("GET", "/dummies/{name}"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+
+    assert [r.getMessage() for r in caplog.records] == params["expected_logs"]
+    assert (
+        prometheus_registry.get_sample_value(
+            "blacksmith_n_plus_one_total",
+            {
+                "view": "unknown",
+                "client_name": "dummy",
+                "method": "GET",
+                "path": "/dummies/{name}",
+            },
+        )
+        == params["expected_metric"]
+    )
+    assert get_call_log(request).calls == {
+        ("dummy", "GET", "/dummies/{name}"): params["calls"]
+    }
+
+
+def test_n_plus_one_detector_raise(req: RequestFactory):
+    request = req.get("/users")
+    fb = SyncNPlusOneDetectorFactoryBuilder(
+        {"n_plus_one": {"threshold": 1, "raise_error": True}}
+    )
+    handle = fb(request)(SyncDummyTransport())
+    http_req = HTTPRequest("GET", "/dummies/{name}")
+    handle(http_req, "dummy", "/dummies/{name}", HTTPTimeout())
+    with pytest.raises(NPlusOneError) as ctx:
+        handle(http_req, "dummy", "/dummies/{name}", HTTPTimeout())
+    assert str(ctx.value) == (
+        "unknown - dummy - GET /dummies/{name} called 2 times in one request"
+    )
+
+
+def test_get_view_name(req: RequestFactory):
+    request = req.get("/users/42")
+    assert get_view_name(request) == "unknown"
+    request.resolver_match = ResolverMatch(
+        lambda request: None, (), {"id": "42"}, url_name="user", namespaces=["api"]
+    )
+    assert get_view_name(request) == "api:user"
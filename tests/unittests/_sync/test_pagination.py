@@ -0,0 +1,129 @@
+from typing import Any
+
+import pytest
+from blacksmith import (
+    HTTPError,
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    SyncAbstractTransport,
+    SyncClientFactory,
+    SyncRouterDiscovery,
+)
+from blacksmith.domain.model.params import Metadata
+
+from dj_blacksmith.client._sync.client import SyncClientProxy
+from dj_blacksmith.client._sync.pagination import SyncCollectionStream
+
+
+class SyncPagedTransport(SyncAbstractTransport):
+    """Serve a collection of 2 items per page."""
+
+    def __init__(self, pages: int, failing_page: int = 0):
+        super().__init__()
+        self.pages = pages
+        self.failing_page = failing_page
+        self.calls: list[int] = []
+
+    def __call__(
+        self,
+        req: HTTPRequest,
+        client_name: str,
+        path: str,
+        timeout: HTTPTimeout,
+    ) -> HTTPResponse:
+        page = int(req.querystring.get("page", 1))  # type: ignore
+        self.calls.append(page)
+        if page == self.failing_page:
+            raise HTTPError("Boom", req, HTTPResponse(500, {}, {}))
+        headers = {}
+        if page < self.pages:
+            headers["link"] = f'<{req.url}?page={page + 1}>; rel="next"'
+        return HTTPResponse(
+            200,
+            headers,
+            [{"id": f"{page}.{i}", "name": "alive"} for i in range(2)],
+        )
+
+
+def build_proxy(transport: SyncPagedTransport) -> SyncClientProxy:
+    factory: SyncClientFactory[Any] = SyncClientFactory(
+        sd=SyncRouterDiscovery(), transport=transport
+    )
+    return SyncClientProxy(factory, [])
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_stream_collection(prefetch: bool):
+    transport = SyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    items = [
+        item.id
+        for item in prox.stream_collection("dummy", "paged_dummies", prefetch=prefetch)
+    ]
+    assert items == ["1.0", "1.1", "2.0", "2.1", "3.0", "3.1"]
+    assert transport.calls == [1, 2, 3]
+
+
+def test_stream_collection_params():
+    transport = SyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    items = [
+        item.id
+        for item in prox.stream_collection("dummy", "paged_dummies", {"page": 2})
+    ]
+    assert items == ["2.0", "2.1", "3.0", "3.1"]
+    assert transport.calls == [2, 3]
+
+
+def test_stream_collection_break():
+    transport = SyncPagedTransport(pages=3)
+    prox = build_proxy(transport)
+    stream = prox.stream_collection("dummy", "paged_dummies", prefetch=False)
+    for item in stream:
+        assert item.id == "1.0"
+        break
+    stream.close()
+    assert transport.calls == [1]
+
+
+def test_stream_collection_error():
+    transport = SyncPagedTransport(pages=3, failing_page=2)
+    prox = build_proxy(transport)
+    items: list[str] = []
+    with pytest.raises(HTTPError) as ctx:
+        for item in prox.stream_collection("dummy", "paged_dummies"):
+            items.append(item.id)
+    assert str(ctx.value) == "Boom"
+    assert items == ["1.0", "1.1"]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "links": {"next": {"url": "http://dummy/d?page=2&q=x", "rel": "next"}},
+                "params": {"page": 1, "size": 10},
+                "expected": {"page": "2", "size": 10, "q": "x"},
+            },
+            id="next",
+        ),
+        pytest.param(
+            {"links": {}, "params": {"page": 1}, "expected": None},
+            id="last page",
+        ),
+        pytest.param(
+            {
+                "links": {"next": {"url": "http://dummy/d?page=1", "rel": "next"}},
+                "params": {"page": "1"},
+                "expected": None,
+            },
+            id="same page",
+        ),
+    ],
+)
+def test_next_params(params: dict[str, Any]):
+    stream = SyncCollectionStream(None)  # type: ignore
+    meta = Metadata(count=0, total_count=None, links=params["links"])
+    assert stream.next_params(meta, params["params"]) == params["expected"]
@@ -0,0 +1,182 @@
+import json
+from typing import Any, Optional, Union
+
+import pytest
+from blacksmith import HTTPTimeout
+from django.test import override_settings
+from redis.exceptions import ConnectionError
+
+from dj_blacksmith.client._concurrency import SyncRedis, SyncStopEvent
+from dj_blacksmith.client._sync.reload import SyncReloadListener
+from dj_blacksmith.client.config import get_client_config
+
+SETTINGS = {"default": {"sd": "router", "router_sd_config": {}}}
+
+
+class SyncDummyPubSub:
+    def __init__(
+        self, messages: list[Union[dict[str, Any], Exception]], stop: SyncStopEvent
+    ):
+        self.messages = messages
+        self.stop = stop
+        self.channels: list[str] = []
+        self.subscribed = False
+        self.closed = False
+
+    def subscribe(self, channel: str) -> None:
+        self.channels.append(channel)
+        self.subscribed = True
+
+    def get_message(
+        self, ignore_subscribe_messages: bool, timeout: float
+    ) -> Optional[dict[str, Any]]:
+        if not self.messages:
+            self.stop.set()
+            return None
+        message = self.messages.pop(0)
+        if isinstance(message, Exception):
+            raise message
+        return message
+
+    def reset(self) -> None:
+        self.subscribed = False
+        self.closed = True
+
+
+class SyncDummyRedis:
+    def __init__(self, pubsub: SyncDummyPubSub):
+        self._pubsub = pubsub
+        self.closed = False
+
+    def pubsub(self) -> SyncDummyPubSub:
+        return self._pubsub
+
+    def close(self) -> None:
+        self.closed = True
+
+
+class Reloads:
+    def __init__(self) -> None:
+        self.reloads: list[tuple[list[str], float]] = []
+
+    def __call__(self, names: list[str], timeout: float) -> None:
+        self.reloads.append((names, timeout))
+
+
+def message(clients: Any) -> dict[str, Any]:
+    return {"type": "message", "data": json.dumps({"clients": clients}).encode()}
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "data": json.dumps({"clients": {"default": {"timeout": {"read": 5}}}}),
+                "expected_reloads": [(["default"], 1.0)],
+                "expected_logs": [],
+            },
+            id="reload",
+        ),
+        pytest.param(
+            {
+                # reloaded by the other listener of the process
+                "data": json.dumps({"clients": {"default": {"sd": "router"}}}),
+                "expected_reloads": [(["default"], 1.0)],
+                "expected_logs": [],
+            },
+            id="unchanged",
+        ),
+        pytest.param(
+            {
+                "data": "{",
+                "expected_reloads": [],
+                "expected_logs": [
+                    "Invalid blacksmith settings reloaded: Expecting property name "
+                    "enclosed in double quotes: line 1 column 2 (char 1)"
+                ],
+            },
+            id="invalid json",
+        ),
+        pytest.param(
+            {
+                "data": json.dumps({"clients": {"nope": {}}}),
+                "expected_reloads": [],
+                "expected_logs": [
+                    "Invalid blacksmith settings reloaded: Client nope does not exists"
+                ],
+            },
+            id="unknown client",
+        ),
+    ],
+)
+def test_reload(params: dict[str, Any], caplog: pytest.LogCaptureFixture):
+    caplog.set_level("INFO", "dj_blacksmith")
+    reloads = Reloads()
+    listener = SyncReloadListener(reloads)
+    with override_settings(BLACKSMITH_CLIENT=SETTINGS):
+        listener.reload(params["data"].encode(), 1.0)
+    assert reloads.reloads == params["expected_reloads"]
+    assert caplog.messages == params["expected_logs"]
+
+
+def test_reload_error(caplog: pytest.LogCaptureFixture):
+    def reload(names: list[str], timeout: float) -> None:
+        raise ValueError("Boom")
+
+    listener = SyncReloadListener(reload)
+    with override_settings(BLACKSMITH_CLIENT=SETTINGS):
+        listener.reload(
+            json.dumps({"clients": {"default": {"timeout": {"read": 5}}}}).encode(),
+            1.0,
+        )
+        # the previous settings are restored
+        assert get_client_config("default").timeout == HTTPTimeout()
+    assert caplog.messages == ["Unable to reload the blacksmith clients"]
+
+
+def test_listen(monkeypatch: Any, caplog: pytest.LogCaptureFixture):
+    reloads = Reloads()
+    listener = SyncReloadListener(reloads)
+    pubsub = SyncDummyPubSub(
+        [
+            message({"default": {"timeout": {"read": 5}}}),
+            ConnectionError("Connection refused"),
+        ],
+        listener.stop,
+    )
+    redis = SyncDummyRedis(pubsub)
+    monkeypatch.setattr(SyncRedis, "from_url", lambda url: redis)
+    with override_settings(
+        BLACKSMITH_CLIENT=SETTINGS,
+        BLACKSMITH_RELOAD={"redis": "redis://redis/0", "drain_timeout": 2},
+    ):
+        listener.start()
+        assert listener.task is not None
+        listener.task.join()
+        assert get_client_config("default").timeout.read == 5
+
+    assert reloads.reloads == [(["default"], 2)]
+    assert pubsub.channels == ["dj_blacksmith:reload"]
+    assert pubsub.closed is True
+    assert redis.closed is True
+    assert caplog.messages == [
+        "Unable to listen to the blacksmith reloads: Connection refused"
+    ]
+
+
+def test_start_disabled():
+    listener = SyncReloadListener(Reloads())
+    listener.start()
+    assert listener.task is None
+
+
+def test_aclose(monkeypatch: Any):
+    listener = SyncReloadListener(Reloads())
+    listener.close()
+    with override_settings(BLACKSMITH_RELOAD={"redis": "redis://redis/0"}):
+        listener.start()
+    assert listener.task is None
+
+    listener.reset()
+    assert listener.stop.is_set() is False
@@ -0,0 +1,417 @@
+from typing import Any, Callable
+
+import pytest
+from blacksmith import (
+    HTTPRequest,
+    HTTPResponse,
+    HTTPTimeout,
+    SyncAbstractServiceDiscovery,
+    SyncAbstractTransport,
+)
+from blacksmith.domain.exceptions import UnregisteredServiceException
+from blacksmith.typing import ServiceName, Url, Version
+
+from dj_blacksmith.client._sync.client import build_sd
+from dj_blacksmith.client._sync.sd import (
+    SyncCachingDiscovery,
+    SyncCompiledRouterDiscovery,
+    SyncConsulWatchDiscovery,
+    SyncZoneNomadDiscovery,
+)
+from dj_blacksmith.client.balancer import RoundRobinLoadBalancer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeDiscovery(SyncAbstractServiceDiscovery):
+    def __init__(self):
+        self.calls = 0
+        self.error: Any = None
+
+    def get_endpoint(self, service: ServiceName, version: Version) -> Url:
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return f"http://{service}.{version}:{self.calls}"
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fake_sd():
+    return FakeDiscovery()
+
+
+@pytest.fixture
+def caching_sd(fake_sd: FakeDiscovery, clock: FakeClock):
+    return SyncCachingDiscovery(fake_sd, ttl=30, refresh_ahead=5, _clock=clock)
+
+
+def join_refreshes(sd: SyncCachingDiscovery):
+    for task in sd.refreshing.values():
+        task.join()
+
+
+def test_build_sd_cache():
+    sd = build_sd(
+        {
+            "sd": "router",
+            "router_sd_config": {},
+            "sd_cache": {"ttl": 60, "refresh_ahead": 10},
+        }
+    )
+    assert isinstance(sd, SyncCachingDiscovery)
+    assert sd.ttl == 60
+    assert sd.refresh_ahead == 10
+
+
+def test_cache_endpoint(
+    caching_sd: SyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    clock.now += 20
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    assert fake_sd.calls == 1
+
+    assert caching_sd.get_endpoint("api", "v2") == "http://api.v2:2"
+    assert fake_sd.calls == 2
+
+
+def test_refresh_ahead(
+    caching_sd: SyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    caching_sd.get_endpoint("api", "v1")
+    clock.now += 26
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    join_refreshes(caching_sd)
+    assert fake_sd.calls == 2
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:2"
+    assert fake_sd.calls == 2
+
+
+def test_expired(
+    caching_sd: SyncCachingDiscovery, fake_sd: FakeDiscovery, clock: FakeClock
+):
+    caching_sd.get_endpoint("api", "v1")
+    clock.now += 31
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:2"
+    assert fake_sd.calls == 2
+
+
+def test_last_known_good(
+    caching_sd: SyncCachingDiscovery,
+    fake_sd: FakeDiscovery,
+    clock: FakeClock,
+    caplog: Any,
+):
+    caching_sd.get_endpoint("api", "v1")
+    fake_sd.error = ConnectionError("consul is down")
+
+    clock.now += 26
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    join_refreshes(caching_sd)
+    assert fake_sd.calls == 2
+    assert "Unable to refresh the endpoint of api/v1" in caplog.text
+
+    clock.now += 5
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    assert fake_sd.calls == 3
+    assert "using the last known endpoint http://api.v1:1" in caplog.text
+
+    # the next calls are served from the cache, and refreshed in background
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    join_refreshes(caching_sd)
+    assert fake_sd.calls == 4
+
+    fake_sd.error = None
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:1"
+    join_refreshes(caching_sd)
+    assert caching_sd.get_endpoint("api", "v1") == "http://api.v1:5"
+
+
+def test_unknown_endpoint_error(
+    caching_sd: SyncCachingDiscovery, fake_sd: FakeDiscovery
+):
+    fake_sd.error = ConnectionError("consul is down")
+    with pytest.raises(ConnectionError):
+        caching_sd.get_endpoint("api", "v1")
+
+
+class FakeConsulTransport(SyncAbstractTransport):
+    """Respond the instances of the service, one response per call."""
+
+    def __init__(self, responses: list[Any]):
+        super().__init__()
+        self.responses = responses
+        self.requests: list[HTTPRequest] = []
+        self.on_last_response: Callable[[], None] = lambda: None
+
+    def __call__(
+        self, request: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        self.requests.append(request)
+        if len(self.responses) > 1:
+            resp = self.responses.pop(0)
+        else:
+            self.on_last_response()
+            resp = self.responses[0]
+        if isinstance(resp, Exception):
+            raise resp
+        index, instances = resp
+        return HTTPResponse(
+            200,
+            {"X-Consul-Index": str(index)},
+            [
+                {
+                    "Address": addr,
+                    "ServicePort": port,
+                    "NodeMeta": {"zone": f"zone-{addr[-1]}"},
+                }
+                for addr, port in instances
+            ],
+        )
+
+
+def consul_watch_sd(
+    transport: FakeConsulTransport, **kwargs: Any
+) -> SyncConsulWatchDiscovery:
+    sd = SyncConsulWatchDiscovery(
+        addr="http://consul:8500/v1",
+        service_url_fmt="http://{address}:{port}/{version}",
+        retry_delay=0,
+        # the fake transport responds the catalog of the services
+        passing_only=False,
+        _transport=transport,
+        **kwargs,
+    )
+    transport.on_last_response = sd.stopped.set
+    return sd
+
+
+def join_watchers(sd: SyncConsulWatchDiscovery):
+    for task in sd.watchers.values():
+        task.join()
+
+
+def test_build_sd_load_balancer():
+    sd = build_sd(
+        {
+            "sd": "consul_watch",
+            "consul_sd_config": {},
+            "load_balancer": {"strategy": "round_robin"},
+        }
+    )
+    assert isinstance(sd, SyncConsulWatchDiscovery)
+    assert isinstance(sd.load_balancer, RoundRobinLoadBalancer)
+
+
+def test_build_sd_load_balancer_error():
+    with pytest.raises(RuntimeError) as ctx:
+        build_sd({"sd": "router", "router_sd_config": {}, "load_balancer": {}})
+    assert (
+        str(ctx.value) == "Load balancing requires the consul_watch service discovery"
+    )
+
+
+def test_build_sd_consul_watch():
+    sd = build_sd(
+        {
+            "sd": "consul_watch",
+            "consul_sd_config": {"addr": "http://consul:8500/v1", "wait": 10},
+        }
+    )
+    assert isinstance(sd, SyncConsulWatchDiscovery)
+    assert sd.wait == 10
+    assert sd.passing_only is True
+
+
+def test_consul_watch():
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            (43, [("10.0.0.2", 8000)]),
+            (44, [("10.0.0.2", 8000), ("10.0.0.3", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport)
+    assert sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    join_watchers(sd)
+
+    assert sd.endpoints == {
+        ("api", "v1"): ["http://10.0.0.2:8000/v1", "http://10.0.0.3:8000/v1"],
+    }
+    assert [(req.url, req.querystring) for req in transport.requests] == [
+        ("http://consul:8500/v1/catalog/service/api-v1", {}),
+        ("http://consul:8500/v1/catalog/service/api-v1", {"index": 42, "wait": "55s"}),
+        ("http://consul:8500/v1/catalog/service/api-v1", {"index": 43, "wait": "55s"}),
+    ]
+    assert sd.get_endpoint("api", "v1") in sd.endpoints[("api", "v1")]
+    assert len(transport.requests) == 3
+
+
+def test_consul_watch_index_reset():
+    transport = FakeConsulTransport([(10, [("10.0.0.1", 8000)])])
+    sd = consul_watch_sd(transport)
+    assert sd.fetch("api", "v1", 50) == 1
+    assert sd.fetch("api", "v1", 5) == 10
+
+
+def test_consul_watch_error(caplog: Any):
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            ConnectionError("consul is down"),
+            (43, [("10.0.0.2", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport)
+    assert sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    join_watchers(sd)
+    assert "Unable to watch the service api/v1 in consul" in caplog.text
+    assert sd.endpoints == {("api", "v1"): ["http://10.0.0.2:8000/v1"]}
+
+
+def test_consul_watch_unregistered():
+    transport = FakeConsulTransport([(42, [])])
+    sd = consul_watch_sd(transport)
+    with pytest.raises(UnregisteredServiceException):
+        sd.get_endpoint("api", "v1")
+    sd.stop()
+
+
+def test_consul_watch_load_balancer():
+    transport = FakeConsulTransport([(42, [("10.0.0.1", 8000), ("10.0.0.2", 8000)])])
+    sd = consul_watch_sd(transport, load_balancer=RoundRobinLoadBalancer())
+    endpoints = {sd.get_endpoint("api", "v1") for _ in range(2)}
+    assert endpoints == {"http://10.0.0.1:8000/v1", "http://10.0.0.2:8000/v1"}
+    join_watchers(sd)
+
+
+class FakeConsulHealthTransport(SyncAbstractTransport):
+    def __call__(
+        self, request: HTTPRequest, client_name: str, path: str, timeout: HTTPTimeout
+    ) -> HTTPResponse:
+        self.request = request
+        return HTTPResponse(
+            200,
+            {"X-Consul-Index": "42"},
+            [
+                {
+                    "Node": {"Address": "10.0.0.1"},
+                    "Service": {"Address": "", "Port": 8000},
+                },
+                {
+                    "Node": {"Address": "10.0.0.1"},
+                    "Service": {"Address": "10.0.1.1", "Port": 8001},
+                },
+            ],
+        )
+
+
+def test_consul_watch_passing_only():
+    transport = FakeConsulHealthTransport()
+    sd = SyncConsulWatchDiscovery(_transport=transport)
+    sd.fetch("api", "v1")
+    assert transport.request.url == "http://consul:8500/v1/health/service/api-v1"
+    assert transport.request.querystring == {"passing": "true"}
+    assert sd.endpoints == {
+        ("api", "v1"): ["http://10.0.0.1:8000/v1", "http://10.0.1.1:8001/v1"],
+    }
+
+
+def test_compiled_router():
+    sd = SyncCompiledRouterDiscovery(
+        service_url_fmt="http://{service}.{version}:80",
+        unversioned_service_url_fmt="http://{service}:80",
+    )
+    # the services of the registry are compiled
+    assert sd.endpoints[("dummy", "v1")] == "http://dummy.v1:80"
+    assert sd.get_endpoint("dummy", "v1") == "http://dummy.v1:80"
+
+    assert sd.get_endpoint("api", "v2") == "http://api.v2:80"
+    assert sd.get_endpoint("srv", None) == "http://srv:80"
+    assert sd.endpoints[("api", "v2")] == "http://api.v2:80"
+    assert sd.endpoints[("srv", None)] == "http://srv:80"
+
+
+def test_consul_watch_zone_affinity():
+    transport = FakeConsulTransport([(42, [("10.0.0.1", 8000), ("10.0.0.2", 8000)])])
+    sd = consul_watch_sd(transport, zone_affinity={"zone": "zone-2"})
+    for _ in range(5):
+        assert sd.get_endpoint("api", "v1") == "http://10.0.0.2:8000/v1"
+    assert sd.zones == {
+        "http://10.0.0.1:8000/v1": "zone-1",
+        "http://10.0.0.2:8000/v1": "zone-2",
+    }
+    join_watchers(sd)
+
+
+def test_consul_watch_prune():
+    transport = FakeConsulTransport(
+        [
+            (42, [("10.0.0.1", 8000)]),
+            (43, [("10.0.0.2", 8000)]),
+            (44, [("10.0.0.2", 8000), ("10.0.0.3", 8000)]),
+        ]
+    )
+    sd = consul_watch_sd(transport, zone_affinity={"zone": "zone-1"})
+    sd.load_balancer.on_request("http://10.0.0.9:8000/v1")
+    sd.load_balancer.on_response("http://10.0.0.9:8000/v1", 0.1, False)
+    assert sd.get_endpoint("api", "v1") == "http://10.0.0.1:8000/v1"
+    join_watchers(sd)
+    # the instances that are gone are forgotten
+    assert sd.zones == {
+        "http://10.0.0.2:8000/v1": "zone-2",
+        "http://10.0.0.3:8000/v1": "zone-3",
+    }
+    assert "http://10.0.0.9:8000/v1" not in sd.load_balancer.stats
+
+
+def test_build_sd_zone_nomad():
+    sd = build_sd(
+        {
+            "sd": "nomad",
+            "nomad_sd_config": {"zone_affinity": {"zone": "eu-west-1a"}},
+        }
+    )
+    assert isinstance(sd, SyncZoneNomadDiscovery)
+    assert sd.zone_affinity is not None
+    assert sd.zone_affinity.zone == "eu-west-1a"
+
+
+def test_zone_nomad(monkeypatch: Any):
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_api_v1", "127.0.0.1:9000")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_api_v1_eu-west-1a", "127.0.0.1:9001")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_srv", "127.0.0.1:9002")
+    monkeypatch.setenv("NOMAD_UPSTREAM_ADDR_srv2_eu-west-1a", "127.0.0.1:9003")
+    sd = SyncZoneNomadDiscovery(
+        zone_affinity={"zone_env": "NOMAD_META_zone", "min_healthy_ratio": 1}
+    )
+    assert sd.zone_affinity is not None
+    assert sd.zone_affinity.zone == ""
+    assert sd.get_endpoint("api", "v1") == "http://127.0.0.1:9000/v1"
+
+    monkeypatch.setenv("NOMAD_META_zone", "eu-west-1a")
+    sd = SyncZoneNomadDiscovery(
+        zone_affinity={"zone_env": "NOMAD_META_zone", "min_healthy_ratio": 1}
+    )
+    assert sd.get_endpoint("api", "v1") == "http://127.0.0.1:9001/v1"
+    assert sd.get_endpoint("srv", None) == "http://127.0.0.1:9002"
+    assert sd.get_endpoint("srv2", None) == "http://127.0.0.1:9003"
+    with pytest.raises(UnregisteredServiceException):
+        sd.get_endpoint("srv3", None)
+
+    # spill over when the local upstream fails
+    for _ in range(sd.load_balancer.consecutive_errors):
+        sd.load_balancer.on_request("http://127.0.0.1:9001/v1")
+        sd.load_balancer.on_response("http://127.0.0.1:9001/v1", 0.1, True)
+    assert sd.get_endpoint("api", "v1") == "http://127.0.0.1:9000/v1"
@@ -0,0 +1,317 @@
+import importlib.util
+from typing import Any
+
+import pytest
+from blacksmith import HTTPError, HTTPRequest, HTTPTimeout
+from django.test import override_settings
+
+from dj_blacksmith.client._sync.client import build_client_transport, client_factory
+from dj_blacksmith.client._sync.transport import (
+    SyncPooledHttpxTransport,
+    SyncTransportRegistry,
+)
+from dj_blacksmith.client.json_stream import JsonItems
+from dj_blacksmith.client.timing import CallTimings, current_timings
+from tests.unittests.fixtures import SyncDummyTransport
+
+
+def test_transport_registry():
+    registry = SyncTransportRegistry()
+    transport = registry.get(True, None, {"max_connections": 10})
+    assert transport.limits.max_connections == 10
+    assert registry.get(True, None, {"max_connections": 10}) is transport
+    assert registry.get(False, None, {"max_connections": 10}) is not transport
+    assert registry.get(True, None, {"max_connections": 20}) is not transport
+    assert (
+        registry.get(True, {"http://": "http://proxy"}, {"max_connections": 10})
+        is not transport
+    )
+
+
+def test_transport_registry_pool():
+    registry = SyncTransportRegistry()
+    transport = registry.get(True, None, {"max_connections": 10})
+    bulk = registry.get(True, None, {"max_connections": 10, "pool": "bulk"})
+    assert bulk is not transport
+    assert registry.get(True, None, {"max_connections": 10, "pool": "bulk"}) is bulk
+    with pytest.raises(RuntimeError) as ctx:
+        registry.get(True, None, {"max_connections": 20, "pool": "bulk"})
+    assert str(ctx.value) == "Transport pool bulk configured differently"
+
+
+def test_transport_registry_reload():
+    registry = SyncTransportRegistry()
+    bulk = registry.get(True, None, {"max_connections": 10, "pool": "bulk"})
+    new_bulk = registry.get(
+        True, None, {"max_connections": 20, "pool": "bulk"}, reload=True
+    )
+    assert new_bulk is not bulk
+    assert new_bulk.limits.max_connections == 20
+    # kept for the clients using it
+    assert bulk in registry
+    registry.discard(bulk)
+    assert bulk not in registry
+    assert new_bulk in registry
+
+
+def test_transport_registry_class():
+    registry = SyncTransportRegistry()
+    transport = registry.get(
+        False, None, {"class": "tests.unittests.fixtures.SyncDummyTransport"}
+    )
+    assert isinstance(transport, SyncDummyTransport)
+    assert transport.verify_certificate is False
+    assert registry.get(True, None, {}) is not transport
+
+
+def test_transport_registry_aclose(http_server: Any):
+    registry = SyncTransportRegistry()
+    transport = registry.get(True, None, {})
+    registry.get(True, None, {"class": "tests.unittests.fixtures.SyncDummyTransport"})
+    transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies/alive"),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+    registry.close()
+    assert isinstance(transport, SyncPooledHttpxTransport)
+    assert transport.clients.pop_all() == []
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "settings": {
+                    "transport": {
+                        "max_connections": 50,
+                        "max_keepalive_connections": 10,
+                        "keepalive_expiry": 30,
+                        "pool_timeout": 1,
+                    }
+                },
+                "expected_limits": (50, 10, 30),
+                "expected_pool_timeout": 1,
+            },
+            id="configured",
+        ),
+        pytest.param(
+            {
+                "settings": {"transport": {}},
+                "expected_limits": (100, 20, 5),
+                "expected_pool_timeout": 5,
+            },
+            id="default",
+        ),
+    ],
+)
+def test_build_client_transport(params: dict[str, Any]):
+    transport = build_client_transport(params["settings"])
+    assert isinstance(transport, SyncPooledHttpxTransport)
+    assert (
+        transport.limits.max_connections,
+        transport.limits.max_keepalive_connections,
+        transport.limits.keepalive_expiry,
+    ) == params["expected_limits"]
+    assert transport.pool_timeout == params["expected_pool_timeout"]
+    assert build_client_transport(params["settings"]) is transport
+
+
+def test_build_client_transport_default():
+    assert build_client_transport({}) is None
+
+
+def test_build_client_transport_json_codec():
+    transport = build_client_transport({"json_codec": "orjson"})
+    assert isinstance(transport, SyncPooledHttpxTransport)
+    assert transport.json_codec is not None
+    assert transport.json_codec.name == "orjson"
+    assert build_client_transport({"transport": {}}) is not transport
+
+
+def test_build_client_transport_pool():
+    api = build_client_transport({"transport": {"max_connections": 7}}, name="api")
+    export = build_client_transport({"transport": {"pool": "export"}}, name="api")
+    assert export is not api
+    assert build_client_transport({"transport": {"pool": "export"}}) is export
+    # the pool is labelled by its name, or by the client that built it
+    assert isinstance(api, SyncPooledHttpxTransport)
+    assert isinstance(export, SyncPooledHttpxTransport)
+    assert api.pool == "api"
+    assert export.pool == "export"
+
+
+def test_count_connections():
+    transport = SyncPooledHttpxTransport()
+    client = transport.clients.get()
+    assert transport.count_connections(client) == 0
+    # the private pool of httpx is not available
+    assert transport.count_connections(object()) is None  # type: ignore
+
+
+def test_client_factory_transport(prometheus_registry: Any):
+    client = {"sd": "router", "router_sd_config": {}, "transport": {}}
+    with override_settings(BLACKSMITH_CLIENT={"default": client}):
+        cli = client_factory("default")
+    assert isinstance(cli.transport, SyncPooledHttpxTransport)
+    # the clients with the same settings share the transport
+    assert cli.transport is build_client_transport(client)
+
+
+def test_pooled_transport(http_server: Any):
+    transport = SyncPooledHttpxTransport()
+    for _ in range(3):
+        timings = CallTimings()
+        token = current_timings.set(timings)
+        try:
+            resp = transport(
+                HTTPRequest("GET", f"{http_server.url}/dummies/alive"),
+                "dummy",
+                "/dummies/{name}",
+                HTTPTimeout(),
+            )
+        finally:
+            current_timings.reset(token)
+        assert resp.json == {"id": "1", "name": "alive"}
+        assert timings.transport is not None
+        assert timings.transport > 0
+    # the connection is kept between the requests
+    assert len(http_server.connections) == 1
+
+    with pytest.raises(HTTPError) as ctx:
+        transport(
+            HTTPRequest("GET", f"{http_server.url}/dummies/error"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    assert ctx.value.status_code == 500
+
+    transport.close()
+    assert transport.clients.pop_all() == []
+
+
+def test_stream_json_transport(http_server: Any):
+    transport = SyncPooledHttpxTransport(stream_json=True)
+    resp = transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies"),
+        "dummy",
+        "/dummies",
+        HTTPTimeout(),
+    )
+    assert isinstance(resp.json, JsonItems)
+    assert len(resp.json) == 3
+    assert resp.json[1] == {"id": "1", "name": "alive"}
+
+    resp = transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies/alive"),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+    assert resp.json == {"id": "1", "name": "alive"}
+
+    with pytest.raises(HTTPError) as ctx:
+        transport(
+            HTTPRequest("GET", f"{http_server.url}/dummies/error"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+    assert ctx.value.response.json == {"id": "1", "name": "error"}
+    transport.close()
+
+
+@pytest.mark.parametrize("stream_json", [True, False])
+def test_json_codec_transport(http_server: Any, stream_json: bool):
+    transport = SyncPooledHttpxTransport(stream_json=stream_json, json_codec="orjson")
+    resp = transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies"),
+        "dummy",
+        "/dummies",
+        HTTPTimeout(),
+    )
+    assert list(resp.json) == [
+        {"id": "0", "name": "alive"},
+        {"id": "1", "name": "alive"},
+        {"id": "2", "name": "alive"},
+    ]
+
+    resp = transport(
+        HTTPRequest("GET", f"{http_server.url}/dummies/alive"),
+        "dummy",
+        "/dummies/{name}",
+        HTTPTimeout(),
+    )
+    assert resp.json == {"id": "1", "name": "alive"}
+    transport.close()
+
+
+def test_http2_transport(http2_server: Any, prometheus_registry: Any):
+    transport = SyncPooledHttpxTransport(http2=True, http1=False, pool="h2")
+    for _ in range(3):
+        resp = transport(
+            HTTPRequest("GET", f"{http2_server.url}/dummies/alive"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+        assert resp.json == {"id": "1", "name": "alive"}
+    # the requests are streams of the same connection
+    assert len(http2_server.connections) == 1
+    assert http2_server.streams == [1, 3, 5]
+
+    labels = {"pool": "h2"}
+    assert (
+        prometheus_registry.get_sample_value(
+            "blacksmith_transport_requests_total", {**labels, "http_version": "HTTP/2"}
+        )
+        == 3
+    )
+    assert (
+        prometheus_registry.get_sample_value("blacksmith_transport_connections", labels)
+        == 1
+    )
+    assert (
+        prometheus_registry.get_sample_value("blacksmith_transport_streams", labels)
+        == 0
+    )
+    transport.close()
+
+
+def test_http2_transport_setting():
+    transport = build_client_transport({"transport": {"http2": True}})
+    assert isinstance(transport, SyncPooledHttpxTransport)
+    assert transport.http2 is True
+    assert transport.pool == "default"
+
+
+def test_http2_transport_requires_h2(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(RuntimeError) as ctx:
+        SyncPooledHttpxTransport(http2=True)
+    assert str(ctx.value) == "HTTP/2 requires the h2 package"
+
+
+def test_uds_transport(unix_http_server: Any):
+    transport = SyncPooledHttpxTransport(uds=unix_http_server.server_address)
+    for _ in range(3):
+        resp = transport(
+            HTTPRequest("GET", f"{unix_http_server.url}/dummies/alive"),
+            "dummy",
+            "/dummies/{name}",
+            HTTPTimeout(),
+        )
+        assert resp.json == {"id": "1", "name": "alive"}
+    assert len(unix_http_server.connections) == 1
+    transport.close()
+
+
+def test_uds_transport_proxies():
+    with pytest.raises(RuntimeError) as ctx:
+        SyncPooledHttpxTransport(
+            proxies={"http://": "http://proxy:8080"}, uds="/run/sidecar.sock"
+        )
+    assert str(ctx.value) == "A unix domain socket can't be used with proxies"
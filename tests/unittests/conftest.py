@@ -10,7 +10,13 @@ from blacksmith import (
 )
 from django.test import RequestFactory
 
-from .fixtures import AsyncDummyTransport, SyncDummyTransport
+from .fixtures import (
+    AsyncDummyTransport,
+    DummyHTTP2Handler,
+    DummyHTTPServer,
+    DummyUnixHTTPServer,
+    SyncDummyTransport,
+)
 
 
 @pytest.fixture
@@ -34,3 +40,28 @@ def dummy_async_client_factory() -> AsyncClientFactory[Any]:
 @pytest.fixture
 def dummy_sync_client_factory() -> SyncClientFactory[Any]:
     return SyncClientFactory(sd=SyncRouterDiscovery(), transport=SyncDummyTransport())
+
+
+@pytest.fixture
+def http_server():
+    server = DummyHTTPServer()
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def http2_server():
+    pytest.importorskip("h2")
+    server = DummyHTTPServer(DummyHTTP2Handler)
+    server.start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def unix_http_server(tmp_path: Any):
+    server = DummyUnixHTTPServer(str(tmp_path / "sidecar.sock"))
+    server.start()
+    yield server
+    server.stop()
@@ -1,4 +1,9 @@
+import json
+import socket
+import socketserver
+import threading
 from collections.abc import Mapping
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any
 
 from blacksmith import (
@@ -97,3 +102,111 @@ class SyncDummyTransport(SyncAbstractTransport):
     ) -> HTTPResponse:
         """This is the next function of the middleware."""
         return HTTPResponse(200, {"Foo": "Bar"}, {"id": "1", "name": "alive"})
+
+
+class DummyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "DummyHTTPServer"
+
+    def do_GET(self):
+        name = self.path.rsplit("/", 1)[-1]
+        status = 500 if name == "error" else 200
+        if name == "dummies":
+            items = [{"id": str(i), "name": "alive"} for i in range(3)]
+            body = json.dumps(items).encode()
+        else:
+            body = json.dumps({"id": "1", "name": name}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class DummyHTTP2Handler(socketserver.BaseRequestHandler):
+    server: "DummyHTTPServer"
+
+    def handle(self):
+        from h2.config import H2Configuration
+        from h2.connection import H2Connection
+        from h2.events import ConnectionTerminated, RequestReceived, StreamEnded
+
+        conn = H2Connection(H2Configuration(client_side=False))
+        conn.initiate_connection()
+        self.request.sendall(conn.data_to_send())
+        paths: dict[int, str] = {}
+        while True:
+            data = self.request.recv(65535)
+            if not data:
+                return
+            for event in conn.receive_data(data):
+                if isinstance(event, RequestReceived):
+                    paths[event.stream_id] = dict(event.headers)[b":path"].decode()
+                    self.server.streams.append(event.stream_id)
+                elif isinstance(event, StreamEnded):
+                    self.respond(conn, event.stream_id, paths.pop(event.stream_id))
+                elif isinstance(event, ConnectionTerminated):
+                    return
+            self.request.sendall(conn.data_to_send())
+
+    def respond(self, conn: Any, stream_id: int, path: str) -> None:
+        name = path.rsplit("/", 1)[-1]
+        status = 500 if name == "error" else 200
+        body = json.dumps({"id": "1", "name": name}).encode()
+        conn.send_headers(
+            stream_id,
+            [
+                (":status", str(status)),
+                ("content-type", "application/json"),
+                ("content-length", str(len(body))),
+            ],
+        )
+        conn.send_data(stream_id, body, end_stream=True)
+
+
+class DummyHTTPServer(ThreadingHTTPServer):
+    """An http server, that records the connections of its clients."""
+
+    daemon_threads = True
+
+    def __init__(self, handler: Any = DummyHandler, address: Any = ("127.0.0.1", 0)):
+        super().__init__(address, handler)
+        self.connections: list[Any] = []
+        self.streams: list[int] = []
+        self.thread = threading.Thread(
+            target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def verify_request(self, request: Any, client_address: Any) -> bool:
+        self.connections.append(client_address)
+        return True
+
+    def start(self) -> None:
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class DummyUnixHTTPServer(DummyHTTPServer):
+    """An http server listening on a unix domain socket, such as a sidecar."""
+
+    address_family = socket.AF_UNIX
+
+    def __init__(self, path: str):
+        super().__init__(address=path)
+
+    def server_bind(self) -> None:
+        socketserver.TCPServer.server_bind(self)
+
+    @property
+    def url(self) -> str:
+        return "http://sidecar"
@@ -0,0 +1,225 @@
+from typing import Any
+
+import pytest
+
+from dj_blacksmith.client.balancer import (
+    EWMALoadBalancer,
+    LoadBalancer,
+    PowerOfTwoChoicesLoadBalancer,
+    RoundRobinLoadBalancer,
+    ZoneAffinity,
+    build_load_balancer,
+)
+
+ENDPOINTS = ["http://a/v1", "http://b/v1", "http://c/v1", "http://d/v1"]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param({"settings": {}, "expected": None}, id="disabled"),
+        pytest.param(
+            {"settings": {"load_balancer": {}}, "expected": LoadBalancer},
+            id="random",
+        ),
+        pytest.param(
+            {
+                "settings": {"load_balancer": {"strategy": "round_robin"}},
+                "expected": RoundRobinLoadBalancer,
+            },
+            id="round_robin",
+        ),
+        pytest.param(
+            {
+                "settings": {"load_balancer": {"strategy": "p2c"}},
+                "expected": PowerOfTwoChoicesLoadBalancer,
+            },
+            id="p2c",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "load_balancer": {"strategy": "ewma", "consecutive_errors": 3}
+                },
+                "expected": EWMALoadBalancer,
+            },
+            id="ewma",
+        ),
+    ],
+)
+def test_build_load_balancer(params: dict[str, Any]):
+    load_balancer = build_load_balancer(params["settings"])
+    if params["expected"] is None:
+        assert load_balancer is None
+    else:
+        assert type(load_balancer) is params["expected"]
+
+
+def test_build_load_balancer_error():
+    with pytest.raises(RuntimeError) as ctx:
+        build_load_balancer({"load_balancer": {"strategy": "fastest"}})
+    assert str(ctx.value) == "Unkown load balancer strategy fastest"
+
+
+def test_round_robin():
+    load_balancer = RoundRobinLoadBalancer()
+    chosen = [load_balancer.choose(ENDPOINTS) for _ in range(8)]
+    assert sorted(chosen) == sorted(ENDPOINTS * 2)
+    assert chosen[:4] == chosen[4:]
+
+
+def test_power_of_two_choices():
+    load_balancer = PowerOfTwoChoicesLoadBalancer()
+    load_balancer.on_request(ENDPOINTS[0])
+    assert {load_balancer.choose(ENDPOINTS[:2]) for _ in range(10)} == {ENDPOINTS[1]}
+
+
+def test_ewma():
+    clock = FakeClock()
+    load_balancer = EWMALoadBalancer(decay=10, _clock=clock)
+    for latency, endpoint in ((0.5, ENDPOINTS[0]), (0.01, ENDPOINTS[1])):
+        load_balancer.on_request(endpoint)
+        load_balancer.on_response(endpoint, latency, False)
+    assert load_balancer.stats[ENDPOINTS[0]].latency == pytest.approx(0.5)
+    assert load_balancer.choose(ENDPOINTS[:2]) == ENDPOINTS[1]
+
+    clock.now += 10
+    load_balancer.on_request(ENDPOINTS[0])
+    load_balancer.on_response(ENDPOINTS[0], 0.0, False)
+    assert load_balancer.stats[ENDPOINTS[0]].latency == pytest.approx(0.5 / 2.718, 1e-3)
+
+
+def test_ewma_new_instance():
+    load_balancer = EWMALoadBalancer()
+    for latency, endpoint in zip((0.1, 0.2, 0.9), ENDPOINTS):
+        load_balancer.on_request(endpoint)
+        load_balancer.on_response(endpoint, latency, False)
+    # a new instance starts with the median latency, not 0
+    assert load_balancer.score(ENDPOINTS[3]) == pytest.approx(0.2)
+    assert load_balancer.choose(ENDPOINTS[::3]) == ENDPOINTS[0]
+
+    load_balancer.on_request(ENDPOINTS[3])
+    load_balancer.on_response(ENDPOINTS[3], 0.05, False)
+    assert load_balancer.stats[ENDPOINTS[3]].latency == pytest.approx(0.05)
+
+
+def test_prune():
+    load_balancer = LoadBalancer()
+    for endpoint in ENDPOINTS:
+        load_balancer.on_request(endpoint)
+    for endpoint in ENDPOINTS[1:]:
+        load_balancer.on_response(endpoint, 0.1, False)
+    load_balancer.prune(ENDPOINTS[2:])
+    # the instance with a request in flight is forgotten later
+    assert list(load_balancer.stats) == [ENDPOINTS[0], *ENDPOINTS[2:]]
+    load_balancer.on_response(ENDPOINTS[0], 0.1, False)
+    load_balancer.prune(ENDPOINTS[2:])
+    assert list(load_balancer.stats) == ENDPOINTS[2:]
+
+
+def test_outlier_ejection():
+    clock = FakeClock()
+    load_balancer = LoadBalancer(consecutive_errors=2, ejection_time=30, _clock=clock)
+    for _ in range(2):
+        load_balancer.on_request(ENDPOINTS[0])
+        load_balancer.on_response(ENDPOINTS[0], 0.1, True)
+    assert load_balancer.available(ENDPOINTS) == ENDPOINTS[1:]
+
+    clock.now += 30
+    assert load_balancer.available(ENDPOINTS) == ENDPOINTS
+
+    for _ in range(2):
+        load_balancer.on_request(ENDPOINTS[0])
+        load_balancer.on_response(ENDPOINTS[0], 0.1, True)
+    clock.now += 30
+    # ejected twice, so the ejection time is doubled
+    assert load_balancer.available(ENDPOINTS) == ENDPOINTS[1:]
+
+
+def test_outlier_ejection_reset():
+    load_balancer = LoadBalancer(consecutive_errors=2)
+    for failed in (True, False, True):
+        load_balancer.on_request(ENDPOINTS[0])
+        load_balancer.on_response(ENDPOINTS[0], 0.1, failed)
+    assert load_balancer.available(ENDPOINTS) == ENDPOINTS
+    assert load_balancer.stats[ENDPOINTS[0]].in_flight == 0
+
+
+def test_max_ejection_ratio():
+    load_balancer = LoadBalancer(consecutive_errors=1, max_ejection_ratio=0.5)
+    for endpoint in ENDPOINTS[:3]:
+        load_balancer.on_request(endpoint)
+        load_balancer.on_response(endpoint, 0.1, True)
+    assert load_balancer.available(ENDPOINTS) == ENDPOINTS
+
+
+ZONES = {
+    "http://a/v1": "eu-west-1a",
+    "http://b/v1": "eu-west-1a",
+    "http://c/v1": "eu-west-1b",
+    "http://d/v1": "eu-west-1b",
+}
+
+
+def test_zone_affinity():
+    affinity = ZoneAffinity(zone="eu-west-1a")
+    assert affinity.select(ENDPOINTS, ZONES, LoadBalancer()) == ENDPOINTS[:2]
+
+    affinity = ZoneAffinity(zone="us-east-1a")
+    assert affinity.select(ENDPOINTS, ZONES, LoadBalancer()) == ENDPOINTS
+
+    affinity = ZoneAffinity()
+    assert affinity.select(ENDPOINTS, ZONES, LoadBalancer()) == ENDPOINTS
+
+
+def test_zone_affinity_env(monkeypatch: Any):
+    monkeypatch.setenv("ZONE", "eu-west-1b")
+    affinity = ZoneAffinity(zone_env="ZONE")
+    assert affinity.zone == "eu-west-1b"
+    assert affinity.select(ENDPOINTS, ZONES, LoadBalancer()) == ENDPOINTS[2:]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"min_healthy_ratio": 0.5, "ejected": 1, "expected": ENDPOINTS[1:2]},
+            id="enough healthy instances",
+        ),
+        pytest.param(
+            {"min_healthy_ratio": 1, "ejected": 1, "expected": ENDPOINTS},
+            id="spill over",
+        ),
+        pytest.param(
+            {"min_healthy_ratio": 0, "ejected": 2, "expected": ENDPOINTS},
+            id="no healthy instances",
+        ),
+    ],
+)
+def test_zone_affinity_unhealthy(params: dict[str, Any]):
+    load_balancer = LoadBalancer(consecutive_errors=1)
+    for endpoint in ENDPOINTS[: params["ejected"]]:
+        load_balancer.on_request(endpoint)
+        load_balancer.on_response(endpoint, 0.1, True)
+    affinity = ZoneAffinity(
+        zone="eu-west-1a", min_healthy_ratio=params["min_healthy_ratio"]
+    )
+    assert affinity.select(ENDPOINTS, ZONES, load_balancer) == params["expected"]
+
+
+def test_zone_affinity_overloaded():
+    load_balancer = LoadBalancer()
+    affinity = ZoneAffinity(zone="eu-west-1a", max_in_flight=2)
+    for _ in range(3):
+        load_balancer.on_request(ENDPOINTS[0])
+    assert affinity.select(ENDPOINTS, ZONES, load_balancer) == ENDPOINTS[:2]
+    load_balancer.on_request(ENDPOINTS[1])
+    assert affinity.select(ENDPOINTS, ZONES, load_balancer) == ENDPOINTS
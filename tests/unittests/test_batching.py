@@ -0,0 +1,124 @@
+import asyncio
+from typing import Any
+
+import pytest
+from blacksmith import AsyncClientFactory, AsyncRouterDiscovery, HTTPTimeout
+
+from dj_blacksmith.client._async.client import AsyncClientProxy
+from dj_blacksmith.client._concurrency import AsyncBatch, SyncBatch
+from dj_blacksmith.client.batching import BatchConfig, build_batch_configs
+from tests.unittests._async.test_batch import AsyncBulkTransport
+from tests.unittests.testapp.resources.dummy import Get
+
+
+def test_get_key():
+    config = BatchConfig("name", "names")
+    assert config.get_key({"name": "a"}) == "a"
+    assert config.get_key({"name": "a", "other": "b"}) is None
+    assert config.get_key(Get(name="a")) == "a"
+    assert config.get_key(HTTPTimeout()) is None
+
+
+def test_get_bulk_params():
+    assert BatchConfig("id", "ids").get_bulk_params([1, 2]) == {"ids": [1, 2]}
+    assert BatchConfig("id", "ids", separator=",").get_bulk_params([1, 2]) == {
+        "ids": "1,2"
+    }
+
+
+def test_get_item_key():
+    assert BatchConfig("id", "ids").get_item_key({"id": 1}) == "1"
+    assert BatchConfig("id", "ids", key="uid").get_item_key({"uid": "a"}) == "a"
+
+
+def test_chunks():
+    config = BatchConfig("id", "ids", max_batch_size=2)
+    assert list(config.chunks([1, 2, 3])) == [[1, 2], [3]]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {
+                "settings": {"api": {"param": "id", "bulk_param": "ids"}},
+                "expected": "Invalid resource api, expected <client>.<resource>",
+            },
+            id="resource",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "api.users": {
+                        "param": "id",
+                        "bulk_param": "ids",
+                        "max_batch_size": 0,
+                    }
+                },
+                "expected": "Invalid max_batch_size 0",
+            },
+            id="max batch size",
+        ),
+    ],
+)
+def test_build_batch_configs_errors(params: dict[str, Any]):
+    with pytest.raises(ValueError) as ctx:
+        build_batch_configs(params["settings"])
+    assert str(ctx.value) == params["expected"]
+
+
+def test_build_batch_configs():
+    assert build_batch_configs({"api.users": {"param": "id", "bulk_param": "ids"}}) == {
+        ("api", "users"): BatchConfig("id", "ids")
+    }
+
+
+async def test_async_batch():
+    calls: list[list[str]] = []
+
+    async def load(keys: list[str]) -> dict[str, str]:
+        calls.append(keys)
+        return {key: key.upper() for key in keys}
+
+    batch: AsyncBatch[str, str] = AsyncBatch(load)
+    assert batch.add("a")
+    assert batch.add("b")
+    assert await batch.result("a") == "A"
+    assert not batch.add("c")
+    assert await batch.result("b") == "B"
+    assert calls == [["a", "b"]]
+
+
+def test_sync_batch():
+    calls: list[list[str]] = []
+
+    def load(keys: list[str]) -> dict[str, str]:
+        calls.append(keys)
+        return {key: key.upper() for key in keys}
+
+    batch: SyncBatch[str, str] = SyncBatch(load)
+    assert batch.add("a")
+    assert batch.add("b")
+    assert batch.result("a") == "A"
+    assert not batch.add("c")
+    assert batch.result("b") == "B"
+    assert calls == [["a", "b"]]
+
+
+async def test_batched_get_gather():
+    transport = AsyncBulkTransport()
+    factory: AsyncClientFactory[Any] = AsyncClientFactory(
+        sd=AsyncRouterDiscovery(), transport=transport
+    )
+    prox = AsyncClientProxy(
+        factory, [], batch_configs={("dummy", "dummies"): BatchConfig("name", "names")}
+    )
+
+    async def get_name(name: str) -> str:
+        cli = await prox("dummy")
+        resp = await cli.dummies.get({"name": name})
+        return resp.unwrap().id
+
+    ids = await asyncio.gather(*(get_name(name) for name in ["a", "b", "c", "a"]))
+    assert ids == ["id-a", "id-b", "id-c", "id-a"]
+    assert transport.calls == [["a", "b", "c"]]
@@ -0,0 +1,347 @@
+from typing import Any
+
+import pytest
+from blacksmith import CollectionParser, HTTPTimeout
+from django.core import checks
+from django.test import override_settings
+
+from dj_blacksmith.client._async.middleware import AsyncCircuitBreakerMiddlewareBuilder
+from dj_blacksmith.client.config import (
+    check_client_configs,
+    compile_client,
+    get_client_config,
+    override_client_settings,
+)
+from tests.unittests.fixtures import AsyncDummyTransport, DummyMiddlewareFactory1
+
+
+def test_compile_client():
+    config = compile_client(
+        "default",
+        {
+            "sd": "router",
+            "router_sd_config": {},
+            "timeout": {"read": 10, "connect": 2},
+            "proxies": {"http://": "http://proxy:8080"},
+            "verify_certificate": False,
+            "middlewares": ["dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder"],
+            "middleware_factories": [
+                "tests.unittests.fixtures.DummyMiddlewareFactory1"
+            ],
+        },
+    )
+    assert config.name == "default"
+    assert config.timeout == HTTPTimeout(10, 2)
+    assert config.proxies == {"http://": "http://proxy:8080"}
+    assert config.verify_certificate is False
+    assert config.collection_parser is CollectionParser
+    assert config.middlewares == (AsyncCircuitBreakerMiddlewareBuilder,)
+    assert config.middleware_factories == (DummyMiddlewareFactory1,)
+    assert config.transport is None
+    with pytest.raises(TypeError):
+        config.settings["sd"] = "static"  # type: ignore
+
+
+def test_compile_client_transport():
+    with override_settings(
+        BLACKSMITH_TRANSPORT="tests.unittests.fixtures.AsyncDummyTransport"
+    ):
+        config = compile_client("default", {"sd": "router", "router_sd_config": {}})
+    assert config.transport is AsyncDummyTransport
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"settings": {}, "expected": "Client api: Unkown service discovery "},
+            id="no sd",
+        ),
+        pytest.param(
+            {
+                "settings": {"sd": "router"},
+                "expected": "Client api: Missing router_sd_config",
+            },
+            id="sd config",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "timeout": {"write": 1},
+                },
+                "expected": (
+                    "Client api: Invalid timeout: HTTPTimeout.__init__() "
+                    "got an unexpected keyword argument 'write'"
+                ),
+            },
+            id="timeout",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "load_balancer": {},
+                },
+                "expected": (
+                    "Client api: Load balancing requires the consul_watch "
+                    "service discovery"
+                ),
+            },
+            id="load balancer sd",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "consul_watch",
+                    "consul_sd_config": {},
+                    "load_balancer": {"strategy": "nope"},
+                },
+                "expected": "Client api: Unkown load balancer strategy nope",
+            },
+            id="load balancer strategy",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "consul_watch",
+                    "consul_sd_config": {},
+                    "sd_cache": {},
+                },
+                "expected": (
+                    "Client api: The sd_cache can't cache a load balanced "
+                    "service discovery"
+                ),
+            },
+            id="sd cache consul watch",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "consul",
+                    "consul_sd_config": {"zone_affinity": {"zone": "eu-west-1a"}},
+                },
+                "expected": (
+                    "Client api: Zone affinity requires the consul_watch "
+                    "service discovery"
+                ),
+            },
+            id="zone affinity consul",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "consul",
+                    "consul_sd_config": {"adrr": "http://consul:8500/v1"},
+                },
+                "expected": (
+                    "Client api: Invalid consul_sd_config: "
+                    "got an unexpected keyword argument 'adrr'"
+                ),
+            },
+            id="consul sd config",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "nomad",
+                    "nomad_sd_config": {
+                        "zone_affinity": {},
+                        "zone_service_env": "NOMAD_{service}_{zone}",
+                    },
+                },
+                "expected": (
+                    "Client api: Invalid nomad_sd_config: "
+                    "got an unexpected keyword argument 'zone_service_env'"
+                ),
+            },
+            id="nomad sd config",
+        ),
+        pytest.param(
+            {
+                "settings": {"sd": "router", "router_sd_config": []},
+                "expected": "Client api: Invalid router_sd_config: expected a mapping",
+            },
+            id="router sd config",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "nomad",
+                    "nomad_sd_config": {"zone_affinity": {"zone": "eu-west-1a"}},
+                    "sd_cache": {},
+                },
+                "expected": (
+                    "Client api: The sd_cache can't cache a load balanced "
+                    "service discovery"
+                ),
+            },
+            id="sd cache zone affinity",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "json_codec": "simplejson",
+                },
+                "expected": "Client api: Unkown json codec simplejson",
+            },
+            id="json codec",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "response_validation": {"mode": "lazy"},
+                },
+                "expected": (
+                    "Client api: Invalid response validation: "
+                    "Unkown validation mode lazy"
+                ),
+            },
+            id="response validation",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "batch": {"api.users": {"param": "id"}},
+                },
+                "expected": (
+                    "Client api: Invalid batch: BatchConfig.__init__() missing 1 "
+                    "required positional argument: 'bulk_param'"
+                ),
+            },
+            id="batch",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "collection_parser": "nope.Parser",
+                },
+                "expected": (
+                    "Client api: can't import nope.Parser: No module named 'nope'"
+                ),
+            },
+            id="collection parser",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "transport": {"class": "nope.Transport"},
+                },
+                "expected": (
+                    "Client api: can't import nope.Transport: No module named 'nope'"
+                ),
+            },
+            id="transport",
+        ),
+        pytest.param(
+            {
+                "settings": {
+                    "sd": "router",
+                    "router_sd_config": {},
+                    "http_cache": {"redis": "redis://", "policy": "nope.Policy"},
+                },
+                "expected": (
+                    "Client api: can't import nope.Policy: No module named 'nope'"
+                ),
+            },
+            id="http cache",
+        ),
+    ],
+)
+def test_compile_client_errors(params: dict[str, Any]):
+    with pytest.raises(RuntimeError) as ctx:
+        compile_client("api", params["settings"])
+    assert str(ctx.value) == params["expected"]
+
+
+def test_get_client_config():
+    config = get_client_config("default")
+    assert get_client_config("default") is config
+
+    settings = {"default": {"sd": "static", "static_sd_config": {}}}
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        assert get_client_config("default").settings["sd"] == "static"
+    assert get_client_config("default").settings["sd"] == "router"
+
+    with pytest.raises(RuntimeError) as ctx:
+        get_client_config("nope")
+    assert str(ctx.value) == "Client nope does not exists"
+
+
+def test_override_client_settings():
+    settings = {
+        "default": {"sd": "router", "router_sd_config": {}, "timeout": {"read": 10}},
+        "api": {"sd": "router", "router_sd_config": {}},
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        names = override_client_settings(
+            {"default": {"timeout": {"read": 5}}, "api": {"sd": "router"}}
+        )
+        # the api settings did not change
+        assert names == ["default"]
+        config = get_client_config("default")
+        assert config.timeout == HTTPTimeout(5)
+        assert config.settings["sd"] == "router"
+
+        with pytest.raises(RuntimeError) as ctx:
+            override_client_settings({"default": {"timeout": {"read": 1}}, "nope": {}})
+        assert str(ctx.value) == "Client nope does not exists"
+
+        with pytest.raises(RuntimeError) as ctx:
+            override_client_settings(
+                {"default": {"timeout": {"read": 1}}, "api": {"sd": "nope"}}
+            )
+        assert str(ctx.value) == "Client api: Unkown service discovery nope"
+        # the settings are all compiled before any of them is replaced
+        assert get_client_config("default").timeout == HTTPTimeout(5)
+
+    # forgotten when the settings change
+    assert get_client_config("default").settings == {
+        "sd": "router",
+        "router_sd_config": {},
+        "metrics": {"buckets": [0.5, 1, 3], "hit_cache_buckets": [0.1, 0.3, 1]},
+    }
+
+
+def test_check_client_configs():
+    assert check_client_configs() == []
+
+    settings = {
+        "default": {"sd": "router", "router_sd_config": {}},
+        "api": {"sd": "nope"},
+        "users": {"sd": "router", "router_sd_config": {"service_url": "http://r"}},
+        "books": {"sd": "router", "router_sd_config": {}, "metrics": {"buckets": [1]}},
+    }
+    with override_settings(BLACKSMITH_CLIENT=settings):
+        errors = checks.run_checks(tags=["dj_blacksmith"])
+    assert errors == [
+        checks.Error(
+            "Client api: Unkown service discovery nope",
+            obj="BLACKSMITH_CLIENT['api']",
+            id="dj_blacksmith.E001",
+        ),
+        checks.Error(
+            "Client users: Invalid router_sd_config: "
+            "got an unexpected keyword argument 'service_url'",
+            obj="BLACKSMITH_CLIENT['users']",
+            id="dj_blacksmith.E001",
+        ),
+        checks.Error(
+            "Client books: The metrics settings differ from the client default, "
+            "they share the prometheus registry",
+            obj="BLACKSMITH_CLIENT['books']",
+            id="dj_blacksmith.E001",
+        ),
+    ]
@@ -5,6 +5,7 @@ from blacksmith import AsyncCircuitBreakerMiddleware
 from blacksmith.domain.registry import ApiRoutes, registry
 
 from dj_blacksmith.client._async.client import AsyncClientProxy, AsyncDjBlacksmithClient
+from dj_blacksmith.client._async.middleware import AsyncInFlightMiddleware
 
 
 def test_import():
@@ -12,7 +13,7 @@ def test_import():
 
     clients: dict[str, Any] = dict(registry.clients)  # type: ignore
     assert list(clients.keys()) == ["dummy"]
-    assert list(clients["dummy"].keys()) == ["dummies"]
+    assert list(clients["dummy"].keys()) == ["dummies", "paged_dummies"]
     dummies: ApiRoutes = clients["dummy"]["dummies"]
     assert dummies.resource is not None
     assert dummies.resource.path == "/dummies"
@@ -23,11 +24,11 @@ def test_import():
     [
         {
             "client": "default",
-            "middlewares": [],
+            "middlewares": [AsyncInFlightMiddleware],
         },
         {
             "client": "alt_client",
-            "middlewares": [AsyncCircuitBreakerMiddleware],
+            "middlewares": [AsyncInFlightMiddleware, AsyncCircuitBreakerMiddleware],
         },
     ],
 )
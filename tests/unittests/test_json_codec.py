@@ -0,0 +1,73 @@
+import datetime
+import decimal
+import json
+from typing import Any
+
+import httpx
+import pytest
+from blacksmith.service.http_body_serializer import _SERIALIZERS, serialize_response
+from django.test import override_settings
+from pydantic_core import Url
+
+from dj_blacksmith.client import json_codec
+from dj_blacksmith.client.json_codec import JsonCodecSerializer, get_codec, use_codec
+
+BODY = {
+    "id": 1,
+    "url": Url("http://example.net/"),
+    "price": decimal.Decimal("1.5"),
+    "at": datetime.datetime(2024, 1, 2, 3, 4, 5),
+    1: "int key",
+}
+
+
+@pytest.mark.parametrize("name", ["json", "orjson"])
+def test_get_codec(name: str):
+    codec = get_codec(name)
+    assert codec.name == name
+    assert json.loads(codec.dumps(BODY)) == {
+        "id": 1,
+        "url": "http://example.net/",
+        "price": 1.5,
+        "at": "2024-01-02T03:04:05",
+        "1": "int key",
+    }
+    assert codec.loads(b'{"a": [1, 2.5, null]}') == {"a": [1, 2.5, None]}
+    assert codec.loads('{"a": "\\u00e9"}') == {"a": "é"}
+
+
+def test_get_codec_errors():
+    with pytest.raises(RuntimeError) as ctx:
+        get_codec("simplejson")
+    assert str(ctx.value) == "Unkown json codec simplejson"
+    with pytest.raises(TypeError):
+        get_codec("orjson").dumps({"obj": object()})
+
+
+def test_get_codec_fallback(monkeypatch: pytest.MonkeyPatch, caplog: Any):
+    monkeypatch.setattr(json_codec, "orjson", None)
+    assert get_codec("orjson").name == "json"
+    assert caplog.messages == ["orjson is not installed, the json module is used"]
+
+
+def test_use_codec():
+    count = len(_SERIALIZERS)
+    use_codec("orjson")
+    try:
+        serializer = _SERIALIZERS[0]
+        assert isinstance(serializer, JsonCodecSerializer)
+        assert serializer.codec.name == "orjson"
+        assert serializer.serialize({"a": 1}) == b'{"a":1}'
+        resp = serialize_response(httpx.Response(200, json={"a": 1}))  # type: ignore
+        assert resp.json == {"a": 1}
+        use_codec("orjson")
+        assert len(_SERIALIZERS) == count + 1
+    finally:
+        use_codec(None)
+    assert len(_SERIALIZERS) == count
+
+
+def test_reset_codec():
+    with override_settings(BLACKSMITH_JSON_CODEC="orjson"):
+        assert isinstance(_SERIALIZERS[0], JsonCodecSerializer)
+    assert not isinstance(_SERIALIZERS[0], JsonCodecSerializer)
@@ -0,0 +1,92 @@
+import copy
+import json
+from typing import Any
+
+import pytest
+
+from dj_blacksmith.client.json_stream import JsonItems, JsonStreamDecoder, is_json
+
+BODY = json.dumps(
+    [
+        {"id": "1", "name": 'a "quoted", [bracketed] {braced} name \\'},
+        {"id": "2", "tags": [1, 2, {"nested": [3]}]},
+        3,
+        "four",
+        None,
+    ],
+    indent=1,
+).encode()
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(BODY)])
+def test_decode_array(size: int):
+    decoder = JsonStreamDecoder()
+    for pos in range(0, len(BODY), size):
+        decoder.feed(BODY[pos : pos + size])
+    items = decoder.close()
+    assert isinstance(items, JsonItems)
+    assert len(items) == 5
+    assert items == json.loads(BODY)
+    # the text of the items is dropped while they are split
+    assert decoder.text == ""
+
+
+NUMBERS = b'[1.5, 2.25, 3e10, -4E-2, "5.5", {"a": 1.75}, 6]'
+
+
+@pytest.mark.parametrize("offset", range(1, len(NUMBERS)))
+def test_decode_array_split(offset: int):
+    # the chunks may split a number at its fraction or its exponent
+    decoder = JsonStreamDecoder()
+    decoder.feed(NUMBERS[:offset])
+    decoder.feed(NUMBERS[offset:])
+    assert decoder.close() == json.loads(NUMBERS)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"body": b' {"a": [1, 2]} ', "expected": {"a": [1, 2]}}, id="dict"
+        ),
+        pytest.param({"body": b"[]", "expected": []}, id="empty array"),
+        pytest.param({"body": b" [ ] ", "expected": []}, id="blank array"),
+        pytest.param({"body": b"", "expected": ""}, id="empty"),
+        pytest.param({"body": b"null", "expected": None}, id="null"),
+    ],
+)
+def test_decode(params: dict[str, Any]):
+    decoder = JsonStreamDecoder()
+    decoder.feed(params["body"])
+    assert decoder.close() == params["expected"]
+
+
+@pytest.mark.parametrize("body", [b"[1, 2", b"[1] 2", b"[1, ]", b"[1 2]", b"{"])
+def test_decode_invalid(body: bytes):
+    decoder = JsonStreamDecoder()
+    decoder.feed(body)
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+def test_json_items():
+    items = JsonItems(['{"a": 1}', "2", "[3]"])
+    assert items[0] == {"a": 1}
+    assert items[1:] == [2, [3]]
+    assert list(items) == [{"a": 1}, 2, [3]]
+    assert copy.deepcopy(items) == [{"a": 1}, 2, [3]]
+    assert type(copy.deepcopy(items)) is list
+    assert repr(items) == "<JsonItems (3 items)>"
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        ("application/json", True),
+        ("application/json; charset=utf-8", True),
+        ("application/problem+json", True),
+        ("text/html", False),
+    ],
+)
+def test_is_json(params: tuple[str, bool]):
+    assert is_json(params[0]) is params[1]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from typing import Any
+
+from dj_blacksmith.client._async.client import AsyncDjBlacksmithClient
+from dj_blacksmith.client._sync.client import SyncDjBlacksmithClient
+from dj_blacksmith.lifecycle import LifespanMiddleware, worker_exit
+
+
+async def test_lifespan(monkeypatch: Any):
+    calls: list[Any] = []
+
+    async def app(scope: Any, receive: Any, send: Any) -> None:
+        calls.append(scope["type"])
+
+    async def aclose(timeout: float) -> None:
+        calls.append(("aclose", timeout))
+
+    monkeypatch.setattr(AsyncDjBlacksmithClient, "aclose", aclose)
+    messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+    sent: list[Any] = []
+
+    async def receive() -> Any:
+        return messages.pop(0)
+
+    async def send(message: Any) -> None:
+        sent.append(message["type"])
+
+    middleware = LifespanMiddleware(app, timeout=5)
+    await middleware({"type": "http"}, receive, send)
+    await middleware({"type": "lifespan"}, receive, send)
+    assert calls == ["http", ("aclose", 5)]
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]
+
+
+async def test_lifespan_shutdown_failed(monkeypatch: Any):
+    async def aclose(timeout: float) -> None:
+        raise RuntimeError("Boom")
+
+    monkeypatch.setattr(AsyncDjBlacksmithClient, "aclose", aclose)
+    sent: list[Any] = []
+
+    async def receive() -> Any:
+        return {"type": "lifespan.shutdown"}
+
+    async def send(message: Any) -> None:
+        sent.append(message)
+
+    middleware = LifespanMiddleware(None, timeout=5)  # type: ignore
+    await middleware({"type": "lifespan"}, receive, send)
+    assert sent == [{"type": "lifespan.shutdown.failed", "message": "Boom"}]
+
+
+def test_worker_exit(monkeypatch: Any):
+    calls: list[float] = []
+    monkeypatch.setattr(SyncDjBlacksmithClient, "close", calls.append)
+    worker_exit(None, SimpleNamespace(cfg=SimpleNamespace(graceful_timeout=10)))
+    # drained before the arbiter kills the worker
+    assert calls == [5]
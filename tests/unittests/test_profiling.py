@@ -0,0 +1,73 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from django.core.management import call_command
+
+from dj_blacksmith.client.profiling import Profile
+
+
+def test_profile_measure():
+    profile = Profile()
+    with profile.measure("import", "untraced"):
+        pass
+    tracemalloc.start()
+    try:
+        with profile.measure("import", "traced"):
+            data = [bytearray(1024) for _ in range(10)]
+    finally:
+        tracemalloc.stop()
+    assert [(m.kind, m.name) for m in profile.measures] == [
+        ("import", "untraced"),
+        ("import", "traced"),
+    ]
+    assert profile.measures[0].memory == 0
+    assert profile.measures[1].memory >= 10 * 1024
+    assert profile.measures[1].peak >= profile.measures[1].memory
+    assert len(data) == 10
+
+
+def test_profile_measure_nested():
+    profile = Profile()
+    tracemalloc.start()
+    try:
+        with profile.measure("config", "default"):
+            with profile.measure("import_string", "nested"):
+                data = bytearray(100 * 1024)
+                del data
+    finally:
+        tracemalloc.stop()
+    outer, inner = profile.measures
+    assert (outer.depth, inner.depth) == (0, 1)
+    assert inner.peak >= 100 * 1024
+    # the peak of the nested step is the peak of its parent
+    assert outer.peak >= inner.peak
+    assert outer.duration >= inner.duration
+
+
+def test_profile_startup_command(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    output = tmp_path / "profile.json"
+    call_command("blacksmith_profile_startup", "--output", str(output))
+    measures = json.loads(output.read_text())
+    steps = [(m["kind"], m["name"]) for m in measures]
+    assert ("setup", "django") in steps
+    assert ("import", "testapp.resources.dummy") in steps
+    assert (
+        "import_string",
+        "dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder",
+    ) in steps
+    for name in ("default", "alt_client"):
+        for kind in ("config", "sd", "transport", "middlewares", "initialize"):
+            assert (kind, name) in steps
+
+    table = capsys.readouterr().out.splitlines()
+    assert table[0].split()[:3] == ["step", "name", "time"]
+    assert table[-1].startswith("total")
+    assert len(table) == len(measures) + 2
+
+
+def test_profile_startup_command_json(capsys: pytest.CaptureFixture[str]):
+    call_command("blacksmith_profile_startup", "--sync", "--json")
+    measures = json.loads(capsys.readouterr().out)
+    assert ("initialize", "alt_client") in [(m["kind"], m["name"]) for m in measures]
@@ -0,0 +1,113 @@
+import importlib
+import json
+import sys
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+import pytest
+from blacksmith.domain.registry import registry
+from django.core.management import call_command
+
+from dj_blacksmith.client import resources
+from dj_blacksmith.client._async.client import AsyncClientProxy
+from dj_blacksmith.client.resources import ResourceLoader, read_manifest, scan
+
+
+@pytest.fixture
+def lazy_resources() -> Iterator[None]:
+    yield
+    # forget the lazy resources, to import them again
+    registry.clients.pop("books", None)
+    registry.client_service.pop("books", None)
+    resources.manifest.pop("books", None)
+    for modname in list(sys.modules):
+        if modname.startswith("testapp.lazy_resources"):
+            del sys.modules[modname]
+
+
+def test_scan():
+    # recorded while the app was ready
+    assert resources.manifest["dummy"] == ["testapp.resources.dummy"]
+    with pytest.raises(ValueError) as ctx:
+        scan(".resources")
+    assert str(ctx.value) == ".resources: Relative package unsupported"
+
+
+def test_scan_lazy_resources(lazy_resources: None):
+    scan("testapp.lazy_resources")
+    # the resources of the client are registered by both modules
+    assert resources.manifest["books"] == [
+        "testapp.lazy_resources.authors",
+        "testapp.lazy_resources.books",
+    ]
+    assert registry.client_service["books"] == ("library", "v1")
+    assert set(registry.clients["books"]) == {"authors", "books"}
+
+
+def test_loader_manifest(lazy_resources: None):
+    loader = ResourceLoader(
+        ["testapp.lazy_resources"], {"books": ["testapp.lazy_resources.books"]}
+    )
+    assert "books" not in registry.client_service
+    loader.load("books")
+    assert registry.client_service["books"] == ("library", "v1")
+    # the package is not scanned
+    assert loader.scanned is False
+
+
+def test_loader_manifest_many_modules(lazy_resources: None):
+    loader = ResourceLoader(
+        [],
+        {
+            "books": [
+                "testapp.lazy_resources.authors",
+                "testapp.lazy_resources.books",
+            ]
+        },
+    )
+    # the client is registered by a module, before its first use
+    importlib.import_module("testapp.lazy_resources.authors")
+    loader.load("books")
+    assert set(registry.clients["books"]) == {"authors", "books"}
+
+
+def test_loader_scan(lazy_resources: None):
+    loader = ResourceLoader(["testapp.lazy_resources"])
+    loader.load("dummy")
+    assert loader.scanned is False
+    loader.load("books")
+    assert registry.client_service["books"] == ("library", "v1")
+    assert loader.scanned is True
+
+
+async def test_client_proxy_load(
+    lazy_resources: None, dummy_async_client_factory: Any, monkeypatch: Any
+):
+    monkeypatch.setattr(
+        resources,
+        "loader",
+        ResourceLoader([], {"books": ["testapp.lazy_resources.books"]}),
+    )
+    cli = await AsyncClientProxy(dummy_async_client_factory, [])("books")
+    assert cli.name == "books"
+
+
+def test_read_manifest(tmp_path: Path):
+    path = tmp_path / "manifest.json"
+    path.write_text(json.dumps({"books": ["testapp.lazy_resources.books"]}))
+    assert read_manifest(str(path)) == {"books": ["testapp.lazy_resources.books"]}
+    with pytest.raises(RuntimeError) as ctx:
+        read_manifest(str(tmp_path / "nope.json"))
+    assert str(ctx.value).startswith(
+        f"Unable to read the blacksmith manifest {tmp_path}"
+    )
+
+
+def test_manifest_command(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    path = tmp_path / "manifest.json"
+    call_command("blacksmith_manifest", output=str(path))
+    assert json.loads(path.read_text()) == {"dummy": ["testapp.resources.dummy"]}
+
+    call_command("blacksmith_manifest")
+    assert json.loads(capsys.readouterr().out) == {"dummy": ["testapp.resources.dummy"]}
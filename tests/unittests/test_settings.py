@@ -2,7 +2,12 @@ from typing import Any
 
 import pytest
 
-from dj_blacksmith._settings import get_clients, get_imports, get_setting
+from dj_blacksmith._settings import (
+    get_clients,
+    get_imports,
+    get_setting,
+    get_warm_up,
+)
 
 
 @pytest.mark.parametrize(
@@ -24,3 +29,7 @@ def test_get_imports():
 
 def test_get_client():
     assert list(get_clients().keys()) == ["default", "alt_client"]
+
+
+def test_get_warm_up():
+    assert get_warm_up() is False
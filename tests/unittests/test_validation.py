@@ -0,0 +1,164 @@
+from typing import Any, Optional
+
+import pytest
+from blacksmith import Response
+from blacksmith.domain.registry import ApiRoutes
+from pydantic import Field
+
+from dj_blacksmith.client import validation
+from dj_blacksmith.client.validation import (
+    ResponseModel,
+    ResponseValidation,
+    ValidatedResources,
+)
+
+
+class Address(Response):
+    city: str
+
+
+class User(Response):
+    user_id: str = Field(alias="userId")
+    age: int
+    city: Optional[str] = None
+
+
+class UserAddresses(Response):
+    user_id: str
+    addresses: list[Optional[Address]]
+
+
+def build_routes(schema: type[Response] = User) -> ApiRoutes:
+    return ApiRoutes(
+        "/users/{name}",
+        {"GET": (Any, schema), "DELETE": (Any, None)},
+        "/users",
+        {"GET": (Any, schema)},
+        None,
+    )
+
+
+def test_response_model_construct():
+    model = ResponseModel(User, "construct", 0.01, "api", "users")
+    user = model(userId="1", age="not validated", city="Paris")
+    assert isinstance(user, User)
+    assert user.user_id == "1"
+    assert user.age == "not validated"
+    assert user.city == "Paris"
+
+
+@pytest.mark.parametrize("mode", ["sampled", "construct"])
+def test_response_model_nested(mode: str):
+    with pytest.raises(ValueError) as ctx:
+        ResponseModel(UserAddresses, mode, 0.01, "api", "users")
+    assert str(ctx.value) == (
+        "The response model UserAddresses of api.users has nested models, "
+        f"it can't be built in {mode} mode"
+    )
+
+
+def test_response_model_raw():
+    model = ResponseModel(User, "raw", 0.01, "api", "users")
+    assert model(userId="1", age=42) == {"userId": "1", "age": 42}
+
+
+def test_response_model_sampled(monkeypatch: pytest.MonkeyPatch, caplog: Any):
+    monkeypatch.setattr(validation.random, "random", lambda: 0.5)
+    for sample_rate in (0.6, 0.4):
+        model = ResponseModel(User, "sampled", sample_rate, "api", "users")
+        user = model(userId="1", age="42")
+        # built without validation, validated or not
+        assert user.age == "42"
+    assert caplog.messages == []
+
+
+def test_response_model_sampled_error(
+    monkeypatch: pytest.MonkeyPatch, caplog: Any, prometheus_registry: Any
+):
+    monkeypatch.setattr(validation.random, "random", lambda: 0.0)
+    model = ResponseModel(User, "sampled", 0.01, "api", "users")
+    user = model(userId="1", age="not an int")
+    assert user.age == "not an int"
+    assert caplog.messages[0].startswith("Invalid response of api.users: ")
+    assert (
+        prometheus_registry.get_sample_value(
+            "blacksmith_response_validation_errors_total",
+            {"client_name": "api", "resource": "users"},
+        )
+        == 1.0
+    )
+
+
+def test_get_mode():
+    validation = ResponseValidation(
+        "sampled", resources={"api": "construct", "api.users": "raw"}
+    )
+    assert validation.get_mode("api", "users") == "raw"
+    assert validation.get_mode("api", "groups") == "construct"
+    assert validation.get_mode("notif", "users") == "sampled"
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        pytest.param(
+            {"kwargs": {"mode": "lazy"}, "expected": "Unkown validation mode lazy"},
+            id="mode",
+        ),
+        pytest.param(
+            {
+                "kwargs": {"resources": {"api.users": "lazy"}},
+                "expected": "Unkown validation mode lazy",
+            },
+            id="resource mode",
+        ),
+        pytest.param(
+            {"kwargs": {"sample_rate": 2}, "expected": "Invalid sample rate 2"},
+            id="sample rate",
+        ),
+    ],
+)
+def test_response_validation_errors(params: dict[str, Any]):
+    with pytest.raises(ValueError) as ctx:
+        ResponseValidation(**params["kwargs"])
+    assert str(ctx.value) == params["expected"]
+
+
+def test_get_resources():
+    routes = build_routes()
+    resources = {"users": routes, "groups": routes}
+    validation = ResponseValidation(resources={"api.users": "construct"})
+    assert validation.get_resources("notif", resources) is resources
+
+    validated = validation.get_resources("api", resources)
+    assert isinstance(validated, ValidatedResources)
+    assert list(validated) == ["users", "groups"]
+    assert len(validated) == 2
+    assert validated["groups"] is routes
+
+    users = validated["users"]
+    assert users is not routes
+    assert validated["users"] is users
+    assert users.resource is not None and users.resource.contract is not None
+    assert users.resource.path == "/users/{name}"
+    response = users.resource.contract["GET"][1]
+    assert isinstance(response, ResponseModel)
+    assert response.mode == "construct"
+    assert users.resource.contract["DELETE"] == (Any, None)
+    assert users.collection is not None and users.collection.contract is not None
+    assert isinstance(users.collection.contract["GET"][1], ResponseModel)
+    # the registered routes are untouched
+    assert routes.resource is not None and routes.resource.contract is not None
+    assert routes.resource.contract["GET"][1] is User
+
+
+def test_check_resources():
+    validation = ResponseValidation(resources={"api": "construct"})
+    validation.check_resources({"api": {"users": build_routes()}})
+    validation.check_resources({"notif": {"users": build_routes(UserAddresses)}})
+    with pytest.raises(ValueError) as ctx:
+        validation.check_resources({"api": {"users": build_routes(UserAddresses)}})
+    assert str(ctx.value) == (
+        "The response model UserAddresses of api.users has nested models, "
+        "it can't be built in construct mode"
+    )
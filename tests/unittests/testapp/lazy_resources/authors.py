@@ -0,0 +1,19 @@
+from blacksmith import PathInfoField, Request, Response, register
+
+
+class GetAuthor(Request):
+    name: str = PathInfoField()
+
+
+class Author(Response):
+    name: str
+
+
+register(
+    client_name="books",
+    resource="authors",
+    service="library",
+    version="v1",
+    path="/authors/{name}",
+    contract={"GET": (GetAuthor, Author)},
+)
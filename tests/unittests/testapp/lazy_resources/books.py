@@ -0,0 +1,20 @@
+from blacksmith import PathInfoField, Request, Response, register
+
+
+class GetBook(Request):
+    isbn: str = PathInfoField()
+
+
+class Book(Response):
+    isbn: str
+    title: str
+
+
+register(
+    client_name="books",
+    resource="books",
+    service="library",
+    version="v1",
+    path="/books/{isbn}",
+    contract={"GET": (GetBook, Book)},
+)
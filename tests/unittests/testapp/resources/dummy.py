@@ -1,10 +1,21 @@
-from blacksmith import PathInfoField, Request, Response, register
+from typing import Optional
+
+from blacksmith import PathInfoField, QueryStringField, Request, Response, register
 
 
 class Get(Request):
     name: str = PathInfoField()
 
 
+class ListDummies(Request):
+    page: Optional[int] = QueryStringField(None)
+
+
+class ListDummiesByName(Request):
+    names: Optional[list[str]] = QueryStringField(None)
+    page: Optional[int] = QueryStringField(None)
+
+
 class Dummy(Response):
     name: str
     id: str
@@ -17,4 +28,15 @@ register(
     version="v1",
     path="/dummies",
     contract={"GET": (Get, Dummy)},
+    collection_path="/dummies",
+    collection_contract={"GET": (ListDummiesByName, Dummy)},
+)
+
+register(
+    client_name="dummy",
+    resource="paged_dummies",
+    service="dummy",
+    version="v1",
+    collection_path="/paged_dummies",
+    collection_contract={"GET": (ListDummies, Dummy)},
 )
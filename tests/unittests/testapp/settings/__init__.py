@@ -6,18 +6,22 @@ INSTALLED_APPS.append("dj_blacksmith")  # noqa
 
 BLACKSMITH_IMPORT = ["testapp.resources"]
 
+# the clients share the blacksmith metrics of the prometheus registry
+metrics = {
+    "buckets": [0.5, 1, 3],
+    "hit_cache_buckets": [0.1, 0.3, 1],
+}
+
 BLACKSMITH_CLIENT: dict[str, Any] = {
     "default": {
         "sd": "router",
         "router_sd_config": {},
+        "metrics": metrics,
     },
     "alt_client": {
         "sd": "static",
         "static_sd_config": {},
-        "metrics": {
-            "buckets": [0.5, 1, 3],
-            "hit_cache_buckets": [0.1, 0.3, 1],
-        },
+        "metrics": metrics,
         "middlewares": [
             "dj_blacksmith.AsyncCircuitBreakerMiddlewareBuilder",
         ],